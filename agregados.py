@@ -0,0 +1,141 @@
+"""Agregados do dashboard mantidos incrementalmente.
+
+O cubo guarda contagens de OS por Tipo × Status × Local × mês de conclusão
+e, separadamente, por executante × essas mesmas dimensões. Ele é observador
+do armazenamento: cada inclusão ou alteração ajusta só as células afetadas,
+e a reconstrução completa só acontece quando a tabela é relida ou a pedido.
+Contagens que não estão na tabela em memória (o resumo do arquivo de OS
+concluídas) entram como base, somada às células em cada consulta.
+"""
+import threading
+from collections import Counter
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+DIMENSOES = ("Tipo", "Status", "Local", "Mês")
+
+def _texto(valor):
+    """Valor de uma dimensão, ou None para campos vazios ("", "nan", NA)"""
+    if valor is None or (not isinstance(valor, str) and pd.isna(valor)):
+        return None
+    valor = str(valor).strip()
+    return None if valor in ("", "nan", "None") else valor
+
+def _valores(serie):
+    """Valores da coluna com os vazios como None (categorias são convertidas uma vez por categoria)"""
+    return serie.map(_texto).astype(object).where(serie.notna(), None)
+
+def meses_das_datas(datas):
+    """Mês ("aaaa-mm") de cada data da coluna (None para NaT), formatando cada data distinta uma única vez"""
+    codigos, unicas = pd.factorize(datas)
+    if not len(unicas):
+        return pd.Series(None, index=datas.index, dtype=object)
+    texto = np.asarray(unicas.strftime("%Y-%m"), dtype=object)
+    return pd.Series(np.where(codigos >= 0, texto[codigos], None), index=datas.index, dtype=object)
+
+def mes_da_data(valor):
+    """Converte uma data (datetime, "dd/mm/aa" ou "dd/mm/aaaa") em "aaaa-mm" (None se não for uma data)"""
+    if isinstance(valor, datetime):
+        return None if pd.isna(valor) else f"{valor.year:04d}-{valor.month:02d}"
+    valor = _texto(valor)
+    if not valor:
+        return None
+    partes = valor.split(" ")[0].split("/")
+    if len(partes) != 3 or not all(p.isdigit() for p in partes):
+        return None
+    mes, ano = int(partes[1]), int(partes[2])
+    if ano < 100:
+        ano += 2000
+    return f"{ano:04d}-{mes:02d}" if 1 <= mes <= 12 else None
+
+class CuboOS:
+    """Contagens de OS por dimensão, atualizadas a cada inclusão/alteração"""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.por_os = Counter()
+        self.por_executante = Counter()
+        self.base_os = Counter()
+        self.base_executante = Counter()
+        self._consultas = {}
+
+    @staticmethod
+    def _chaves(registro):
+        chave = (_texto(registro.get("Tipo")), _texto(registro.get("Status")),
+                 _texto(registro.get("Local")), mes_da_data(registro.get("Data Conclusão")))
+        executantes = [e for e in (_texto(registro.get("Executante1")), _texto(registro.get("Executante2"))) if e]
+        return chave, [(executante,) + chave for executante in executantes]
+
+    def _somar(self, registro, sinal):
+        chave, chaves_executante = self._chaves(registro)
+        self.por_os[chave] += sinal
+        if not self.por_os[chave]:
+            del self.por_os[chave]
+        for chave_executante in chaves_executante:
+            self.por_executante[chave_executante] += sinal
+            if not self.por_executante[chave_executante]:
+                del self.por_executante[chave_executante]
+
+    def recarregar(self, df):
+        """Reconstrói o cubo a partir da tabela completa"""
+        tabela = pd.DataFrame({
+            "Tipo": _valores(df["Tipo"]),
+            "Status": _valores(df["Status"]),
+            "Local": _valores(df["Local"]),
+            "Mês": meses_das_datas(df["Data Conclusão"])
+        })
+        por_os = Counter(tabela.itertuples(index=False, name=None))
+
+        por_executante = Counter()
+        for coluna in ("Executante1", "Executante2"):
+            executantes = _valores(df[coluna])
+            validos = executantes.notna()
+            por_executante.update(zip(executantes[validos], *(tabela.loc[validos, d] for d in DIMENSOES)))
+
+        with self.lock:
+            self.por_os = por_os
+            self.por_executante = por_executante
+            self._consultas = {}
+
+    def alterar(self, anterior, atual):
+        """Ajusta as contagens para uma OS incluída (anterior=None) ou alterada"""
+        with self.lock:
+            if anterior is not None:
+                self._somar(anterior, -1)
+            self._somar(atual, +1)
+            self._consultas = {}
+
+    def definir_base(self, por_os, por_executante):
+        """Contagens somadas às da tabela, com as mesmas chaves (ex.: resumo das partições de concluídas)"""
+        with self.lock:
+            if por_os is not self.base_os or por_executante is not self.base_executante:
+                self.base_os = por_os
+                self.base_executante = por_executante
+                self._consultas = {}
+
+    def contagem(self, dimensao, **filtros):
+        """Contagens por valor da dimensão, em ordem decrescente (ex.: contagem("Executante", Status="Concluído"))
+
+        As dimensões são "Tipo", "Status", "Local", "Mês" (aaaa-mm) e "Executante";
+        filtros usam os mesmos nomes, com "Mês" escrito como Mes.
+        """
+        filtros = {("Mês" if nome == "Mes" else nome): valor for nome, valor in filtros.items()}
+        chave_consulta = (dimensao, tuple(sorted(filtros.items())))
+        with self.lock:
+            if chave_consulta not in self._consultas:
+                if dimensao == "Executante" or "Executante" in filtros:
+                    nomes, celulas = ("Executante",) + DIMENSOES, (self.por_executante, self.base_executante)
+                else:
+                    nomes, celulas = DIMENSOES, (self.por_os, self.base_os)
+                indice = nomes.index(dimensao)
+                posicoes = [(nomes.index(nome), valor) for nome, valor in filtros.items()]
+
+                resultado = Counter()
+                for contador in celulas:
+                    for chave, quantidade in contador.items():
+                        if chave[indice] is not None and all(chave[p] == valor for p, valor in posicoes):
+                            resultado[chave[indice]] += quantidade
+                self._consultas[chave_consulta] = dict(resultado.most_common())
+            return self._consultas[chave_consulta]
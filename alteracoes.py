@@ -0,0 +1,132 @@
+"""Feed das inclusões e alterações de OS, consultado com cursor.
+
+O feed é um observador do armazenamento, como o cubo e os índices: cada OS
+incluída ou alterada (por este ou por outro processo) vira um evento com
+número de sequência crescente e o registro já alterado. Quem acompanha as
+OS (a página inicial, painéis na fábrica via API) guarda o cursor da última
+consulta e recebe só o que mudou depois dele.
+
+Quando a tabela é relida por inteiro (compactação, restauração, gravação de
+outro processo no SQLite), as linhas são comparadas por hash com a leitura
+anterior e só as diferentes viram eventos; diferenças demais viram um único
+evento "recarga". O cursor traz a época do feed: se o processo reiniciou ou
+o cursor ficou mais antigo que os eventos guardados, a consulta pede que o
+cliente recarregue tudo (reiniciar=True).
+"""
+import threading
+import time
+import uuid
+from collections import deque
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+
+from armazenamento import COLUNAS_TABELA
+
+LIMITE_EVENTOS = 10000  # Eventos guardados; cursores mais antigos precisam recarregar
+LIMITE_DIFERENCAS = 1000  # Acima disso, uma releitura vira um único evento "recarga"
+LIMITE_CONSULTA = 500
+
+class CursorInvalido(ValueError):
+    """Cursor que não foi emitido por um feed"""
+
+def _assinaturas(df):
+    """Hash de cada linha indexado pelo ID"""
+    return pd.Series(pd.util.hash_pandas_object(df[COLUNAS_TABELA], index=False).to_numpy(), index=df["ID"].to_numpy())
+
+def _iguais(registro, outro):
+    for coluna, valor in registro.items():
+        valor_outro = outro.get(coluna)
+        if pd.isna(valor) or pd.isna(valor_outro):
+            if not (pd.isna(valor) and pd.isna(valor_outro)):
+                return False
+        elif valor != valor_outro:
+            return False
+    return True
+
+class FeedAlteracoes:
+    """Eventos de inclusão/alteração de OS em sequência, com os últimos LIMITE_EVENTOS em memória"""
+
+    def __init__(self, limite=LIMITE_EVENTOS, limite_diferencas=LIMITE_DIFERENCAS):
+        self.lock = threading.Lock()
+        self.epoca = uuid.uuid4().hex[:8]
+        self.limite_diferencas = limite_diferencas
+        self.sequencia = 0
+        self._eventos = deque(maxlen=limite)
+        self._assinaturas = None
+        self._alteradas = {}  # ID -> último registro publicado depois da última releitura (assinatura desatualizada)
+        self._maior_id = 0
+
+    def definir_maior_id(self, maior_id):
+        """Maior ID existente fora da tabela observada (arquivo de concluídas): IDs até ele não são inclusões"""
+        with self.lock:
+            self._maior_id = max(self._maior_id, int(maior_id))
+
+    def _publicar(self, evento, os_id, registro):
+        self.sequencia += 1
+        self._eventos.append({"seq": self.sequencia, "evento": evento, "ID": os_id, "momento": time.time(),
+                              "registro": registro})
+
+    def recarregar(self, df):
+        assinaturas = _assinaturas(df)
+        with self.lock:
+            anteriores, self._assinaturas = self._assinaturas, assinaturas
+            alteradas, self._alteradas = self._alteradas, {}
+            ids = assinaturas.index.to_numpy()
+            if anteriores is None:  # Primeira leitura: só a referência, sem eventos
+                self._maior_id = max(self._maior_id, int(ids.max()) if len(ids) else 0)
+                return
+            posicoes = anteriores.index.get_indexer(ids)
+            novas = posicoes < 0
+            diferentes = ~novas & ((anteriores.to_numpy()[posicoes] != assinaturas.to_numpy())
+                                   | np.isin(ids, list(alteradas)))
+            linhas = np.flatnonzero(novas | diferentes)
+            if len(linhas) > self.limite_diferencas:
+                self._publicar("recarga", None, None)
+            else:
+                for linha in linhas:
+                    os_id = int(ids[linha])
+                    registro = df.iloc[linha].to_dict()
+                    if os_id in alteradas and _iguais(registro, alteradas[os_id]):
+                        continue  # Já publicada (ex.: compactação do journal que este processo gravou)
+                    evento = "inclusao" if novas[linha] and os_id > self._maior_id else "alteracao"
+                    self._publicar(evento, os_id, registro)
+            if len(ids):
+                self._maior_id = max(self._maior_id, int(ids.max()))
+
+    def alterar(self, anterior, atual):
+        os_id = int(atual["ID"])
+        with self.lock:
+            # Uma OS arquivada que volta à tabela quente chega sem "anterior", mas não é nova
+            evento = "inclusao" if anterior is None and os_id > self._maior_id else "alteracao"
+            self._maior_id = max(self._maior_id, os_id)
+            self._alteradas[os_id] = registro = dict(atual)
+            self._publicar(evento, os_id, registro)
+
+    def cursor(self):
+        with self.lock:
+            return f"{self.epoca}-{self.sequencia}"
+
+    def desde(self, cursor=None, limite=LIMITE_CONSULTA):
+        """(eventos depois do cursor, cursor para a próxima consulta, reiniciar)
+
+        Sem cursor, não há eventos: o cursor devolvido marca o momento atual. Com reiniciar=True
+        (processo reiniciado ou cursor antigo demais), o cliente deve recarregar as OS por inteiro.
+        """
+        with self.lock:
+            atual = f"{self.epoca}-{self.sequencia}"
+            if cursor is None:
+                return [], atual, False
+            epoca, _, sequencia = str(cursor).partition("-")
+            try:
+                sequencia = int(sequencia)
+            except ValueError:
+                raise CursorInvalido(f"Cursor inválido: {cursor}")
+            primeira = self._eventos[0]["seq"] if self._eventos else self.sequencia + 1
+            if epoca != self.epoca or sequencia > self.sequencia or sequencia < primeira - 1:
+                return [], atual, True
+            inicio = sequencia - primeira + 1
+            eventos = list(islice(self._eventos, inicio, inicio + limite))
+            proximo = f"{self.epoca}-{eventos[-1]['seq']}" if eventos else atual
+            return eventos, proximo, False
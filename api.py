@@ -0,0 +1,292 @@
+"""API HTTP/JSON local das ordens de serviço.
+
+Permite que quiosques de abertura de OS, o ERP e tarefas agendadas incluam,
+alterem e consultem ordens sem abrir o Streamlit, usando o mesmo serviço
+(servico.py) da interface. O servidor é assíncrono (asyncio): conexões
+lentas não seguram as demais, e cada requisição roda o serviço, que lê
+pandas e grava em disco, num conjunto de threads.
+
+    python api.py --porta 8765                  # somente nesta máquina
+    python api.py --host 0.0.0.0 --porta 8765   # na rede (defina "api_token" no config.json)
+
+Com "api_porta" no config.json, o próprio aplicativo Streamlit sobe a API em
+segundo plano. Com "api_token", toda requisição deve enviar o cabeçalho
+"Authorization: Bearer <token>".
+
+Rotas (campos com os nomes das colunas; datas dd/mm/aaaa; Urgente "Sim"/"Não"):
+
+    GET   /saude                        total de OS
+    GET   /os?Status=&Tipo=&ordenar=ID&decrescente=1&tamanho=50&cursor=
+                                        página da listagem; "proximo" é o cursor da página seguinte
+    GET   /os?texto=&campos=Local,Solicitante&limite=&arquivo=1
+                                        busca textual, da OS mais relevante à menos (arquivo=1
+                                        inclui as concluídas arquivadas)
+    GET   /os/<id>                      uma OS, com o carimbo "versao"
+    POST  /os                           {"Descrição", "Solicitante", "Local", "Urgente"} -> {"ID"}
+    PATCH /os/<id>                      {campos alterados..., "versao" opcional} -> OS alterada
+    GET   /agregados/<dimensão>?Status=&Mes=aaaa-mm
+                                        contagens (Tipo, Status, Local, Mês, Executante)
+    GET   /alteracoes?cursor=&limite=   OS incluídas/alteradas depois do cursor, em ordem: {"eventos",
+                                        "cursor", "reiniciar"}; sem cursor, só o cursor atual. Com
+                                        reiniciar=true (aplicativo reiniciado, cursor antigo demais),
+                                        recarregue pela listagem e continue do cursor devolvido
+    GET   /fila?quantidade=10           fila de despacho (urgentes, depois as mais antigas): {"ordens",
+                                        "total", "proxima", "executante" sugerido, "cargas"}
+    POST  /fila/despachar               {"ID", "Executante", "versao"}, todos opcionais: põe em execução a
+                                        OS (a próxima da fila) com o executante (o de menor carga)
+"""
+import argparse
+import asyncio
+import hmac
+import json
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+from alteracoes import CursorInvalido
+from armazenamento import registro_para_gravacao
+from metricas import medir
+from paginacao import FILTROS, ORDENACOES
+from servico import ConflitoEdicao, DadosInvalidos, OSInexistente, obter_servico, versao_registro
+
+PORTA_PADRAO = 8765
+TAMANHO_MAXIMO_PAGINA = 500
+LIMITE_CORPO_BYTES = 64 * 1024
+TEMPO_LIMITE_LEITURA = 30  # Segundos para o cliente enviar a requisição completa
+
+class ErroRequisicao(Exception):
+    def __init__(self, status, mensagem):
+        super().__init__(mensagem)
+        self.status = status
+
+def registro_json(registro):
+    """OS no formato da API, o mesmo gravado em disco (None para ausentes)"""
+    return registro_para_gravacao(registro)
+
+def tabela_json(df):
+    return [registro_json(registro) for registro in df.to_dict("records")]
+
+def _inteiro(parametros, nome, padrao):
+    try:
+        return int(parametros.get(nome, padrao))
+    except ValueError:
+        raise ErroRequisicao(HTTPStatus.BAD_REQUEST, f"{nome} deve ser um número inteiro")
+
+class ServidorAPI:
+    """Servidor HTTP/JSON assíncrono sobre um ServicoOS"""
+
+    def __init__(self, servico, host="127.0.0.1", porta=PORTA_PADRAO, token=None, trabalhadores=8):
+        self.servico = servico
+        self.host = host
+        self.porta = porta
+        self.token = token
+        self.executor = ThreadPoolExecutor(trabalhadores, thread_name_prefix="api-os")
+        self.rotas = [
+            ("GET", re.compile(r"/saude"), self.saude),
+            ("GET", re.compile(r"/os"), self.listar),
+            ("POST", re.compile(r"/os"), self.cadastrar),
+            ("GET", re.compile(r"/os/(\d+)"), self.obter),
+            ("PATCH", re.compile(r"/os/(\d+)"), self.atualizar),
+            ("GET", re.compile(r"/agregados/([^/]+)"), self.agregados),
+            ("GET", re.compile(r"/alteracoes"), self.alteracoes),
+            ("GET", re.compile(r"/fila"), self.fila),
+            ("POST", re.compile(r"/fila/despachar"), self.despachar_os)
+        ]
+
+    # Rotas: recebem (parâmetros da URL, corpo JSON, grupos do caminho) e retornam (status, objeto JSON)
+
+    def saude(self, parametros, corpo):
+        return HTTPStatus.OK, {"ok": True, "total": self.servico.contar()}
+
+    def listar(self, parametros, corpo):
+        if parametros.get("texto"):
+            campos = parametros["campos"].split(",") if parametros.get("campos") else None
+            limite = _inteiro(parametros, "limite", 0) or None
+            arquivo = parametros.get("arquivo", "0") in ("1", "true", "sim")
+            resultado = self.servico.pesquisar(parametros["texto"], campos, limite, arquivo)
+            return HTTPStatus.OK, {"ordens": tabela_json(resultado), "total": len(resultado)}
+
+        ordenacao = parametros.get("ordenar", "ID")
+        if ordenacao not in ORDENACOES:
+            raise ErroRequisicao(HTTPStatus.BAD_REQUEST, f"ordenar deve ser um de: {', '.join(ORDENACOES)}")
+        tamanho = min(max(_inteiro(parametros, "tamanho", 50), 1), TAMANHO_MAXIMO_PAGINA)
+        decrescente = parametros.get("decrescente", "0") in ("1", "true", "sim")
+        filtros = {coluna: parametros[coluna] for coluna in FILTROS if parametros.get(coluna)}
+        cursor = None
+        if parametros.get("cursor"):
+            try:
+                chave, os_id = json.loads(parametros["cursor"])
+                cursor = (str(chave), int(os_id))
+            except (ValueError, TypeError):
+                raise ErroRequisicao(HTTPStatus.BAD_REQUEST, "cursor inválido")
+
+        linhas, proximo, total = self.servico.pagina(ordenacao, filtros, cursor, tamanho, decrescente)
+        return HTTPStatus.OK, {"ordens": tabela_json(linhas), "total": total,
+                               "proximo": json.dumps(list(proximo), ensure_ascii=False) if proximo else None}
+
+    def obter(self, parametros, corpo, os_id):
+        registro = self.servico.obter(int(os_id))
+        return HTTPStatus.OK, {**registro_json(registro), "versao": versao_registro(registro)}
+
+    def cadastrar(self, parametros, corpo):
+        os_id = self.servico.cadastrar(corpo.get("Descrição"), corpo.get("Solicitante"), corpo.get("Local"),
+                                       corpo.get("Urgente") in (True, "Sim"))
+        return HTTPStatus.CREATED, {"ID": os_id}
+
+    def atualizar(self, parametros, corpo, os_id):
+        campos = dict(corpo)
+        versao = campos.pop("versao", None)
+        registro = self.servico.atualizar(int(os_id), campos, versao)
+        return HTTPStatus.OK, {**registro_json(registro), "versao": versao_registro(registro)}
+
+    def agregados(self, parametros, corpo, dimensao):
+        filtros = {("Mes" if nome == "Mês" else nome): valor for nome, valor in parametros.items()}
+        try:
+            return HTTPStatus.OK, self.servico.contagem(dimensao, **filtros)
+        except ValueError:
+            raise ErroRequisicao(HTTPStatus.BAD_REQUEST, f"Dimensão ou filtro desconhecido: {dimensao}")
+
+    def alteracoes(self, parametros, corpo):
+        limite = min(max(_inteiro(parametros, "limite", TAMANHO_MAXIMO_PAGINA), 1), TAMANHO_MAXIMO_PAGINA)
+        try:
+            eventos, cursor, reiniciar = self.servico.alteracoes(parametros.get("cursor"), limite)
+        except CursorInvalido as e:
+            raise ErroRequisicao(HTTPStatus.BAD_REQUEST, str(e))
+        return HTTPStatus.OK, {"eventos": [{"seq": evento["seq"], "evento": evento["evento"], "ID": evento["ID"],
+                                            "momento": evento["momento"],
+                                            "os": registro_json(evento["registro"]) if evento["registro"] else None}
+                                           for evento in eventos],
+                               "cursor": cursor, "reiniciar": reiniciar}
+
+    def fila(self, parametros, corpo):
+        quantidade = min(max(_inteiro(parametros, "quantidade", 10), 1), TAMANHO_MAXIMO_PAGINA)
+        linhas, total = self.servico.fila_despacho(quantidade)
+        proxima, sugestao = self.servico.proxima_os()
+        cargas = self.servico.cargas_executantes()
+        return HTTPStatus.OK, {"ordens": tabela_json(linhas), "total": total,
+                               "proxima": {**registro_json(proxima), "versao": versao_registro(proxima)} if proxima else None,
+                               "executante": sugestao,
+                               "cargas": {nome: {"em_aberto": abertas, "em_execucao": executando}
+                                          for nome, (abertas, executando) in cargas.items()}}
+
+    def despachar_os(self, parametros, corpo):
+        os_id = corpo.get("ID")
+        try:
+            os_id = int(os_id) if os_id not in (None, "") else None
+        except (TypeError, ValueError):
+            raise ErroRequisicao(HTTPStatus.BAD_REQUEST, "ID deve ser um número inteiro")
+        registro = self.servico.despachar(os_id, corpo.get("Executante"), corpo.get("versao"))
+        return HTTPStatus.OK, {**registro_json(registro), "versao": versao_registro(registro)}
+
+    # Despacho
+
+    def autorizado(self, cabecalhos):
+        if not self.token:
+            return True
+        return hmac.compare_digest(cabecalhos.get("authorization", ""), f"Bearer {self.token}")
+
+    def despachar(self, metodo, alvo, corpo=b"", cabecalhos=None):
+        """Executa uma requisição e retorna (status, objeto JSON); síncrono, roda no conjunto de threads"""
+        try:
+            if not self.autorizado(cabecalhos or {}):
+                raise ErroRequisicao(HTTPStatus.UNAUTHORIZED, "Token de acesso ausente ou inválido")
+            url = urlsplit(alvo)
+            parametros = {nome: valores[-1] for nome, valores in parse_qs(url.query).items()}
+            try:
+                dados = json.loads(corpo) if corpo else {}
+            except ValueError:
+                raise ErroRequisicao(HTTPStatus.BAD_REQUEST, "Corpo da requisição não é um JSON válido")
+            if not isinstance(dados, dict):
+                raise ErroRequisicao(HTTPStatus.BAD_REQUEST, "O corpo da requisição deve ser um objeto JSON")
+
+            caminho = url.path.rstrip("/") or "/"
+            metodos = []
+            for metodo_rota, padrao, rota in self.rotas:
+                encontrado = padrao.fullmatch(caminho)
+                if encontrado:
+                    metodos.append(metodo_rota)
+                    if metodo_rota == metodo:
+                        with medir(f"api.{rota.__name__}"):
+                            return rota(parametros, dados, *encontrado.groups())
+            if metodos:
+                raise ErroRequisicao(HTTPStatus.METHOD_NOT_ALLOWED, f"Use {', '.join(metodos)} em {caminho}")
+            raise ErroRequisicao(HTTPStatus.NOT_FOUND, f"Rota inexistente: {caminho}")
+        except ErroRequisicao as e:
+            return e.status, {"erro": str(e)}
+        except DadosInvalidos as e:
+            return HTTPStatus.BAD_REQUEST, {"erro": str(e)}
+        except OSInexistente as e:
+            return HTTPStatus.NOT_FOUND, {"erro": str(e)}
+        except ConflitoEdicao as e:
+            return HTTPStatus.CONFLICT, {"erro": str(e)}
+        except Exception as e:
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"erro": f"Erro interno: {str(e)}"}
+
+    async def _ler_requisicao(self, leitor):
+        """Lê linha de requisição, cabeçalhos e corpo (Content-Length); retorna (método, alvo, cabeçalhos, corpo)"""
+        cabecalho = await leitor.readuntil(b"\r\n\r\n")
+        linhas = cabecalho.decode("latin-1").split("\r\n")
+        metodo, alvo, _ = linhas[0].split(" ", 2)
+        cabecalhos = {}
+        for linha in linhas[1:]:
+            nome, separador, valor = linha.partition(":")
+            if separador:
+                cabecalhos[nome.strip().lower()] = valor.strip()
+        tamanho = int(cabecalhos.get("content-length", 0))
+        if tamanho > LIMITE_CORPO_BYTES:
+            raise ErroRequisicao(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Corpo da requisição grande demais")
+        corpo = await leitor.readexactly(tamanho) if tamanho > 0 else b""
+        return metodo.upper(), alvo, cabecalhos, corpo
+
+    async def _atender(self, leitor, escritor):
+        try:
+            try:
+                metodo, alvo, cabecalhos, corpo = await asyncio.wait_for(self._ler_requisicao(leitor), TEMPO_LIMITE_LEITURA)
+                status, resposta = await asyncio.get_running_loop().run_in_executor(
+                    self.executor, self.despachar, metodo, alvo, corpo, cabecalhos)
+            except ErroRequisicao as e:
+                status, resposta = e.status, {"erro": str(e)}
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ValueError):
+                status, resposta = HTTPStatus.BAD_REQUEST, {"erro": "Requisição HTTP malformada"}
+
+            dados = json.dumps(resposta, ensure_ascii=False).encode("utf-8")
+            escritor.write(f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                           "Content-Type: application/json; charset=utf-8\r\n"
+                           f"Content-Length: {len(dados)}\r\n"
+                           "Connection: close\r\n\r\n".encode("latin-1") + dados)
+            await escritor.drain()
+        except ConnectionError:
+            pass
+        finally:
+            escritor.close()
+
+    async def servir(self):
+        """Atende requisições até o cancelamento da tarefa"""
+        servidor = await asyncio.start_server(self._atender, self.host, self.porta)
+        async with servidor:
+            await servidor.serve_forever()
+
+    def iniciar_em_segundo_plano(self):
+        """Roda o servidor num laço de eventos próprio, numa thread daemon (ex.: dentro do Streamlit)"""
+        thread = threading.Thread(target=asyncio.run, args=(self.servir(),), name="api-os", daemon=True)
+        thread.start()
+        return thread
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="API HTTP/JSON local das ordens de serviço")
+    parser.add_argument("--diretorio", default=".", help="Diretório dos dados (CSV, banco, backups, config.json)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=None)
+    args = parser.parse_args()
+
+    servico = obter_servico(args.diretorio)
+    servico.inicializar_arquivos()
+    configuracao = servico.configuracao
+    porta = args.porta or configuracao.get("api_porta") or PORTA_PADRAO
+    print(f"API das ordens de serviço em http://{args.host}:{porta}")
+    try:
+        asyncio.run(ServidorAPI(servico, args.host, porta, configuracao.get("api_token")).servir())
+    except KeyboardInterrupt:
+        pass
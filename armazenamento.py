@@ -0,0 +1,902 @@
+"""Armazenamento das ordens de serviço: CSV com journal ou banco SQLite indexado.
+
+As duas implementações expõem os mesmos métodos (carregar, consultar, obter,
+inserir, atualizar, salvar_tabela, compactar, restaurar, e inserir_lotes e
+ler_lotes para importações e exportações em lote), de modo que o aplicativo
+escolhe o mecanismo pela configuração sem mudar as páginas. O armazenamento
+particionado (particoes.py) estende o CSV com journal, levando as OS
+concluídas para um arquivo mensal colunar.
+
+Cada CSV gravado ganha uma cópia em Arrow IPC ao lado (<csv>.arrow), marcada
+com a identidade do CSV. Os processos do Streamlit a mapeiam em memória só
+para leitura, em vez de interpretar o CSV: um processo novo tem a tabela em
+milissegundos, e o texto livre fica nas páginas do arquivo, compartilhadas
+por todos. Quando o CSV muda, a cópia que não é dele é ignorada e o próximo
+processo que interpretar o CSV publica a nova.
+
+Migração única do CSV para o SQLite:
+
+    python armazenamento.py migrar --csv ordens_servico4.0.csv --banco ordens_servico4.0.db
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+from travas import TravaArquivo, caminho_temporario, identidade_arquivo
+
+COLUNAS_OS = ["ID", "Descrição", "Data", "Hora Abertura", "Solicitante", "Local",
+              "Tipo", "Status", "Data Conclusão", "Hora Conclusão", "Executante1", "Executante2", "Urgente", "Observações"]
+
+def converter_arquivo_antigo(df):
+    """Converte o formato antigo (com 'Executante') para o novo (com 'Executante1' e 'Executante2')"""
+    if 'Executante' in df.columns and 'Executante1' not in df.columns:
+        df['Executante1'] = df['Executante']
+        df['Executante2'] = ""
+        df['Observações'] = ""  # Adiciona coluna de observações se não existir
+        df.drop('Executante', axis=1, inplace=True)
+    if 'Observações' not in df.columns:  # Garante que a coluna existe
+        df['Observações'] = ""
+    return df
+
+# Esquema da tabela em memória; em disco (CSV, SQLite, journal) tudo continua texto
+COLUNAS_CATEGORIAS = ["Local", "Tipo", "Status", "Executante1", "Executante2", "Hora Abertura", "Hora Conclusão"]
+COLUNAS_DATAS = ["Data", "Data Conclusão"]
+COLUNAS_TEXTO = ["Descrição", "Solicitante", "Observações"]
+FORMATO_DATA = "%d/%m/%Y"
+TIPO_TEXTO = "string[pyarrow]"  # Texto livre em buffers do Arrow, bem menores que objetos str do Python
+# Alterar uma linha de uma coluna Arrow (ou "string") recopia e revalida a coluna inteira: o texto editado pelas
+# atualizações fica num array de objetos (str ou pd.NA), em que a atribuição de uma linha custa o mesmo com 1 mil ou 1 milhão de OS
+TIPO_TEXTO_EDITAVEL = object
+COLUNAS_TEXTO_EDITAVEIS = ["Observações"]
+VALORES_VAZIOS = ["", "nan", "None"]
+# Uma data que não pode ser interpretada (ex.: "19/7", sem o ano) fica NaT na coluna de datas e tem o texto
+# original guardado nesta coluna ao lado, que só existe na memória: as gravações escrevem o texto de volta
+COLUNAS_DATAS_ORIGINAIS = {coluna: f"{coluna} (texto)" for coluna in COLUNAS_DATAS}
+COLUNAS_TABELA = COLUNAS_OS + list(COLUNAS_DATAS_ORIGINAIS.values())
+STATUS_CONCLUIDO = "Concluído"  # Único status que encerra a OS
+
+# Tipos aplicados já na leitura, sem passar por colunas de objetos Python
+TIPOS_LEITURA = {**{c: "category" for c in COLUNAS_CATEGORIAS}, **{c: "string" if c in COLUNAS_TEXTO_EDITAVEIS else TIPO_TEXTO for c in COLUNAS_TEXTO},
+                 **{c: "string" for c in COLUNAS_DATAS}, "Urgente": "string"}
+
+def converter_datas(valores):
+    """Converte datas "dd/mm/aa" ou "dd/mm/aaaa" em datetime; vazias ou inválidas viram NaT (ver datas_originais)
+
+    As datas se repetem muito: cada texto distinto é convertido uma única vez.
+    """
+    codigos, unicas = pd.factorize(valores)
+    texto = pd.Series(unicas, dtype="string").str.strip()
+    curtas = pd.to_datetime(texto, format="%d/%m/%y", errors="coerce")
+    datas = curtas.fillna(pd.to_datetime(texto, format=FORMATO_DATA, errors="coerce"))
+    # O código -1 (vazio) pega o NaT acrescentado no fim
+    datas = np.append(datas.to_numpy(dtype="datetime64[ns]"), np.datetime64("NaT", "ns"))
+    return pd.Series(datas[codigos], index=valores.index)
+
+def datas_originais(valores, datas):
+    """Texto das datas que não viraram data (NA nas demais), para a coluna de COLUNAS_DATAS_ORIGINAIS"""
+    originais = pd.Series(pd.NA, index=datas.index, dtype="string")
+    if valores is not None and not pd.api.types.is_datetime64_dtype(valores):
+        falhas = datas.isna() & valores.notna()
+        texto = valores[falhas].astype("string").str.strip()
+        originais[falhas] = texto.mask(texto.isin(VALORES_VAZIOS))
+    return originais.astype(object).astype("category")
+
+def converter_coluna(coluna, valores):
+    """Converte uma coluna para o tipo do esquema; colunas já no tipo certo só têm os vazios limpos"""
+    if coluna == "ID":
+        return valores.astype("int64")
+    if coluna in COLUNAS_DATAS:
+        return valores if pd.api.types.is_datetime64_dtype(valores) else converter_datas(valores)
+    if coluna == "Urgente":
+        if pd.api.types.is_bool_dtype(valores):
+            return valores.astype("boolean")
+        return valores.astype("string").map({"Sim": True, "Não": False}, na_action="ignore").astype("boolean")
+    if coluna in COLUNAS_CATEGORIAS:
+        if not isinstance(valores.dtype, pd.CategoricalDtype):
+            valores = valores.astype("string").astype("category")
+        vazios = valores.cat.categories.intersection(VALORES_VAZIOS)
+        return valores.cat.remove_categories(vazios) if len(vazios) else valores
+    valores = valores.astype("string" if coluna in COLUNAS_TEXTO_EDITAVEIS else TIPO_TEXTO)
+    valores = valores.mask(valores.isin(VALORES_VAZIOS))
+    return valores.astype(TIPO_TEXTO_EDITAVEL) if coluna in COLUNAS_TEXTO_EDITAVEIS else valores
+
+def normalizar_tabela(df):
+    """Aplica o esquema da tabela: categorias, datas, Urgente booleano e valores ausentes como NA (não "nan")"""
+    df = converter_arquivo_antigo(df)
+    colunas = {coluna: converter_coluna(coluna, df[coluna] if coluna in df.columns else pd.Series(pd.NA, index=df.index))
+               for coluna in COLUNAS_OS}
+    for coluna, original in COLUNAS_DATAS_ORIGINAIS.items():
+        colunas[original] = (df[original].astype("string").astype(object).astype("category") if original in df.columns
+                             else datas_originais(df.get(coluna), colunas[coluna]))
+    return pd.DataFrame(colunas, index=df.index)
+
+def ler_csv(caminho):
+    """Lê o CSV de ordens já no esquema da tabela"""
+    return normalizar_tabela(pd.read_csv(caminho, dtype=TIPOS_LEITURA))
+
+def converter_campos(campos):
+    """Converte campos vindos das páginas ou do journal (texto) para os tipos da tabela
+
+    Cada data informada leva junto o seu texto original (NA se ela foi interpretada), que substitui o anterior.
+    """
+    convertidos = {coluna: converter_coluna(coluna, pd.Series([valor])).iloc[0] if coluna in COLUNAS_OS else valor
+                   for coluna, valor in campos.items()}
+    for coluna, original in COLUNAS_DATAS_ORIGINAIS.items():
+        if coluna in campos and original not in campos:
+            valor = pd.Series([campos[coluna]])
+            convertidos[original] = datas_originais(valor, converter_coluna(coluna, valor)).astype(object).iloc[0]
+    return convertidos
+
+def formatar_datas(valores):
+    """Datas como texto dd/mm/aaaa (None para NaT), formatando cada data distinta uma única vez"""
+    codigos, unicas = pd.factorize(valores)
+    if not len(unicas):
+        return pd.Series(None, index=valores.index, dtype=object)
+    texto = np.asarray(unicas.strftime(FORMATO_DATA), dtype=object)
+    return pd.Series(np.where(codigos >= 0, texto[codigos], None), index=valores.index, dtype=object)
+
+def texto_para_gravacao(df):
+    """Tabela no formato gravado em disco: datas dd/mm/aaaa (ou o texto original) e Urgente "Sim"/"Não" """
+    datas = {}
+    for coluna in COLUNAS_DATAS:
+        datas[coluna] = formatar_datas(df[coluna])
+        original = COLUNAS_DATAS_ORIGINAIS[coluna]
+        if original in df.columns:
+            datas[coluna] = datas[coluna].mask(df[original].notna(), df[original].astype(object))
+    return df.assign(**datas, Urgente=df["Urgente"].map({True: "Sim", False: "Não"}, na_action="ignore")).drop(
+        columns=list(COLUNAS_DATAS_ORIGINAIS.values()), errors="ignore")
+
+def valor_para_gravacao(coluna, valor, original=None):
+    """Um valor da tabela no formato gravado em disco (None para ausentes); original é o texto de uma data não interpretada"""
+    if valor is None or pd.isna(valor):
+        return None if original is None or pd.isna(original) else original
+    if coluna in COLUNAS_DATAS:
+        return valor.strftime(FORMATO_DATA)
+    if coluna == "Urgente":
+        return "Sim" if valor else "Não"
+    return int(valor) if coluna == "ID" else valor
+
+def registro_para_gravacao(registro):
+    """Campos de uma OS (dicionário da tabela) no formato gravado em disco"""
+    return {coluna: valor_para_gravacao(coluna, registro.get(coluna), registro.get(COLUNAS_DATAS_ORIGINAIS.get(coluna)))
+            for coluna in COLUNAS_OS}
+
+def alterar_linha(df, posicao, campos, compartilhadas=None):
+    """Altera campos já convertidos de uma linha, incluindo nas categorias os valores ainda não vistos
+
+    As colunas em compartilhadas (que uma tabela já entregue usa também) são trocadas por uma cópia antes
+    da primeira alteração e saem do conjunto: quem recebeu a tabela não vê a mudança.
+    """
+    for coluna, valor in campos.items():
+        if coluna not in df.columns:
+            continue
+        if compartilhadas and coluna in compartilhadas:
+            df[coluna] = df[coluna].copy()
+            compartilhadas.discard(coluna)
+        if (isinstance(df[coluna].dtype, pd.CategoricalDtype) and not pd.isna(valor)
+                and valor not in df[coluna].cat.categories):
+            df[coluna] = df[coluna].cat.add_categories([valor])
+        df.iloc[posicao, df.columns.get_loc(coluna)] = valor
+
+def indexar_ids(df):
+    """Índice hash ID -> posição da linha (havendo IDs repetidos, vale a primeira ocorrência)"""
+    ids = df["ID"].tolist()
+    return dict(zip(reversed(ids), range(len(ids) - 1, -1, -1)))
+
+def ids_da_consulta(filtros, busca):
+    """IDs pedidos quando a consulta é só por ID (ex.: {"ID": [3, 7]}), ou None"""
+    if busca or not filtros or set(filtros) != {"ID"}:
+        return None
+    valor = filtros["ID"]
+    return [int(i) for i in valor] if isinstance(valor, (list, tuple, set)) else [int(valor)]
+
+def acrescentar_linhas(df, novas):
+    """Concatena linhas já convertidas mantendo as colunas categóricas (categorias iguais nos dois lados)"""
+    for coluna in COLUNAS_CATEGORIAS + list(COLUNAS_DATAS_ORIGINAIS.values()):
+        faltantes = novas[coluna].cat.categories.difference(df[coluna].cat.categories)
+        if len(faltantes):
+            df[coluna] = df[coluna].cat.add_categories(faltantes)
+        novas[coluna] = novas[coluna].cat.set_categories(df[coluna].cat.categories)
+    resultado = pd.concat([df, novas], ignore_index=True)
+    for coluna in COLUNAS_TEXTO_EDITAVEIS:
+        # O concat preenche com NaN uma coluna de objetos só com NA: os ausentes das linhas novas voltam a ser NA
+        if novas[coluna].isna().all():
+            resultado.iloc[len(df):, resultado.columns.get_loc(coluna)] = pd.NA
+    return resultado
+
+def gravar_csv_atomico(df, caminho):
+    """Grava o CSV num arquivo temporário e o move para o destino, para que nenhum leitor o veja pela metade"""
+    gravar_lotes_csv_atomico([texto_para_gravacao(df)], caminho)
+
+def gravar_lotes_csv_atomico(lotes, caminho):
+    """Como gravar_csv_atomico, recebendo a tabela em lotes já no formato de disco (um lote na memória por vez)"""
+    temporario = caminho_temporario(caminho)
+    with open(temporario, "w", encoding="utf-8", newline="") as f:
+        cabecalho = True
+        for lote in lotes:
+            lote.to_csv(f, header=cabecalho, index=False)
+            cabecalho = False
+        if cabecalho:
+            pd.DataFrame(columns=COLUNAS_OS).to_csv(f, index=False)
+    os.replace(temporario, caminho)
+
+def gravar_colunar(df, caminho, versao):
+    """Grava a tabela em Arrow IPC sem compressão (para ser mapeada em memória), marcada com a versão informada"""
+    import pyarrow as pa
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    for coluna in COLUNAS_TEXTO:
+        # Uma coluna de texto toda vazia viria como tipo nulo, lido de volta como objetos None
+        posicao = tabela.schema.get_field_index(coluna)
+        tabela = tabela.set_column(posicao, coluna, tabela[coluna].cast(pa.string()))
+    tabela = tabela.replace_schema_metadata({**tabela.schema.metadata, b"versao": json.dumps(versao).encode()})
+    temporario = caminho_temporario(caminho)
+    try:
+        with pa.OSFile(temporario, "wb") as f, pa.ipc.new_file(f, tabela.schema) as escritor:
+            escritor.write_table(tabela)
+        os.replace(temporario, caminho)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+
+def ler_colunar(caminho, versao):
+    """Tabela do arquivo Arrow mapeado em memória; None se ele não existir, estiver ilegível ou for de outra versão
+
+    O texto livre (Descrição e Solicitante) continua nos buffers mapeados, sem cópia; as demais colunas,
+    que o Arrow entrega como visões somente leitura do arquivo, são copiadas (são números, datas e
+    códigos de categoria, pequenos), pois as alterações gravam nelas na própria tabela.
+    """
+    import pyarrow as pa
+    try:
+        leitor = pa.ipc.open_file(pa.memory_map(caminho))
+        if json.loads(leitor.schema.metadata.get(b"versao", b"null")) != json.loads(json.dumps(versao)):
+            return None
+        tabela = leitor.read_all()
+    except (OSError, pa.ArrowInvalid):
+        return None
+    if tabela.column_names != COLUNAS_TABELA:
+        return None
+    df = tabela.to_pandas(split_blocks=True, types_mapper={pa.string(): pd.StringDtype("pyarrow")}.get)
+    colunas = {coluna: df[coluna].copy() for coluna in df.columns if df[coluna].dtype != TIPO_TEXTO}
+    colunas.update({coluna: df[coluna].astype(TIPO_TEXTO_EDITAVEL) for coluna in COLUNAS_TEXTO_EDITAVEIS})
+    return df.assign(**colunas)
+
+class ConflitoEdicao(Exception):
+    """A OS foi alterada por outra sessão depois de lida por quem tenta gravá-la"""
+
+def versao_registro(registro):
+    """Carimbo de versão de uma OS, calculado do conteúdo: muda sempre que algum campo muda"""
+    valores = list(registro_para_gravacao(registro).values())
+    return hashlib.sha1(json.dumps(valores, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+def validar_coluna(coluna):
+    """Impede que nomes de coluna arbitrários cheguem às consultas"""
+    if coluna not in COLUNAS_OS:
+        raise ValueError(f"Coluna desconhecida: {coluna}")
+    return coluna
+
+def filtrar_tabela(df, filtros=None, busca=None):
+    """Aplica filtros de igualdade (valor ou lista de valores) e busca por trecho de texto sem regex"""
+    mascara = pd.Series(True, index=df.index)
+    for coluna, valor in (filtros or {}).items():
+        if isinstance(valor, (list, tuple, set)):
+            mascara &= df[validar_coluna(coluna)].isin(list(valor))
+        else:
+            mascara &= df[validar_coluna(coluna)] == valor
+    if busca:
+        coluna, texto = busca
+        mascara &= df[validar_coluna(coluna)].astype("string").str.contains(texto, case=False, regex=False, na=False)
+    return df[mascara]
+
+def filtrar_conclusao(df, periodo=None):
+    """OS com Data Conclusão no período (desde, ate), limites incluídos; sem período, todas"""
+    if not periodo:
+        return df
+    desde, ate = periodo
+    mascara = df["Data Conclusão"].notna()
+    if desde is not None:
+        mascara &= df["Data Conclusão"] >= desde
+    if ate is not None:
+        mascara &= df["Data Conclusão"] <= ate
+    return df[mascara]
+
+class Observavel:
+    """Avisa estruturas derivadas (agregados, índices) sobre mudanças na tabela em memória.
+
+    Um observador implementa recarregar(df), chamado quando a tabela é relida
+    por inteiro, e alterar(anterior, atual), chamado para cada OS incluída
+    (anterior=None) ou alterada, com os registros como dicionários.
+    """
+
+    def registrar_observador(self, observador):
+        with self.lock:
+            self._observadores.append(observador)
+            if self._df is not None:
+                observador.recarregar(self._df)
+
+    def _notificar_recarga(self, df):
+        for observador in self._observadores:
+            observador.recarregar(df)
+
+    def _notificar_alteracao(self, anterior, atual):
+        for observador in self._observadores:
+            observador.alterar(anterior, atual)
+
+    def sincronizar(self):
+        """Traz para a memória (e para os observadores) alterações feitas por outros processos"""
+        self._tabela()
+
+class ArmazenamentoCSV(Observavel):
+    """CSV (snapshot) mais journal de inclusões/alterações, com a tabela mantida em memória por versão"""
+
+    def __init__(self, arquivo, journal, limite_journal=256 * 1024):
+        self._observadores = []
+        self.arquivo = arquivo
+        self.journal = journal
+        self.limite_journal = limite_journal
+        self.lock = threading.RLock()
+        # Gravações (journal e CSV) de todos os processos passam por esta trava
+        self.trava = TravaArquivo(f"{arquivo}.lock")
+        self.arquivo_colunar = f"{arquivo}.arrow"  # Cópia mapeada em memória por todos os processos
+        self._identidade = None
+        self._posicao_journal = 0
+        self._df = None
+        self._posicoes = {}
+        self._compartilhadas = set()  # Colunas de _df usadas também pelas tabelas entregues por carregar()
+
+    def invalidar(self):
+        """Descarta a tabela em memória; a próxima leitura relê o arquivo"""
+        with self.lock:
+            self._identidade = None
+            self._df = None
+            self._posicoes = {}
+
+    def _ler_journal(self, posicao):
+        """Lê os registros do journal a partir de uma posição em bytes e retorna (registros, nova posição)"""
+        if not os.path.exists(self.journal):
+            return [], 0
+        with open(self.journal, "rb") as f:
+            f.seek(posicao)
+            dados = f.read()
+        # Uma linha sem quebra final ainda está sendo escrita: fica para a próxima leitura
+        fim = dados.rfind(b"\n") + 1
+        registros = [json.loads(linha) for linha in dados[:fim].splitlines() if linha.strip()]
+        return registros, posicao + fim
+
+    def _aplicar_registros(self, df, registros):
+        """Reaplica inclusões e alterações do journal sobre a tabela, localizando as linhas pelo índice de IDs"""
+        novas = {}
+        alteracoes = {}
+        for registro in registros:
+            os_id = int(registro["ID"])
+            campos = registro["campos"]
+            if os_id in novas:
+                novas[os_id].update(campos)
+            elif registro["op"] == "insert" and os_id not in self._posicoes:
+                novas[os_id] = {**campos, "ID": os_id}
+            else:
+                # Inclusões já presentes no snapshot (compactação em andamento) viram alterações: replay idempotente
+                alteracoes.setdefault(os_id, {}).update(campos)
+
+        for os_id, campos in alteracoes.items():
+            posicao = self._posicoes.get(os_id)
+            if posicao is not None:
+                anterior = df.iloc[posicao].to_dict()
+                alterar_linha(df, posicao, converter_campos(campos), self._compartilhadas)
+                self._notificar_alteracao(anterior, df.iloc[posicao].to_dict())
+
+        if novas:
+            novas = normalizar_tabela(pd.DataFrame(list(novas.values())))
+            self._posicoes.update(zip(novas["ID"].tolist(), range(len(df), len(df) + len(novas))))
+            df = acrescentar_linhas(df, novas)
+            for registro in novas.to_dict("records"):
+                self._notificar_alteracao(None, registro)
+        return df
+
+    def _tamanho_journal(self):
+        return os.path.getsize(self.journal) if os.path.exists(self.journal) else 0
+
+    def _tabela(self):
+        """Tabela atual (snapshot + journal) compartilhada; não deve ser alterada por quem a recebe"""
+        with self.lock:
+            identidade = identidade_arquivo(self.arquivo)
+            tamanho_journal = self._tamanho_journal()
+
+            if self._identidade != identidade or tamanho_journal < self._posicao_journal:
+                self._df = self._ler_arquivo(identidade)
+                self._posicoes = indexar_ids(self._df)
+                self._compartilhadas = set()
+                self._identidade = identidade
+                self._posicao_journal = 0
+                self._notificar_recarga(self._df)
+
+            # Só os registros acrescentados desde a última leitura são aplicados
+            if tamanho_journal > self._posicao_journal:
+                registros, posicao = self._ler_journal(self._posicao_journal)
+                self._df = self._aplicar_registros(self._df, registros)
+                self._posicao_journal = posicao
+
+            return self._df
+
+    def _ler_arquivo(self, identidade):
+        """Tabela do CSV, pela cópia colunar se ela for desta versão; senão interpreta o CSV e publica a cópia
+
+        A publicação não passa pela trava: quem chega aqui já tem self.lock, e os gravadores tomam a trava
+        antes dele. Não é preciso: a cópia é trocada por os.replace e leva a identidade do CSV de que veio,
+        então uma cópia publicada atrasada, depois de o CSV mudar, só é ignorada pelos leitores.
+        """
+        df = ler_colunar(self.arquivo_colunar, identidade)
+        if df is None:
+            df = ler_csv(self.arquivo)
+            # Evita publicar à toa se outro processo regravou o CSV enquanto ele era lido
+            if identidade_arquivo(self.arquivo) == identidade:
+                self._publicar_colunar(df, identidade)
+        return df
+
+    def _publicar_colunar(self, df, identidade):
+        try:
+            gravar_colunar(df, self.arquivo_colunar, identidade)
+        except OSError:
+            # Ex.: no Windows, a cópia anterior ainda mapeada por outro processo não pode ser substituída;
+            # os leitores continuam no CSV até a próxima publicação
+            pass
+
+    def carregar(self):
+        """Tabela completa, só para leitura; a cópia rasa não duplica os dados nem vê as alterações seguintes"""
+        with self.lock:
+            df = self._tabela()
+            self._compartilhadas = set(df.columns)  # Cada coluna é copiada na próxima alteração que a atingir
+            return df.copy(deep=False)
+
+    def contar(self):
+        return len(self._tabela())
+
+    def consultar(self, filtros=None, busca=None):
+        with self.lock:
+            df = self._tabela()
+            ids = ids_da_consulta(filtros, busca)
+            if ids is not None:
+                # Consulta por ID usa o índice hash, sem percorrer a tabela
+                return df.iloc[sorted(self._posicoes[i] for i in set(ids) if i in self._posicoes)]
+        return filtrar_tabela(df, filtros, busca)
+
+    def listar_abertas(self):
+        """OS ainda não concluídas, na ordem de ID"""
+        df = self._tabela()
+        return df[df["Status"] != STATUS_CONCLUIDO]
+
+    def obter(self, os_id):
+        """Registro da OS como dicionário (None se não existir), localizado pelo índice hash de IDs"""
+        with self.lock:
+            df = self._tabela()
+            posicao = self._posicoes.get(int(os_id))
+            return df.iloc[posicao].to_dict() if posicao is not None else None
+
+    def proximo_id(self):
+        df = self._tabela()
+        return int(df["ID"].max()) + 1 if not df.empty and not pd.isna(df["ID"].max()) else 1
+
+    def _registrar(self, operacao, os_id, campos):
+        """Acrescenta uma inclusão ou alteração ao journal, com custo independente do tamanho do histórico"""
+        linha = json.dumps({"op": operacao, "ID": int(os_id), "campos": campos}, ensure_ascii=False)
+        with self.lock:
+            with open(self.journal, "a", encoding="utf-8") as f:
+                f.write(linha + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def inserir(self, os_id, campos):
+        """Inclui uma OS; com os_id=None o ID é alocado sob a trava, sem colidir com outros processos"""
+        with self.trava:
+            if os_id is None:
+                os_id = self.proximo_id()
+            self._registrar("insert", os_id, campos)
+        return int(os_id)
+
+    def atualizar(self, os_id, campos, versao=None):
+        """Altera uma OS; com versao (de versao_registro), recusa a gravação se a OS mudou desde a leitura"""
+        with self.trava:
+            if versao is not None:
+                atual = self.obter(os_id)
+                if atual is None or versao_registro(atual) != versao:
+                    raise ConflitoEdicao(f"A OS {os_id} foi alterada por outra sessão")
+            self._registrar("update", os_id, campos)
+
+    def pendencias(self):
+        """Quantidade de alterações ainda não incorporadas ao CSV"""
+        if not os.path.exists(self.journal):
+            return 0
+        with open(self.journal, "rb") as f:
+            return f.read().count(b"\n")
+
+    def precisa_compactar(self):
+        return self._tamanho_journal() >= self.limite_journal
+
+    def _descartar_journal(self):
+        if os.path.exists(self.journal):
+            os.remove(self.journal)
+
+    def salvar_tabela(self, df):
+        """Substitui a tabela inteira; o CSV gravado já contém as alterações do journal"""
+        df = normalizar_tabela(df)
+        with self.trava, self.lock:
+            gravar_csv_atomico(df, self.arquivo)
+            self._publicar_colunar(df, identidade_arquivo(self.arquivo))
+            self._descartar_journal()
+            self.invalidar()
+
+    def compactar(self):
+        """Incorpora o journal ao CSV"""
+        with self.trava, self.lock:
+            self.salvar_tabela(self._tabela())
+
+    def _maior_id_em_disco(self):
+        """Maior ID do CSV e do journal, lendo do CSV só a coluna de IDs"""
+        ids = pd.read_csv(self.arquivo, usecols=["ID"])["ID"]
+        maior = int(ids.max()) if ids.notna().any() else 0
+        registros, _ = self._ler_journal(0)
+        return max([maior] + [int(registro["ID"]) for registro in registros])
+
+    def inserir_lotes(self, lotes, alocar=None):
+        """Inclui lotes de OS (tabelas no esquema, IDs ignorados) numa única gravação do CSV; retorna o total
+
+        Os IDs são alocados em bloco sob a trava (ou, com alocar(quantidade) -> primeiro ID, por quem
+        numera as OS de vários armazenamentos). O CSV atual é copiado, recebe os lotes no fim e substitui
+        o original de uma vez: leitores veem todas as OS novas ou nenhuma, e o journal continua valendo
+        sobre o novo snapshot. Só um lote fica na memória por vez.
+        """
+        with self.trava:
+            if list(pd.read_csv(self.arquivo, nrows=0).columns) != COLUNAS_OS:
+                self.compactar()  # Formato antigo ou outra ordem de colunas: regrava antes de acrescentar
+            proximo = self._maior_id_em_disco() + 1 if alocar is None else None
+            temporario = caminho_temporario(self.arquivo)
+            shutil.copy(self.arquivo, temporario)
+            total = 0
+            try:
+                with open(temporario, "a+", encoding="utf-8", newline="") as f:
+                    if f.tell() > 0:
+                        f.seek(f.tell() - 1)
+                        if f.read(1) != "\n":
+                            f.write("\n")
+                    for lote in lotes:
+                        inicio = proximo + total if alocar is None else alocar(len(lote))
+                        lote = lote.assign(ID=range(inicio, inicio + len(lote)))
+                        self._acrescentar_lote(f, lote[COLUNAS_OS])
+                        total += len(lote)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temporario, self.arquivo)
+            finally:
+                if os.path.exists(temporario):
+                    os.remove(temporario)
+            self.invalidar()
+        return total
+
+    def _acrescentar_lote(self, arquivo, lote):
+        """Escreve no CSV aberto um lote com os IDs já alocados"""
+        texto_para_gravacao(lote).to_csv(arquivo, header=False, index=False)
+
+    def ler_lotes(self, tamanho=50000, filtros=None, conclusao=None):
+        """Percorre a tabela (snapshot + journal) em lotes no esquema, sem carregá-la inteira na memória
+
+        conclusao=(desde, ate) restringe às OS concluídas no período. O arquivo e o journal são abertos sob a trava: o arquivo aberto continua sendo o mesmo snapshot
+        mesmo que outro processo compacte os dados durante a leitura.
+        """
+        with self.trava:
+            registros, _ = self._ler_journal(0)
+            arquivo = open(self.arquivo, encoding="utf-8")
+        # Campos do journal por ID (inclusões e alterações, na ordem): aplicados ao lote em que a OS aparece
+        pendentes = {}
+        inclusoes = set()
+        for registro in registros:
+            os_id = int(registro["ID"])
+            pendentes.setdefault(os_id, {}).update(registro["campos"])
+            if registro["op"] == "insert":
+                inclusoes.add(os_id)
+
+        with arquivo:
+            for bruto in pd.read_csv(arquivo, dtype=TIPOS_LEITURA, chunksize=tamanho):
+                lote = normalizar_tabela(bruto)
+                if pendentes:
+                    for posicao, os_id in enumerate(lote["ID"].tolist()):
+                        if os_id in pendentes:
+                            alterar_linha(lote, posicao, converter_campos(pendentes.pop(os_id)))
+                yield filtrar_conclusao(filtrar_tabela(lote, filtros), conclusao)
+
+        novas = [{**campos, "ID": os_id} for os_id, campos in pendentes.items() if os_id in inclusoes]
+        if novas:
+            yield filtrar_conclusao(filtrar_tabela(normalizar_tabela(pd.DataFrame(novas)), filtros), conclusao)
+
+    def restaurar(self, origem):
+        """Substitui os dados pelo conteúdo de um CSV (backup ou download), descartando o journal"""
+        with self.trava, self.lock:
+            temporario = caminho_temporario(self.arquivo)
+            shutil.copy(origem, temporario)
+            os.replace(temporario, self.arquivo)
+            self._descartar_journal()
+            self.invalidar()
+
+class ArmazenamentoSQLite(Observavel):
+    """Banco SQLite local com índices nas colunas filtradas pelas páginas; o CSV vira exportação"""
+
+    COLUNAS_INDEXADAS = ["Status", "Tipo", "Local", "Executante1", "Executante2", "Data"]
+
+    def __init__(self, arquivo_banco, arquivo_csv, limite_pendencias=200):
+        self._observadores = []
+        self.arquivo_banco = arquivo_banco
+        self.arquivo_csv = arquivo_csv
+        self.limite_pendencias = limite_pendencias
+        self.lock = threading.RLock()
+        self._versao = None
+        self._df = None
+        self._posicoes = {}
+        self._compartilhadas = set()  # Colunas de _df usadas também pelas tabelas entregues por carregar()
+
+        self.conexao = sqlite3.connect(arquivo_banco, check_same_thread=False)
+        self.conexao.create_function("contem", 2, self._contem, deterministic=True)
+        with self.conexao:
+            self.conexao.execute("PRAGMA journal_mode=WAL")
+            colunas = ", ".join('"ID" INTEGER PRIMARY KEY' if c == "ID" else f'"{c}" TEXT' for c in COLUNAS_OS)
+            self.conexao.execute(f"CREATE TABLE IF NOT EXISTS ordens ({colunas})")
+            self._criar_indices()
+            self.conexao.execute("CREATE TABLE IF NOT EXISTS controle (chave TEXT PRIMARY KEY, valor INTEGER)")
+            self.conexao.execute("INSERT OR IGNORE INTO controle VALUES ('versao', 0), ('pendencias', 0)")
+
+    def _criar_indices(self):
+        for coluna in self.COLUNAS_INDEXADAS:
+            self.conexao.execute(f'CREATE INDEX IF NOT EXISTS "idx_ordens_{coluna}" ON ordens ("{coluna}")')
+
+    @staticmethod
+    def _contem(texto, trecho):
+        """Busca por trecho sem diferenciar maiúsculas (o LIKE do SQLite só trata ASCII)"""
+        return texto is not None and str(trecho).casefold() in str(texto).casefold()
+
+    @staticmethod
+    def _valor(valor):
+        return None if pd.isna(valor) else valor
+
+    def _controle(self, chave):
+        return self.conexao.execute("SELECT valor FROM controle WHERE chave = ?", (chave,)).fetchone()[0]
+
+    def _registrar_alteracao(self):
+        self.conexao.execute("UPDATE controle SET valor = valor + 1 WHERE chave IN ('versao', 'pendencias')")
+
+    def _aplicar_em_memoria(self, versao_anterior, anterior, atual, campos=None):
+        """Reflete uma gravação própria na tabela em memória, se ela estava em dia, sem reler o banco
+
+        Na alteração, só os campos gravados são atribuídos à linha, localizada pelo índice de IDs.
+        """
+        if self._df is not None and self._versao == versao_anterior:
+            if anterior is None:
+                self._posicoes[int(atual["ID"])] = len(self._df)
+                self._df = acrescentar_linhas(self._df, normalizar_tabela(pd.DataFrame([atual])))
+            else:
+                alterar_linha(self._df, self._posicoes[int(atual["ID"])], campos, self._compartilhadas)
+            self._versao = self._controle("versao")
+        self._notificar_alteracao(anterior, atual)
+
+    def _ler(self, sql, parametros=()):
+        return normalizar_tabela(pd.read_sql_query(sql, self.conexao, params=parametros, dtype=TIPOS_LEITURA))
+
+    def invalidar(self):
+        with self.lock:
+            self._versao = None
+            self._df = None
+            self._posicoes = {}
+
+    def _tabela(self):
+        """Tabela completa em memória, relida apenas quando a versão do banco muda"""
+        with self.lock:
+            versao = self._controle("versao")
+            if self._versao != versao:
+                self._df = self._ler('SELECT * FROM ordens ORDER BY "ID"')
+                self._posicoes = indexar_ids(self._df)
+                self._compartilhadas = set()
+                self._versao = versao
+                self._notificar_recarga(self._df)
+            return self._df
+
+    def carregar(self):
+        with self.lock:
+            df = self._tabela()
+            self._compartilhadas = set(df.columns)  # Cada coluna é copiada na próxima alteração que a atingir
+            return df.copy(deep=False)
+
+    def contar(self):
+        with self.lock:
+            return self.conexao.execute("SELECT COUNT(*) FROM ordens").fetchone()[0]
+
+    @staticmethod
+    def _condicoes(filtros=None, busca=None):
+        """Cláusula WHERE (ou "") e parâmetros para filtros de igualdade e busca por trecho"""
+        condicoes = []
+        parametros = []
+        for coluna, valor in (filtros or {}).items():
+            if isinstance(valor, (list, tuple, set)):
+                valor = list(valor)
+                condicoes.append(f'"{validar_coluna(coluna)}" IN ({", ".join("?" * len(valor))})')
+                parametros.extend(valor)
+            else:
+                condicoes.append(f'"{validar_coluna(coluna)}" = ?')
+                parametros.append(valor)
+        if busca:
+            coluna, texto = busca
+            condicoes.append(f'contem("{validar_coluna(coluna)}", ?)')
+            parametros.append(texto)
+        return (" WHERE " + " AND ".join(condicoes) if condicoes else ""), parametros
+
+    def consultar(self, filtros=None, busca=None):
+        """Filtra no próprio banco, usando os índices, e só traz as linhas encontradas"""
+        condicoes, parametros = self._condicoes(filtros, busca)
+        with self.lock:
+            return self._ler(f'SELECT * FROM ordens{condicoes} ORDER BY "ID"', parametros)
+
+    def listar_abertas(self):
+        """OS ainda não concluídas, na ordem de ID"""
+        with self.lock:
+            return self._ler('SELECT * FROM ordens WHERE "Status" IS NULL OR "Status" <> ? ORDER BY "ID"', (STATUS_CONCLUIDO,))
+
+    def obter(self, os_id):
+        """Registro da OS como dicionário (None se não existir), lido pela chave primária"""
+        with self.lock:
+            df = self._ler('SELECT * FROM ordens WHERE "ID" = ?', (int(os_id),))
+        return df.iloc[0].to_dict() if not df.empty else None
+
+    def proximo_id(self):
+        with self.lock:
+            return self.conexao.execute('SELECT COALESCE(MAX("ID"), 0) + 1 FROM ordens').fetchone()[0]
+
+    def inserir(self, os_id, campos):
+        """Inclui uma OS; com os_id=None o SQLite aloca o ID (INTEGER PRIMARY KEY) na própria transação"""
+        registro = {coluna: "" for coluna in COLUNAS_OS}
+        registro.update(campos)
+        registro = converter_campos({**registro, "ID": os_id or 0})
+        valores = list(registro_para_gravacao(registro).values())
+        valores[COLUNAS_OS.index("ID")] = None if os_id is None else int(os_id)
+        colunas = ", ".join(f'"{c}"' for c in COLUNAS_OS)
+        with self.lock:
+            # BEGIN IMMEDIATE: a versão lida e a gravação ficam na mesma transação, sem escritas de outros processos no meio
+            with self.conexao:
+                self.conexao.execute("BEGIN IMMEDIATE")
+                versao_anterior = self._controle("versao")
+                cursor = self.conexao.execute(f"INSERT INTO ordens ({colunas}) VALUES ({', '.join('?' * len(COLUNAS_OS))})", valores)
+                registro["ID"] = cursor.lastrowid
+                self._registrar_alteracao()
+            self._aplicar_em_memoria(versao_anterior, None, registro)
+        return registro["ID"]
+
+    def atualizar(self, os_id, campos, versao=None):
+        """Altera uma OS; com versao (de versao_registro), recusa a gravação se a OS mudou desde a leitura"""
+        colunas = [validar_coluna(c) for c in campos]
+        atribuicoes = ", ".join(f'"{c}" = ?' for c in colunas)
+        campos = converter_campos(campos)
+        with self.lock:
+            with self.conexao:
+                self.conexao.execute("BEGIN IMMEDIATE")
+                versao_anterior = self._controle("versao")
+                anterior = self.obter(os_id)
+                if versao is not None and (anterior is None or versao_registro(anterior) != versao):
+                    raise ConflitoEdicao(f"A OS {os_id} foi alterada por outra sessão")
+                self.conexao.execute(f'UPDATE ordens SET {atribuicoes} WHERE "ID" = ?',
+                                     [registro_para_gravacao(campos)[c] for c in colunas] + [int(os_id)])
+                self._registrar_alteracao()
+            if anterior is not None:
+                self._aplicar_em_memoria(versao_anterior, anterior, {**anterior, **campos}, campos)
+
+    def pendencias(self):
+        with self.lock:
+            return self._controle("pendencias")
+
+    def precisa_compactar(self):
+        return self.pendencias() >= self.limite_pendencias
+
+    def importar(self, df):
+        """Substitui todo o conteúdo do banco pela tabela informada, numa única transação"""
+        df = texto_para_gravacao(normalizar_tabela(df))
+        colunas = ", ".join(f'"{c}"' for c in COLUNAS_OS)
+        linhas = [[self._valor(v) for v in linha] for linha in df[COLUNAS_OS].itertuples(index=False)]
+        with self.lock, self.conexao:
+            self.conexao.execute("DELETE FROM ordens")
+            self.conexao.executemany(f"INSERT INTO ordens ({colunas}) VALUES ({', '.join('?' * len(COLUNAS_OS))})", linhas)
+            # O conteúdo veio de um CSV: não há alterações a exportar
+            self.conexao.execute("UPDATE controle SET valor = CASE chave WHEN 'versao' THEN valor + 1 ELSE 0 END")
+        return len(linhas)
+
+    def inserir_lotes(self, lotes, alocar=None):
+        """Inclui lotes de OS (tabelas no esquema, IDs ignorados) numa única transação; retorna o total
+
+        Os IDs são alocados em bloco dentro da transação (ou por alocar(quantidade) -> primeiro ID, como
+        no CSV); cada OS conta como uma pendência de exportação.
+        Quando a carga passa do tamanho da tabela, os índices são recriados no fim (ordenar tudo de uma vez
+        custa bem menos que atualizá-los linha a linha); se a transação falhar, eles voltam como estavam.
+        """
+        colunas = ", ".join(f'"{c}"' for c in COLUNAS_OS)
+        total = 0
+        with self.lock:
+            with self.conexao:
+                self.conexao.execute("BEGIN IMMEDIATE")
+                proximo = self.proximo_id()
+                existentes = self.conexao.execute("SELECT COUNT(*) FROM ordens").fetchone()[0]
+                sem_indices = False
+                for lote in lotes:
+                    if not sem_indices and total + len(lote) > existentes:
+                        for coluna in self.COLUNAS_INDEXADAS:
+                            self.conexao.execute(f'DROP INDEX IF EXISTS "idx_ordens_{coluna}"')
+                        sem_indices = True
+                    inicio = proximo + total if alocar is None else alocar(len(lote))
+                    lote = texto_para_gravacao(lote.assign(ID=range(inicio, inicio + len(lote))))
+                    lote = lote[COLUNAS_OS].astype(object)
+                    linhas = lote.where(lote.notna(), None).itertuples(index=False, name=None)
+                    self.conexao.executemany(f"INSERT INTO ordens ({colunas}) VALUES ({', '.join('?' * len(COLUNAS_OS))})", linhas)
+                    total += len(lote)
+                if sem_indices:
+                    self._criar_indices()
+                self.conexao.execute("UPDATE controle SET valor = valor + CASE chave WHEN 'versao' THEN 1 ELSE ? END", (total,))
+        return total
+
+    def ler_lotes(self, tamanho=50000, filtros=None, conclusao=None):
+        """Percorre a tabela em lotes no esquema, sem carregá-la inteira na memória
+
+        conclusao=(desde, ate) restringe às OS concluídas no período. Usa uma conexão própria: a
+        consulta lê um único snapshot do banco (WAL) sem bloquear as gravações.
+        """
+        for lote in self._lotes_texto(tamanho, filtros):
+            yield filtrar_conclusao(normalizar_tabela(lote), conclusao)
+
+    def _lotes_texto(self, tamanho=50000, filtros=None):
+        """Lotes como gravados no banco (o mesmo texto do CSV), numa conexão própria"""
+        condicoes, parametros = self._condicoes(filtros)
+        conexao = sqlite3.connect(self.arquivo_banco)
+        try:
+            yield from pd.read_sql_query(f'SELECT * FROM ordens{condicoes} ORDER BY "ID"', conexao,
+                                         params=parametros, dtype=TIPOS_LEITURA, chunksize=tamanho)
+        finally:
+            conexao.close()
+
+    def compactar(self):
+        """Exporta o banco para o CSV local, usado pelos backups e pela sincronização com o GitHub
+
+        Com a tabela em memória e em dia, grava a partir dela; senão copia o texto do banco em lotes,
+        sem carregá-lo inteiro nem convertê-lo.
+        """
+        with self.lock:
+            if self._df is not None and self._versao == self._controle("versao"):
+                gravar_csv_atomico(self._df, self.arquivo_csv)
+            else:
+                gravar_lotes_csv_atomico(self._lotes_texto(), self.arquivo_csv)
+            with self.conexao:
+                self.conexao.execute("UPDATE controle SET valor = 0 WHERE chave = 'pendencias'")
+
+    def salvar_tabela(self, df):
+        with self.lock:
+            self.importar(df)
+            self.compactar()
+
+    def restaurar(self, origem):
+        self.salvar_tabela(ler_csv(origem))
+
+def migrar_csv_para_sqlite(arquivo_csv, arquivo_banco):
+    """Importa o CSV de ordens para o banco SQLite (substituindo o conteúdo existente)"""
+    banco = ArmazenamentoSQLite(arquivo_banco, arquivo_csv)
+    try:
+        return banco.importar(ler_csv(arquivo_csv))
+    finally:
+        banco.conexao.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ferramentas de armazenamento das ordens de serviço")
+    subcomandos = parser.add_subparsers(dest="comando", required=True)
+    migrar = subcomandos.add_parser("migrar", help="Importa o CSV de ordens para um banco SQLite")
+    migrar.add_argument("--csv", default="ordens_servico4.0.csv")
+    migrar.add_argument("--banco", default="ordens_servico4.0.db")
+    args = parser.parse_args()
+
+    if args.comando == "migrar":
+        total = migrar_csv_para_sqlite(args.csv, args.banco)
+        print(f"{total} ordens importadas de {args.csv} para {args.banco}")
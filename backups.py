@@ -0,0 +1,230 @@
+"""Repositório de backups comprimidos e endereçados pelo conteúdo.
+
+Cada backup é registrado no manifesto (manifesto.json) com data, tamanho e
+SHA-256 do CSV. O conteúdo fica em objetos gzip nomeados pelo hash, de modo
+que versões idênticas não são gravadas duas vezes. Entre dois backups
+completos, os intermediários são deltas: referências às linhas do último
+completo mais as linhas novas. A retenção mantém o backup mais recente de
+cada hora, de cada dia e de cada mês dentro das janelas configuradas.
+"""
+import glob
+import gzip
+import hashlib
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+from travas import TravaArquivo, caminho_temporario, identidade_arquivo
+
+RETENCAO_PADRAO = {"horas": 48, "dias": 60, "meses": 24}
+
+def calcular_delta(linhas_base, linhas):
+    """Descreve as linhas em função das linhas da base: ["r", início, quantidade] ou ["l", [linhas novas]]"""
+    posicoes = {}
+    for i, linha in enumerate(linhas_base):
+        posicoes.setdefault(linha, i)
+
+    operacoes = []
+    for linha in linhas:
+        i = posicoes.get(linha)
+        if i is not None:
+            if operacoes and operacoes[-1][0] == "r" and operacoes[-1][1] + operacoes[-1][2] == i:
+                operacoes[-1][2] += 1
+            else:
+                operacoes.append(["r", i, 1])
+        elif operacoes and operacoes[-1][0] == "l":
+            operacoes[-1][1].append(linha)
+        else:
+            operacoes.append(["l", [linha]])
+    return operacoes
+
+def aplicar_delta(linhas_base, operacoes):
+    linhas = []
+    for operacao in operacoes:
+        if operacao[0] == "r":
+            linhas.extend(linhas_base[operacao[1]:operacao[1] + operacao[2]])
+        else:
+            linhas.extend(operacao[1])
+    return linhas
+
+class RepositorioBackups:
+    """Backups comprimidos, sem duplicatas, com manifesto e retenção por hora/dia/mês"""
+
+    def __init__(self, diretorio, retencao=None, deltas_por_completo=20, agora=None):
+        self.diretorio = diretorio
+        self.retencao = retencao or RETENCAO_PADRAO
+        self.deltas_por_completo = deltas_por_completo
+        # Relógio das datas do manifesto e da retenção (o serviço passa o horário local do sistema, UTC-3)
+        self.agora = agora or datetime.now
+        self.arquivo_manifesto = os.path.join(diretorio, "manifesto.json")
+        self._identidade = None
+        self._entradas = []
+
+        os.makedirs(diretorio, exist_ok=True)
+        # Outros processos podem criar backups e aplicar a retenção: manifesto e objetos só mudam sob a trava
+        self.lock = TravaArquivo(os.path.join(diretorio, "manifesto.lock"))
+        with self.lock:
+            if not os.path.exists(self.arquivo_manifesto):
+                self._importar_legados()
+
+    def _atualizar(self):
+        """Relê o manifesto se outro processo o alterou desde a última leitura"""
+        if os.path.exists(self.arquivo_manifesto):
+            identidade = identidade_arquivo(self.arquivo_manifesto)
+            if identidade != self._identidade:
+                with open(self.arquivo_manifesto, encoding="utf-8") as f:
+                    self._entradas = json.load(f)
+                self._identidade = identidade
+
+    def _gravar_manifesto(self):
+        temporario = caminho_temporario(self.arquivo_manifesto)
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump(self._entradas, f, ensure_ascii=False, indent=1)
+        os.replace(temporario, self.arquivo_manifesto)
+        self._identidade = identidade_arquivo(self.arquivo_manifesto)
+
+    def _caminho(self, objeto):
+        return os.path.join(self.diretorio, objeto)
+
+    def _gravar_objeto(self, objeto, dados):
+        """Grava um objeto comprimido; se já existir (mesmo conteúdo), nada é regravado"""
+        caminho = self._caminho(objeto)
+        if not os.path.exists(caminho):
+            temporario = caminho_temporario(caminho)
+            with open(temporario, "wb") as f:
+                f.write(gzip.compress(dados, compresslevel=6))
+            os.replace(temporario, caminho)
+        return os.path.getsize(caminho)
+
+    def _ler_objeto(self, objeto):
+        with open(self._caminho(objeto), "rb") as f:
+            return gzip.decompress(f.read())
+
+    def _importar_legados(self):
+        """Incorpora os backups em CSV simples gerados pelas versões anteriores"""
+        legados = glob.glob(os.path.join(self.diretorio, "ordens_servico_*.csv"))
+        legados += glob.glob(os.path.join(self.diretorio, "ordens_servico4.0_*.csv"))
+        for caminho in sorted(legados, key=os.path.getmtime):
+            momento = self.agora() - timedelta(seconds=time.time() - os.path.getmtime(caminho))
+            self.criar(caminho, momento=momento, aplicar_retencao=False)
+            os.remove(caminho)
+        if legados:
+            self.aplicar_retencao()
+        self._gravar_manifesto()
+
+    def listar(self):
+        """Entradas do manifesto, da mais recente para a mais antiga"""
+        with self.lock:
+            self._atualizar()
+            return list(reversed(self._entradas))
+
+    def ultimo(self):
+        with self.lock:
+            self._atualizar()
+            return self._entradas[-1] if self._entradas else None
+
+    def criar(self, arquivo, momento=None, aplicar_retencao=True):
+        """Registra um backup do arquivo; retorna (entrada, criado) — criado=False se nada mudou"""
+        with open(arquivo, "rb") as f:
+            dados = f.read()
+        sha256 = hashlib.sha256(dados).hexdigest()
+        momento = momento or self.agora()
+
+        with self.lock:
+            self._atualizar()
+            if self._entradas and self._entradas[-1]["sha256"] == sha256:
+                return self._entradas[-1], False
+
+            entrada = {
+                "nome": self._nome_livre(f"ordens_servico_{momento.strftime('%Y%m%d_%H%M%S')}"),
+                "criado_em": momento.isoformat(timespec="seconds"),
+                "sha256": sha256,
+                "tamanho": len(dados),
+                "tipo": "completo",
+                "objeto": f"{sha256}.csv.gz",
+                "base": None
+            }
+
+            completos = [i for i, e in enumerate(self._entradas) if e["tipo"] == "completo"]
+            if completos and len(self._entradas) - 1 - completos[-1] < self.deltas_por_completo:
+                base = self._entradas[completos[-1]]
+                linhas_base = self._ler_objeto(base["objeto"]).decode("utf-8").splitlines(keepends=True)
+                delta = json.dumps(calcular_delta(linhas_base, dados.decode("utf-8").splitlines(keepends=True)),
+                                   ensure_ascii=False).encode("utf-8")
+                # Delta só compensa se ficar bem menor que um backup completo
+                if len(gzip.compress(delta, compresslevel=1)) < os.path.getsize(self._caminho(base["objeto"])) / 2:
+                    entrada.update(tipo="delta", objeto=f"{sha256}.delta.gz", base=base["objeto"])
+                    dados = delta
+
+            entrada["tamanho_comprimido"] = self._gravar_objeto(entrada["objeto"], dados)
+            self._entradas.append(entrada)
+            if aplicar_retencao:
+                self.aplicar_retencao()
+            else:
+                self._gravar_manifesto()
+            return entrada, True
+
+    def _nome_livre(self, nome):
+        existentes = {e["nome"] for e in self._entradas}
+        candidato, n = nome, 1
+        while candidato in existentes:
+            n += 1
+            candidato = f"{nome}_{n}"
+        return candidato
+
+    def conteudo(self, nome):
+        """Reconstrói o CSV de um backup e confere o checksum registrado no manifesto"""
+        with self.lock:
+            self._atualizar()
+            entrada = next((e for e in self._entradas if e["nome"] == nome), None)
+            if entrada is None:
+                raise KeyError(f"Backup não encontrado: {nome}")
+            dados = self._ler_objeto(entrada["objeto"])
+            if entrada["tipo"] == "delta":
+                linhas_base = self._ler_objeto(entrada["base"]).decode("utf-8").splitlines(keepends=True)
+                dados = "".join(aplicar_delta(linhas_base, json.loads(dados))).encode("utf-8")
+        if hashlib.sha256(dados).hexdigest() != entrada["sha256"]:
+            raise ValueError(f"Backup corrompido (checksum não confere): {nome}")
+        return dados
+
+    def extrair(self, nome, destino):
+        """Grava o CSV de um backup em destino"""
+        with open(destino, "wb") as f:
+            f.write(self.conteudo(nome))
+        return destino
+
+    def aplicar_retencao(self, agora=None):
+        """Mantém o backup mais recente de cada hora, dia e mês dentro das janelas da política"""
+        agora = agora or self.agora()
+        with self.lock:
+            self._atualizar()
+            mantidos = set()
+            periodos = set()
+            for entrada in reversed(self._entradas):
+                momento = datetime.fromisoformat(entrada["criado_em"])
+                idade = agora - momento
+                if idade <= timedelta(hours=self.retencao["horas"]):
+                    periodo = ("hora", momento.strftime("%Y%m%d%H"))
+                elif idade <= timedelta(days=self.retencao["dias"]):
+                    periodo = ("dia", momento.strftime("%Y%m%d"))
+                elif idade <= timedelta(days=31 * self.retencao["meses"]):
+                    periodo = ("mes", momento.strftime("%Y%m"))
+                else:
+                    continue
+                if periodo not in periodos:
+                    periodos.add(periodo)
+                    mantidos.add(entrada["nome"])
+            if self._entradas:
+                mantidos.add(self._entradas[-1]["nome"])
+
+            removidos = [e for e in self._entradas if e["nome"] not in mantidos]
+            self._entradas = [e for e in self._entradas if e["nome"] in mantidos]
+            # Objetos usados como base por deltas mantidos não podem ser apagados
+            referenciados = {e["objeto"] for e in self._entradas} | {e["base"] for e in self._entradas if e["base"]}
+            self._gravar_manifesto()
+
+            for objeto in {e["objeto"] for e in removidos} - referenciados:
+                if os.path.exists(self._caminho(objeto)):
+                    os.remove(self._caminho(objeto))
+            return len(removidos)
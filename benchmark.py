@@ -0,0 +1,451 @@
+"""Benchmarks das operações mais usadas, sobre tabelas de ordens sintéticas.
+
+O gerador produz tabelas no formato gravado em disco com as proporções do
+ordens_servico4.0.csv (tipos, status, locais com grafias variadas,
+executantes, descrições curtas) e datas misturando dd/mm/aa, dd/mm/aaaa e
+algumas incompletas. A mesma semente gera sempre a mesma tabela.
+
+Cada cenário é medido em cada tamanho e armazenamento, num processo próprio
+(sem caches nem memória de rodadas anteriores): a primeira execução, que
+inclui a montagem de índices, é guardada separada da mediana. O pico de
+memória vem de uma execução extra sob o tracemalloc (vê os arrays do numpy e
+do pandas, não os buffers do Arrow). Os resultados vão para um JSON com a
+versão do código, e o subcomando comparar aponta regressões entre dois deles.
+
+    python benchmark.py gerar historico_1m.csv.gz --linhas 1000000
+    python benchmark.py executar --tamanhos 1000,10000,100000 --saida antes.json
+    python benchmark.py executar --tamanhos 1000000 --armazenamentos particionado --cenarios carregar,abrir
+    python benchmark.py comparar antes.json depois.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SEMENTE = 40
+TAMANHOS = [1000, 10000, 100000]
+ARMAZENAMENTOS = ["csv", "sqlite", "particionado"]
+REPETICOES = 3
+TOLERANCIA = 0.2  # Aumento da mediana considerado regressão no comparar
+DIFERENCA_MINIMA = 0.005  # Segundos; abaixo disso a variação é ruído
+OPERACOES_POR_RODADA = 50  # Atualizações e cadastros por execução
+PAGINAS = 5
+
+# Proporções do ordens_servico4.0.csv
+TIPOS = {"Instalação": 192, "Elétrica": 190, "Civil": 166, "Mecânica": 147, "Hidráulica": 51, "Refrigeração": 43, "": 2}
+STATUS = {"Concluído": 775, "Pendente": 11, "Pausado": 5, "Em execução": 2}
+LOCAIS = {"Corte": 93, "Filial": 82, "Acabamento": 72, "Matriz": 66, "Expedição": 41, "SCI": 35, "ADM": 21,
+          "Estúdio": 20, "Estamparia": 19, "Estoque": 19, "CD": 14, "Produção": 14, "RH": 12, "Revisão": 12,
+          "Marketing": 12, "Refeitório": 10, "PPCP": 9, "Pilotagem": 7, "Compras": 7, "Financeiro": 6,
+          "Controladoria": 6, "Qualidade": 6, "Engenharia": 5, "Diretoria": 5, "ETE": 5, "Estoque de tecidos": 8,
+          "Administrativo": 4, "Manutenção": 4, "T.I.": 4, "Recepção": 3, "Pátio": 3, "E-commerce": 10,
+          "Almoxarifado": 4, "Laboratório": 3, "Modelagem": 2, "Showroom": 3}
+EXECUTANTES = {"Guilherme": 405, "Robson": 269, "Paulinho": 101, "": 16}
+SOLICITANTES = {"Robson": 181, "Fran Duarte": 130, "Rafael": 33, "Joelson": 33, "Diego": 32, "Weder": 32,
+                "Jair": 29, "Vini": 26, "Renato Silva": 30, "David": 16, "Isabela": 16, "Nélio": 15, "Isis": 9,
+                "Guilherme": 9, "Mayko": 16, "Tatiana": 8, "Fran Aguiar": 8, "Maitê": 6, "Wesley": 6}
+ACOES = ["Trocar", "Reparar", "Instalar", "Verificar", "Limpar", "Orçar", "Consertar", "Pintar", "Comprar e instalar",
+         "Desentupir", "Ajustar", "Substituir", "Revisar"]
+OBJETOS = ["lâmpada queimada", "tomada", "ar condicionado", "torneira", "fechadura", "porta de vidro", "bomba de água",
+           "compressor", "ventilador", "prateleiras", "máquina de enfestar", "fita LED", "disjuntor", "cadeira",
+           "paleteira", "calha", "rede de esgoto", "luz de emergência", "registro", "bebedouro", "forro", "piso",
+           "motor da esteira", "quadro elétrico", "mesa de corte", "cortina de ar", "filtro", "janela"]
+COMPLEMENTOS = ["", "", "", "do banheiro feminino", "do banheiro masculino", "da copa", "do corredor B",
+                "da sala de reunião", "do refeitório", "no pátio", "da recepção", "com vazamento", "com defeito",
+                "que está fazendo barulho", "da máquina de costura", "do mezanino"]
+FRACAO_ANO_CURTO = 0.92  # Datas dd/mm/aa; as demais dd/mm/aaaa
+FRACAO_DATA_INCOMPLETA = 0.015  # Datas sem ano (ex.: "19/7"), que viram vazias na leitura
+FRACAO_LOCAL_VARIANTE = 0.05  # Locais com espaços sobrando ou caixa diferente
+FRACAO_HORA = 0.03
+FRACAO_URGENTE = 0.005
+FRACAO_NAO_URGENTE = 0.003
+FRACAO_EXECUTANTE2 = 0.004
+FRACAO_OBSERVACOES = 0.02
+ORDENS_POR_DIA = 2.6
+INICIO = np.datetime64("2016-01-04")
+DIAS_MAXIMOS = 3650  # Tabelas grandes ficam mais densas em vez de passar de 10 anos
+MEDIA_DIAS_CONCLUSAO = 7
+
+def _sortear(rng, pesos, quantidade):
+    """Valores de um dicionário {valor: peso} sorteados conforme os pesos (como array de objetos)"""
+    valores = np.array(list(pesos), dtype=object)
+    probabilidades = np.array(list(pesos.values()), dtype=float)
+    return valores[rng.choice(len(valores), quantidade, p=probabilidades / probabilidades.sum())]
+
+def _sortear_igual(rng, valores, quantidade):
+    """Itens de uma lista sorteados com a mesma chance (repetidos contam mais)"""
+    return np.array(valores, dtype=object)[rng.integers(0, len(valores), quantidade)]
+
+def _datas_texto(rng, dias, curtas):
+    """Dias (desde INICIO) como texto dd/mm/aa ou dd/mm/aaaa, formatando cada dia distinto uma única vez"""
+    codigos, unicos = pd.factorize(dias)
+    datas = pd.DatetimeIndex(INICIO + unicos.astype("timedelta64[D]"))
+    formatos = [np.asarray(datas.strftime(formato), dtype=object) for formato in ("%d/%m/%Y", "%d/%m/%y")]
+    texto = np.where(curtas, formatos[1][codigos], formatos[0][codigos])
+    incompletas = rng.random(len(dias)) < FRACAO_DATA_INCOMPLETA
+    texto[incompletas] = np.asarray(datas.strftime("%d/%m").str.lstrip("0"), dtype=object)[codigos[incompletas]]
+    return texto
+
+def gerar_ordens(linhas, semente=SEMENTE):
+    """Tabela sintética de ordens no formato do CSV (texto), sempre a mesma para a mesma semente"""
+    rng = np.random.default_rng(semente)
+    periodo = int(min(max(linhas / ORDENS_POR_DIA, 30), DIAS_MAXIMOS))
+    abertura = np.sort(rng.integers(0, periodo, linhas))
+    status = _sortear(rng, STATUS, linhas)
+    concluidas = status == "Concluído"
+    com_executante = concluidas | (status == "Em execução")
+    curtas = rng.random(linhas) < FRACAO_ANO_CURTO
+
+    descricao = _sortear_igual(rng, ACOES, linhas) + " " + _sortear_igual(rng, OBJETOS, linhas)
+    complemento = _sortear_igual(rng, COMPLEMENTOS, linhas)
+    descricao = np.where(complemento != "", descricao + " " + complemento, descricao)
+
+    local = _sortear(rng, LOCAIS, linhas)
+    variantes = rng.random(linhas) < FRACAO_LOCAL_VARIANTE
+    local[variantes] = [valor + "  " if i % 2 else valor.upper() for i, valor in enumerate(local[variantes])]
+
+    horas = np.array([f"{h}:{m:02d}" for h in range(7, 18) for m in range(0, 60, 5)], dtype=object)
+    hora_abertura = np.where(rng.random(linhas) < FRACAO_HORA, horas[rng.integers(0, len(horas), linhas)], "")
+    hora_conclusao = np.where(concluidas & (rng.random(linhas) < FRACAO_HORA), horas[rng.integers(0, len(horas), linhas)], "")
+    conclusao = _datas_texto(rng, abertura + rng.geometric(1 / MEDIA_DIAS_CONCLUSAO, linhas) - 1, curtas)
+
+    urgencia = rng.random(linhas)
+    executante2 = _sortear(rng, {nome: peso for nome, peso in EXECUTANTES.items() if nome}, linhas)
+    return pd.DataFrame({
+        "ID": np.arange(1, linhas + 1),
+        "Descrição": descricao,
+        "Data": _datas_texto(rng, abertura, curtas),
+        "Hora Abertura": hora_abertura,
+        "Solicitante": _sortear(rng, SOLICITANTES, linhas),
+        "Local": local,
+        "Tipo": _sortear(rng, TIPOS, linhas),
+        "Status": status,
+        "Data Conclusão": np.where(concluidas, conclusao, ""),
+        "Hora Conclusão": hora_conclusao,
+        "Executante1": np.where(com_executante, _sortear(rng, EXECUTANTES, linhas), ""),
+        "Executante2": np.where(com_executante & (rng.random(linhas) < FRACAO_EXECUTANTE2), executante2, ""),
+        "Urgente": np.where(urgencia < FRACAO_URGENTE, "Sim", np.where(urgencia < FRACAO_URGENTE + FRACAO_NAO_URGENTE, "Não", "")),
+        "Observações": np.where(rng.random(linhas) < FRACAO_OBSERVACOES, "Aguardando peça do fornecedor", ""),
+    })
+
+# Cenários: cada um recebe a rodada e devolve a função medida (o que vem antes dela é preparação, fora do tempo)
+
+class Rodada:
+    """Diretório de dados de um tamanho e armazenamento, com o serviço já aberto"""
+
+    def __init__(self, diretorio, armazenamento, linhas, semente):
+        from servico import ServicoOS
+        self.diretorio = diretorio
+        self.armazenamento = armazenamento
+        self.linhas = linhas
+        self.rng = np.random.default_rng(semente)
+        self.servico = ServicoOS(diretorio, armazenamento)
+        self.despachadas = []  # (ID, campos de antes) das OS despachadas pela última execução do cenário despacho
+
+    def novo_servico(self):
+        from servico import ServicoOS
+        return ServicoOS(self.diretorio, self.armazenamento)
+
+    def ids_sorteados(self, quantidade, ids=None):
+        """IDs sorteados entre os informados (padrão: todos)"""
+        ids = np.arange(1, self.linhas + 1) if ids is None else np.asarray(ids)
+        return [int(os_id) for os_id in self.rng.choice(ids, quantidade)]
+
+def cenario_carregar(rodada):
+    """Tabela completa lida do disco por um serviço recém-criado"""
+    return lambda: rodada.novo_servico().carregar()
+
+def cenario_abrir(rodada):
+    """O que a primeira página do aplicativo monta: total, cubo, índices e OS em aberto"""
+    def executar():
+        servico = rodada.novo_servico()
+        servico.contar()
+        servico.cubo
+        servico.indice_busca
+        servico.indice_paginacao
+        servico.listar_abertas()
+    return executar
+
+def cenario_filtrar(rodada):
+    """Filtros da busca por status, por trecho de local e por ID"""
+    ids = rodada.ids_sorteados(20)
+    def executar():
+        rodada.servico.consultar({"Status": "Pendente"})
+        rodada.servico.consultar(busca=("Local", "expedi"))
+        for os_id in ids:
+            rodada.servico.consultar({"ID": os_id})
+    return executar
+
+def cenario_pesquisar(rodada):
+    """Busca textual pelo índice, com vários termos e trecho de palavra"""
+    def executar():
+        for texto in ("lâmpada", "bomba agua", "vazam", "ar condicionado refeitório"):
+            rodada.servico.pesquisar(texto, limite=50)
+    return executar
+
+def cenario_paginar(rodada):
+    """Primeiras páginas das concluídas, da mais recente à mais antiga"""
+    def executar():
+        cursor = None
+        for _ in range(PAGINAS):
+            _, cursor, _ = rodada.servico.pagina("Data", {"Status": "Concluído"}, cursor, 50, decrescente=True)
+    return executar
+
+def cenario_dashboard(rodada):
+    """Cubo refeito da tabela e as contagens dos gráficos do dashboard"""
+    def executar():
+        rodada.servico.recalcular_indicadores()
+        for dimensao in ("Tipo", "Status", "Local", "Mês", "Executante"):
+            rodada.servico.contagem(dimensao)
+            rodada.servico.contagem(dimensao, Status="Concluído")
+    return executar
+
+def cenario_indicadores(rodada):
+    """Indicadores preparados do zero (dados novos) e todas as consultas das abas de atendimento, backlog e vazão"""
+    agora = rodada.servico.carregar()["Data"].max()
+    def executar():
+        rodada.servico.indicadores.invalidar()
+        indicadores = rodada.servico.tabela_indicadores()
+        for agrupar in ("Tipo", "Local", "Urgente"):
+            indicadores.tempo_atendimento(agrupar)
+        indicadores.distribuicao_atendimento()
+        indicadores.idade_aberta(agora)
+        indicadores.envelhecimento(agora)
+        indicadores.envelhecimento(agora, "Tipo")
+        indicadores.backlog_semanal(agora, 52)
+        indicadores.vazao(agora, 4)
+    return executar
+
+def cenario_despacho(rodada):
+    """Tela de despacho (próxima OS, sugestão de executante, fila e cargas) seguida do despacho da OS, várias vezes
+
+    As OS despachadas pela execução anterior voltam à fila antes da próxima, e cada execução despacha no máximo
+    as OS da fila: com poucas OS em aberto (tabelas pequenas), todas as execuções medem o mesmo trabalho.
+    """
+    for os_id, campos in rodada.despachadas:
+        rodada.servico.atualizar(os_id, campos)
+    rodada.despachadas.clear()
+    quantidade = min(OPERACOES_POR_RODADA, len(rodada.servico.despacho))  # Fila montada antes da medição
+    def executar():
+        for _ in range(quantidade):
+            registro, _ = rodada.servico.proxima_os()
+            rodada.servico.fila_despacho(20)
+            rodada.servico.cargas_executantes()
+            rodada.servico.despachar()
+            rodada.despachadas.append((registro["ID"], {coluna: "" if pd.isna(registro[coluna]) else registro[coluna]
+                                                        for coluna in ("Status", "Executante1")}))
+    return executar
+
+def cenario_atualizar(rodada):
+    """Atualizações de OS em aberto sorteadas, como feitas pela página de atualização"""
+    ids = rodada.ids_sorteados(OPERACOES_POR_RODADA, rodada.servico.listar_abertas()["ID"])
+    executantes = [nome for nome in EXECUTANTES if nome]
+    def executar():
+        for i, os_id in enumerate(ids):
+            rodada.servico.atualizar(os_id, {"Status": "Em execução", "Executante1": executantes[i % len(executantes)],
+                                             "Observações": f"Atualização {i}"})
+    return executar
+
+def cenario_cadastrar(rodada):
+    """Cadastros de OS novas"""
+    def executar():
+        for i in range(OPERACOES_POR_RODADA):
+            rodada.servico.cadastrar(f"Trocar lâmpada {i}", "Robson", "Matriz")
+    return executar
+
+def cenario_exportar(rodada):
+    """Tabela inteira lida em lotes, como na exportação"""
+    return lambda: sum(len(lote) for lote in rodada.servico.exportar_lotes())
+
+def cenario_salvar(rodada):
+    """Tabela inteira regravada (restauração de backup, download do GitHub)"""
+    tabela = rodada.servico.carregar()
+    return lambda: rodada.servico.armazenamento.salvar_tabela(tabela)
+
+CENARIOS = {
+    "carregar": cenario_carregar,
+    "abrir": cenario_abrir,
+    "filtrar": cenario_filtrar,
+    "pesquisar": cenario_pesquisar,
+    "paginar": cenario_paginar,
+    "dashboard": cenario_dashboard,
+    "indicadores": cenario_indicadores,
+    "despacho": cenario_despacho,
+    "atualizar": cenario_atualizar,
+    "cadastrar": cenario_cadastrar,
+    "exportar": cenario_exportar,
+    "salvar": cenario_salvar,
+}
+
+def medir(rodada, cenario, repeticoes, memoria=True):
+    """Tempos de cada execução (a primeira à parte) e o pico de memória de uma execução extra"""
+    tempos = []
+    for _ in range(repeticoes):
+        executar = CENARIOS[cenario](rodada)
+        inicio = time.perf_counter()
+        executar()
+        tempos.append(time.perf_counter() - inicio)
+    resultado = {"primeira": tempos[0], "mediana": statistics.median(tempos), "minimo": min(tempos), "tempos": tempos}
+    if memoria:
+        executar = CENARIOS[cenario](rodada)
+        tracemalloc.start()
+        try:
+            executar()
+            resultado["pico_memoria_mb"] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        finally:
+            tracemalloc.stop()
+    return resultado
+
+def memoria_maxima_mb():
+    """Maior memória residente do processo até agora (None sem o módulo resource)"""
+    if resource is None:
+        return None
+    maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maximo / 2 ** 20 if sys.platform == "darwin" else maximo / 2 ** 10  # bytes no macOS, KB no Linux
+
+def executar_grupo(arquivo_dados, armazenamento, linhas, cenarios, repeticoes, memoria, semente):
+    """Mede os cenários de um tamanho e armazenamento num diretório temporário; roda num processo próprio"""
+    from servico import LOCAL_FILENAME
+    diretorio = tempfile.mkdtemp(prefix=f"benchmark_{armazenamento}_{linhas}_")
+    try:
+        shutil.copy(arquivo_dados, os.path.join(diretorio, LOCAL_FILENAME))
+        inicio = time.perf_counter()
+        rodada = Rodada(diretorio, armazenamento, linhas, semente)
+        rodada.servico.inicializar_arquivos()
+        rodada.servico.contar()  # Migração para o banco ou divisão em partições, quando houver
+        resultados = [{"cenario": "preparar", "armazenamento": armazenamento, "linhas": linhas,
+                       "primeira": time.perf_counter() - inicio}]
+        for cenario in cenarios:
+            resultado = medir(rodada, cenario, repeticoes, memoria)
+            resultados.append({"cenario": cenario, "armazenamento": armazenamento, "linhas": linhas, **resultado})
+            print(f"  {armazenamento:>12} {linhas:>8} {cenario:<10} mediana {resultado['mediana']:.4f} s"
+                  f" (primeira {resultado['primeira']:.4f} s)", file=sys.stderr)
+        for resultado in resultados:
+            resultado["memoria_maxima_processo_mb"] = memoria_maxima_mb()
+        return resultados
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+def versao_do_codigo():
+    """Commit do git (com "+" se houver alterações não registradas), ou None fora de um repositório"""
+    diretorio = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=diretorio, capture_output=True, text=True, check=True).stdout.strip()
+        alterado = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=diretorio,
+                                  capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ("+" if alterado else "")
+
+def ambiente():
+    import pyarrow
+    return {"commit": versao_do_codigo(), "python": platform.python_version(), "pandas": pd.__version__,
+            "numpy": np.__version__, "pyarrow": pyarrow.__version__, "sistema": platform.platform(),
+            "processador": platform.processor() or platform.machine(), "cpus": os.cpu_count()}
+
+def executar(tamanhos, armazenamentos, cenarios, repeticoes, memoria=True, semente=SEMENTE):
+    """Mede todos os cenários; retorna o documento de resultados"""
+    documento = {"data": datetime.now().isoformat(timespec="seconds"), "ambiente": ambiente(),
+                 "parametros": {"tamanhos": tamanhos, "armazenamentos": armazenamentos, "cenarios": cenarios,
+                                "repeticoes": repeticoes, "semente": semente},
+                 "resultados": []}
+    diretorio_dados = tempfile.mkdtemp(prefix="benchmark_dados_")
+    try:
+        for linhas in tamanhos:
+            arquivo_dados = os.path.join(diretorio_dados, f"ordens_{linhas}.csv")
+            gerar_ordens(linhas, semente).to_csv(arquivo_dados, index=False)
+            for armazenamento in armazenamentos:
+                # Um processo novo por grupo: caches, índices e memória não passam de uma rodada para outra
+                with ProcessPoolExecutor(1, mp_context=get_context("spawn")) as processo:
+                    documento["resultados"] += processo.submit(executar_grupo, arquivo_dados, armazenamento, linhas,
+                                                               cenarios, repeticoes, memoria, semente).result()
+    finally:
+        shutil.rmtree(diretorio_dados, ignore_errors=True)
+    return documento
+
+def comparar(anterior, atual, tolerancia=TOLERANCIA):
+    """Linhas (cenário, armazenamento, linhas, mediana anterior, atual, razão, regressão) dos resultados em comum"""
+    chave = lambda resultado: (resultado["cenario"], resultado["armazenamento"], resultado["linhas"])
+    medianas = {chave(resultado): resultado.get("mediana", resultado["primeira"]) for resultado in anterior["resultados"]}
+    linhas = []
+    for resultado in atual["resultados"]:
+        if chave(resultado) not in medianas:
+            continue
+        antes, depois = medianas[chave(resultado)], resultado.get("mediana", resultado["primeira"])
+        razao = depois / antes if antes else float("inf")
+        regressao = razao > 1 + tolerancia and depois - antes > DIFERENCA_MINIMA
+        linhas.append((*chave(resultado), antes, depois, razao, regressao))
+    return linhas
+
+def lista(texto):
+    return [item.strip() for item in texto.split(",") if item.strip()]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks das ordens de serviço com dados sintéticos")
+    subcomandos = parser.add_subparsers(dest="comando", required=True)
+
+    gerar = subcomandos.add_parser("gerar", help="Grava uma tabela sintética de ordens (CSV, .gz comprime)")
+    gerar.add_argument("destino")
+    gerar.add_argument("--linhas", type=int, default=10000)
+    gerar.add_argument("--semente", type=int, default=SEMENTE)
+
+    executar_ = subcomandos.add_parser("executar", help="Mede os cenários e grava os resultados em JSON")
+    executar_.add_argument("--tamanhos", type=lambda texto: [int(item) for item in lista(texto)], default=TAMANHOS)
+    executar_.add_argument("--armazenamentos", type=lista, default=ARMAZENAMENTOS)
+    executar_.add_argument("--cenarios", type=lista, default=list(CENARIOS), help=f"Padrão: {','.join(CENARIOS)}")
+    executar_.add_argument("--repeticoes", type=int, default=REPETICOES)
+    executar_.add_argument("--semente", type=int, default=SEMENTE)
+    executar_.add_argument("--sem-memoria", action="store_true", help="Não mede o pico de memória (execução extra)")
+    executar_.add_argument("--saida", default="resultados_benchmark.json")
+
+    comparar_ = subcomandos.add_parser("comparar", help="Compara dois resultados; termina com erro se houver regressão")
+    comparar_.add_argument("anterior")
+    comparar_.add_argument("atual")
+    comparar_.add_argument("--tolerancia", type=float, default=TOLERANCIA, help="Aumento aceito na mediana (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    if args.comando == "gerar":
+        inicio = time.time()
+        gerar_ordens(args.linhas, args.semente).to_csv(args.destino, index=False)
+        print(f"{args.linhas} OS geradas em {time.time() - inicio:.1f} s", file=sys.stderr)
+
+    elif args.comando == "executar":
+        desconhecidos = set(args.cenarios) - set(CENARIOS) or set(args.armazenamentos) - set(ARMAZENAMENTOS)
+        if desconhecidos:
+            parser.error(f"Desconhecidos: {', '.join(sorted(desconhecidos))}")
+        documento = executar(args.tamanhos, args.armazenamentos, args.cenarios, args.repeticoes,
+                             not args.sem_memoria, args.semente)
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(documento, f, ensure_ascii=False, indent=2)
+        print(f"Resultados em {args.saida}", file=sys.stderr)
+
+    elif args.comando == "comparar":
+        documentos = []
+        for caminho in (args.anterior, args.atual):
+            with open(caminho, encoding="utf-8") as f:
+                documentos.append(json.load(f))
+        linhas = comparar(*documentos, args.tolerancia)
+        for cenario, armazenamento, tamanho, antes, depois, razao, regressao in linhas:
+            print(f"{cenario:<10} {armazenamento:>12} {tamanho:>8} {antes:>10.4f} s {depois:>10.4f} s {razao:>6.2f}x"
+                  f"{'  REGRESSÃO' if regressao else ''}")
+        regressoes = sum(linha[-1] for linha in linhas)
+        print(f"{len(linhas)} medições comparadas, {regressoes} regressões", file=sys.stderr)
+        sys.exit(1 if regressoes else 0)
@@ -0,0 +1,170 @@
+"""Índice invertido para a busca textual das OS.
+
+Cada campo de texto (Descrição, Observações, Solicitante, Local e
+executantes) é quebrado em termos sem acento e em minúsculas, de modo que
+"manutenção" e "MANUTENCAO" são o mesmo termo. O índice guarda, para cada
+termo, as OS e os campos em que ele aparece, e um índice de trigramas do
+vocabulário permite achar trechos de palavras ("hidr" em "hidráulica") sem
+varrer a tabela. Assim como o cubo do dashboard, é observador do
+armazenamento e é atualizado a cada inclusão ou alteração.
+"""
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+
+import pandas as pd
+
+# Peso de cada campo na relevância: achar o termo na descrição vale mais que nas observações
+PESOS_CAMPOS = {"Descrição": 3.0, "Solicitante": 2.0, "Local": 2.0,
+                "Executante1": 2.0, "Executante2": 2.0, "Observações": 1.0}
+
+_PALAVRA = re.compile(r"\w+")
+
+def normalizar_texto(valor):
+    """Texto em minúsculas e sem acentos ("" para campos vazios, "nan" ou NA)"""
+    if valor is None or (not isinstance(valor, str) and pd.isna(valor)):
+        return ""
+    valor = str(valor)
+    if valor.strip() in ("nan", "None"):
+        return ""
+    decomposto = unicodedata.normalize("NFKD", valor)
+    return "".join(c for c in decomposto if not unicodedata.combining(c)).casefold()
+
+def termos(valor):
+    """Termos (palavras normalizadas) de um texto"""
+    return _PALAVRA.findall(normalizar_texto(valor))
+
+def trigramas(termo):
+    return {termo[i:i + 3] for i in range(len(termo) - 2)}
+
+class IndiceBusca:
+    """Índice invertido termo → OS, com busca por trechos, vários termos (E) e ordenação por relevância"""
+
+    def __init__(self, campos=None):
+        self.campos = list(campos or PESOS_CAMPOS)
+        self.lock = threading.RLock()
+        self._limpar()
+
+    def _limpar(self):
+        self._documentos = {}                                       # ID -> Counter((campo, termo))
+        self._postings = {campo: defaultdict(dict) for campo in self.campos}  # campo -> termo -> {ID: ocorrências}
+        self._vocabulario = Counter()                               # termo -> nº de listas em que aparece
+        self._trigramas = defaultdict(set)                          # trigrama -> termos do vocabulário
+
+    def _incluir(self, os_id, ocorrencias):
+        self._documentos[os_id] = ocorrencias
+        for (campo, termo), quantidade in ocorrencias.items():
+            if not self._vocabulario[termo]:
+                for trigrama in trigramas(termo):
+                    self._trigramas[trigrama].add(termo)
+            self._vocabulario[termo] += 1
+            self._postings[campo][termo][os_id] = quantidade
+
+    def _remover(self, os_id):
+        for (campo, termo) in self._documentos.pop(os_id, {}):
+            documentos = self._postings[campo][termo]
+            del documentos[os_id]
+            if not documentos:
+                del self._postings[campo][termo]
+            self._vocabulario[termo] -= 1
+            if not self._vocabulario[termo]:
+                del self._vocabulario[termo]
+                for trigrama in trigramas(termo):
+                    self._trigramas[trigrama].discard(termo)
+                    if not self._trigramas[trigrama]:
+                        del self._trigramas[trigrama]
+
+    def _ocorrencias(self, registro):
+        ocorrencias = Counter()
+        for campo in self.campos:
+            for termo in termos(registro.get(campo)):
+                ocorrencias[(campo, termo)] += 1
+        return ocorrencias
+
+    def recarregar(self, df):
+        """Reconstrói o índice a partir da tabela completa"""
+        ids = [int(i) for i in df["ID"]]
+        ocorrencias = {os_id: Counter() for os_id in ids}
+        for campo in self.campos:
+            if campo not in df.columns:
+                continue
+            # Locais, solicitantes e executantes se repetem muito: quebrar cada valor distinto só uma vez
+            valores = df[campo].astype(object).where(df[campo].notna(), None)
+            termos_por_valor = {valor: termos(valor) for valor in set(valores)}
+            for os_id, valor in zip(ids, valores):
+                for termo in termos_por_valor[valor]:
+                    ocorrencias[os_id][(campo, termo)] += 1
+
+        with self.lock:
+            self._limpar()
+            for os_id, contagem in ocorrencias.items():
+                self._incluir(os_id, contagem)
+
+    def alterar(self, anterior, atual):
+        """Reindexa uma OS incluída (anterior=None) ou alterada"""
+        os_id = int(atual["ID"])
+        ocorrencias = self._ocorrencias(atual)
+        with self.lock:
+            self._remover(os_id)
+            self._incluir(os_id, ocorrencias)
+
+    def _termos_com_trecho(self, trecho):
+        """Termos do vocabulário que contêm o trecho, com o peso do tipo de casamento"""
+        if len(trecho) >= 3:
+            conjuntos = sorted((self._trigramas.get(t, set()) for t in trigramas(trecho)), key=len)
+            candidatos = set.intersection(*conjuntos) if conjuntos and conjuntos[0] else set()
+        else:
+            candidatos = self._vocabulario.keys()
+        encontrados = {}
+        for termo in candidatos:
+            if termo == trecho:
+                encontrados[termo] = 3.0
+            elif termo.startswith(trecho):
+                encontrados[termo] = 2.0
+            elif trecho in termo:
+                encontrados[termo] = 1.0
+        return encontrados
+
+    def buscar(self, texto, campos=None, limite=None):
+        """IDs das OS que contêm todos os termos do texto, da mais relevante para a menos relevante
+
+        Cada termo pode ser trecho de palavra; campos restringe a busca (ex.: ["Local"]).
+        """
+        return [os_id for os_id, _ in self.pontuar(texto, campos, limite)]
+
+    def pontuar(self, texto, campos=None, limite=None):
+        """[(ID, relevância)] das OS de buscar, na mesma ordem"""
+        consulta = list(dict.fromkeys(termos(texto)))
+        if not consulta:
+            return []
+        campos = [campo for campo in self.campos if campo in (campos or self.campos)]
+
+        with self.lock:
+            total = max(len(self._documentos), 1)
+            pontuacao = None
+            for trecho in consulta:
+                pontos = defaultdict(float)
+                for termo, casamento in self._termos_com_trecho(trecho).items():
+                    for campo in campos:
+                        documentos = self._postings[campo].get(termo)
+                        if documentos:
+                            peso = casamento * PESOS_CAMPOS.get(campo, 1.0)
+                            for os_id, quantidade in documentos.items():
+                                pontos[os_id] += peso * quantidade
+                if not pontos:
+                    return []
+                # Termos raros pesam mais que termos presentes em quase todas as OS
+                raridade = math.log(1 + total / len(pontos))
+                if pontuacao is None:
+                    pontuacao = {os_id: valor * raridade for os_id, valor in pontos.items()}
+                else:
+                    pontuacao = {os_id: valor + pontos[os_id] * raridade
+                                 for os_id, valor in pontuacao.items() if os_id in pontos}
+                if not pontuacao:
+                    return []
+
+        # Empates: OS mais recentes (ID maior) primeiro
+        ordenados = sorted(pontuacao.items(), key=lambda item: (-item[1], -item[0]))
+        return ordenados[:limite]
@@ -0,0 +1,161 @@
+"""Fila de despacho das OS em aberto e carga de cada executante.
+
+As OS que esperam alguém para atendê-las (pendentes e pausadas) ficam num
+heap por prioridade: urgentes primeiro, depois as mais antigas (data e hora
+de abertura), e o ID desempata. Ver a próxima OS custa O(1) e tirá-la,
+O(log n), sem percorrer a tabela. A fila é observadora do armazenamento,
+como o cubo: cada inclusão ou alteração empilha a nova prioridade da OS, e
+entradas que deixaram de valer (OS despachada, concluída ou repriorizada)
+são descartadas quando chegam ao topo; quando elas passam a ser a maioria,
+o heap é refeito só com as vigentes.
+
+A carga de cada executante (OS não concluídas em que é principal ou
+secundário, e quantas delas estão em execução) é ajustada na mesma
+alteração, subtraindo a OS como era e somando como ficou. A sugestão de
+executante é o de menor carga entre os cadastrados.
+"""
+import heapq
+import threading
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from armazenamento import STATUS_CONCLUIDO
+from indicadores import horas_do_dia
+
+STATUS_NA_FILA = ("Pendente", "Pausado")  # OS à espera de um executante
+STATUS_EM_EXECUCAO = "Em execução"
+_SEM_ABERTURA = np.iinfo(np.int64).max  # OS sem data de abertura vão para o fim das de mesma urgência
+
+def _texto(valor):
+    if valor is None or (not isinstance(valor, str) and pd.isna(valor)):
+        return ""
+    return str(valor).strip()
+
+def _executantes(registro):
+    return {nome for nome in (_texto(registro.get("Executante1")), _texto(registro.get("Executante2"))) if nome}
+
+def prioridade(registro):
+    """Chave da OS no heap, (0 se urgente senão 1, abertura em ns, ID); None se ela não espera despacho"""
+    if _texto(registro.get("Status")) not in STATUS_NA_FILA:
+        return None
+    data = pd.Timestamp(registro.get("Data")) if pd.notna(registro.get("Data")) else None
+    if data is None:
+        abertura = _SEM_ABERTURA
+    else:
+        hora = horas_do_dia(pd.Series([registro.get("Hora Abertura")], dtype=object))[0]
+        abertura = data.value + (0 if np.isnan(hora) else int(hora))
+    urgente = registro.get("Urgente")
+    if isinstance(urgente, str):
+        urgente = urgente == "Sim"
+    return (0 if pd.notna(urgente) and bool(urgente) else 1, abertura, int(registro["ID"]))
+
+def sugerir_executante(executantes, cargas, excluir=()):
+    """Executante de menor carga (depois, menos OS em execução; depois, a ordem da lista); None se não houver
+
+    cargas é {executante: (OS em aberto, em execução)}.
+    """
+    candidatos = [nome for nome in executantes if nome not in excluir]
+    if not candidatos:
+        return None
+    return min(candidatos, key=lambda nome: cargas.get(nome, (0, 0)))
+
+class FilaDespacho:
+    """Heap de OS à espera de despacho e carga por executante, atualizados a cada inclusão/alteração"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._heap = []
+        self._vigentes = {}  # ID -> chave vigente no heap
+        self.carga = Counter()
+        self.em_execucao = Counter()
+
+    def recarregar(self, df):
+        """Refaz o heap e as cargas a partir da tabela completa"""
+        status = df["Status"].astype(object).fillna("").to_numpy()
+        na_fila = np.isin(status, STATUS_NA_FILA)
+        fila = df[na_fila]
+        data = fila["Data"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+        hora = horas_do_dia(fila["Hora Abertura"])
+        abertura = np.where(data == np.iinfo(np.int64).min, _SEM_ABERTURA,
+                            data + np.nan_to_num(hora).astype(np.int64))
+        urgencia = np.where(fila["Urgente"].fillna(False).to_numpy(dtype=bool), 0, 1)
+        chaves = list(zip(urgencia.tolist(), abertura.tolist(), fila["ID"].astype(int).tolist()))
+        heapq.heapify(chaves)
+
+        carga, em_execucao = Counter(), Counter()
+        abertas = status != STATUS_CONCLUIDO
+        executando = status == STATUS_EM_EXECUCAO
+        for coluna in ("Executante1", "Executante2"):
+            nomes = df[coluna].astype(object).where(df[coluna].notna(), "").map(str).str.strip().to_numpy()
+            validos = nomes != ""
+            carga.update(pd.Series(nomes[validos & abertas]).value_counts().to_dict())
+            em_execucao.update(pd.Series(nomes[validos & executando]).value_counts().to_dict())
+        with self.lock:
+            self._heap = chaves
+            self._vigentes = {chave[2]: chave for chave in chaves}
+            self.carga, self.em_execucao = carga, em_execucao
+
+    def _somar_carga(self, registro, sinal):
+        status = _texto(registro.get("Status"))
+        if status == STATUS_CONCLUIDO:
+            return
+        for nome in _executantes(registro):
+            self.carga[nome] += sinal
+            if status == STATUS_EM_EXECUCAO:
+                self.em_execucao[nome] += sinal
+
+    def alterar(self, anterior, atual):
+        """Ajusta a fila e as cargas para uma OS incluída (anterior=None) ou alterada"""
+        chave = prioridade(atual)
+        os_id = int(atual["ID"])
+        with self.lock:
+            if anterior is not None:
+                self._somar_carga(anterior, -1)
+            self._somar_carga(atual, +1)
+            if chave is None:
+                self._vigentes.pop(os_id, None)  # A entrada antiga fica no heap e é descartada ao chegar ao topo
+            elif self._vigentes.get(os_id) != chave:
+                self._vigentes[os_id] = chave
+                heapq.heappush(self._heap, chave)
+            if len(self._heap) > 2 * len(self._vigentes) + 64:
+                self._heap = list(self._vigentes.values())
+                heapq.heapify(self._heap)
+
+    def _descartar_topo(self):
+        while self._heap and self._vigentes.get(self._heap[0][2]) != self._heap[0]:
+            heapq.heappop(self._heap)
+
+    def __len__(self):
+        with self.lock:
+            return len(self._vigentes)
+
+    def proxima(self):
+        """Chave da OS mais prioritária (None com a fila vazia), sem tirá-la da fila"""
+        with self.lock:
+            self._descartar_topo()
+            return self._heap[0] if self._heap else None
+
+    def primeiras(self, quantidade):
+        """Chaves das quantidade OS mais prioritárias, em ordem (O(quantidade · log n))"""
+        with self.lock:
+            retiradas, vistas = [], set()
+            while self._heap and len(retiradas) < quantidade:
+                chave = heapq.heappop(self._heap)
+                # Vencidas e cópias (OS que voltou à mesma prioridade) saem de vez do heap
+                if self._vigentes.get(chave[2]) == chave and chave[2] not in vistas:
+                    retiradas.append(chave)
+                    vistas.add(chave[2])
+            for chave in retiradas:
+                heapq.heappush(self._heap, chave)
+            return retiradas
+
+    def cargas(self, executantes):
+        """{executante: (OS em aberto, em execução)} dos executantes informados"""
+        with self.lock:
+            return {nome: (self.carga[nome], self.em_execucao[nome]) for nome in executantes}
+
+    def sugerir(self, executantes, excluir=()):
+        """Executante de menor carga entre os informados (ver sugerir_executante)"""
+        return sugerir_executante(executantes, self.cargas(executantes), excluir)
@@ -0,0 +1,151 @@
+"""Gráficos do dashboard renderizados uma vez e servidos como imagem a todas as sessões.
+
+Os gráficos são desenhados com a API orientada a objetos do matplotlib
+(sem o registro global do pyplot), salvos em PNG e a figura é liberada em
+seguida. As imagens ficam num cache LRU com limite de memória, indexado
+pelo tipo do gráfico e pelos próprios dados: dados iguais reaproveitam a
+mesma imagem, dados novos geram outra.
+
+O matplotlib e o seaborn (vários segundos de importação) só são importados
+quando o primeiro gráfico é desenhado, não na partida do aplicativo.
+"""
+import threading
+import time
+from collections import OrderedDict
+from io import BytesIO
+
+from metricas import medir, registrar_partida
+
+DPI = 200  # Mesma resolução usada pelo st.pyplot
+
+def _figura():
+    """Figura nova do matplotlib, importado na primeira chamada"""
+    inicio = time.perf_counter()
+    from matplotlib.figure import Figure
+    registrar_partida("importação do matplotlib", time.perf_counter() - inicio)
+    return Figure(figsize=(3, 2))
+
+def _png(fig):
+    """Salva a figura em PNG e libera seus recursos"""
+    try:
+        buffer = BytesIO()
+        fig.savefig(buffer, format="png", bbox_inches="tight", dpi=DPI)
+        return buffer.getvalue()
+    finally:
+        fig.clear()
+
+def renderizar_rosca(contagens, titulo, titulo_legenda):
+    from matplotlib.patches import Circle
+
+    fig = _figura()
+    ax = fig.subplots()
+
+    wedges, texts, autotexts = ax.pie(
+        list(contagens.values()),
+        labels=None,
+        autopct='%1.1f%%',
+        startangle=90,
+        wedgeprops=dict(width=0.4),
+        textprops={'fontsize': 4, 'color': 'black'}
+    )
+
+    centre_circle = Circle((0, 0), 0.70, fc='white')
+    ax.add_artist(centre_circle)
+
+    ax.legend(
+        wedges,
+        list(contagens.keys()),
+        title=titulo_legenda,
+        loc="lower right",
+        bbox_to_anchor=(1.5, 0),
+        prop={'size': 4},
+        title_fontsize='6'
+    )
+
+    ax.set_title(titulo, fontsize=10)
+    return _png(fig)
+
+def renderizar_barras(contagens, titulo):
+    inicio = time.perf_counter()
+    import seaborn as sns
+    registrar_partida("importação do seaborn", time.perf_counter() - inicio)
+
+    fig = _figura()
+    ax = fig.subplots()
+
+    bars = ax.bar(
+        list(contagens.keys()),
+        list(contagens.values()),
+        color=sns.color_palette("pastel")
+    )
+
+    for bar in bars:
+        height = bar.get_height()
+        ax.text(bar.get_x() + bar.get_width()/2., height,
+                f'{height}',
+                ha='center', va='bottom',
+                fontsize=4)
+
+    ax.set_title(titulo, fontsize=10)
+    ax.tick_params(axis='x', rotation=45, labelsize=6)
+    return _png(fig)
+
+def renderizar_linhas(series, titulo):
+    """Uma linha por série ({nome: {rótulo do eixo x: valor}}), todas com os mesmos rótulos"""
+    fig = _figura()
+    ax = fig.subplots()
+
+    for nome, valores in series.items():
+        ax.plot(list(valores.keys()), list(valores.values()), label=nome, linewidth=1, marker="o", markersize=1.5)
+
+    ax.legend(prop={'size': 4})
+    ax.set_title(titulo, fontsize=10)
+    ax.tick_params(axis='x', rotation=45, labelsize=4)
+    ax.tick_params(axis='y', labelsize=5)
+    ax.grid(alpha=0.3, linewidth=0.5)
+    return _png(fig)
+
+class CacheGraficos:
+    """Cache LRU de imagens PNG com limite total de memória"""
+
+    def __init__(self, limite_bytes=32 * 1024 * 1024):
+        self.limite_bytes = limite_bytes
+        self.lock = threading.Lock()
+        self._imagens = OrderedDict()
+        self._total_bytes = 0
+        self.acertos = 0
+        self.falhas = 0
+
+    def obter(self, chave, renderizar):
+        """Imagem em cache para a chave, ou renderiza, guarda e descarta as menos usadas além do limite"""
+        with self.lock:
+            if chave in self._imagens:
+                self._imagens.move_to_end(chave)
+                self.acertos += 1
+                return self._imagens[chave]
+            self.falhas += 1
+
+        # Renderiza fora do lock para não bloquear as outras sessões
+        with medir(f"grafico.renderizar.{chave[0]}"):
+            imagem = renderizar()
+
+        with self.lock:
+            if chave not in self._imagens:
+                self._imagens[chave] = imagem
+                self._total_bytes += len(imagem)
+                while self._total_bytes > self.limite_bytes and len(self._imagens) > 1:
+                    _, antiga = self._imagens.popitem(last=False)
+                    self._total_bytes -= len(antiga)
+        return imagem
+
+    def rosca(self, contagens, titulo, titulo_legenda):
+        chave = ("rosca", titulo, titulo_legenda, tuple(contagens.items()))
+        return self.obter(chave, lambda: renderizar_rosca(contagens, titulo, titulo_legenda))
+
+    def barras(self, contagens, titulo):
+        chave = ("barras", titulo, tuple(contagens.items()))
+        return self.obter(chave, lambda: renderizar_barras(contagens, titulo))
+
+    def linhas(self, series, titulo):
+        chave = ("linhas", titulo, tuple((nome, tuple(valores.items())) for nome, valores in series.items()))
+        return self.obter(chave, lambda: renderizar_linhas(series, titulo))
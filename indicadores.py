@@ -0,0 +1,237 @@
+"""Indicadores de desempenho da manutenção: tempo de atendimento, backlog e vazão.
+
+A tabela de OS já chega com as datas convertidas (dd/mm/aa e dd/mm/aaaa
+viram datetime na leitura); aqui cada Data + Hora vira um instante, uma
+única vez por versão dos dados, convertendo cada hora distinta ("7:30")
+uma só vez. Sem a hora de abertura ou de conclusão, o tempo de atendimento
+é contado em dias corridos entre as datas. Todos os cálculos são vetoriais
+(NumPy/pandas) sobre colunas já preparadas, sem laços por OS.
+
+O IndicadoresOS é observador do armazenamento, como o cubo: qualquer
+inclusão ou alteração muda a versão e a próxima consulta prepara a tabela
+de novo; enquanto nada muda, todas as sessões usam a mesma preparação.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from armazenamento import STATUS_CONCLUIDO
+
+# Colunas lidas para os indicadores (no particionado, só elas são lidas do arquivo de concluídas)
+COLUNAS_INDICADORES = ["ID", "Data", "Hora Abertura", "Tipo", "Status", "Local", "Data Conclusão", "Hora Conclusão",
+                       "Executante1", "Executante2", "Urgente"]
+PERCENTIS = (50, 90, 99)
+HORAS_DIA = 24.0
+# Faixas de idade das OS em aberto (dias) e do tempo de atendimento (horas), com o último limite aberto
+FAIXAS_ENVELHECIMENTO = (1, 3, 7, 15, 30, 60)
+FAIXAS_ATENDIMENTO = (4, 8, 24, 48, 72, 168, 336, 720)
+_NAT = np.iinfo(np.int64).min  # datetime64[ns] NaT visto como inteiro
+_NS_HORA = 3600 * 10**9
+
+def horas_do_dia(horas):
+    """Horário ("hh:mm") como nanossegundos desde a meia-noite (NaN se vazio ou inválido), convertendo cada valor distinto uma vez"""
+    codigos, unicas = pd.factorize(horas)
+    partes = pd.Series(unicas, dtype="string").str.strip().str.extract(r"^(\d{1,2}):(\d{2})")
+    hora = pd.to_numeric(partes[0], errors="coerce")
+    minuto = pd.to_numeric(partes[1], errors="coerce")
+    valido = (hora < 24) & (minuto < 60)
+    valores = ((hora * 60 + minuto) * 60 * 10**9).where(valido).to_numpy(dtype=float)
+    return np.append(valores, np.nan)[codigos]  # O código -1 (vazio) pega o NaN acrescentado no fim
+
+def _rotulos_faixas(limites, unidade):
+    rotulos = [f"até {limites[0]} {unidade}"]
+    rotulos += [f"{inicio}–{fim} {unidade}" for inicio, fim in zip(limites, limites[1:])]
+    return rotulos + [f"mais de {limites[-1]} {unidade}"]
+
+def _percentis(grupos, valores, nomes, ordem=None):
+    """Quantidade, média e percentis de valores por código de grupo (-1 ignorado)
+
+    ordem (argsort dos valores, já calculado) evita reordenar os valores: basta separá-los por
+    grupo com uma ordenação estável dos códigos, que é radix sort para códigos pequenos.
+    """
+    if ordem is None:
+        ordem = np.argsort(valores)
+    grupos, valores = grupos[ordem], valores[ordem]
+    validos = (grupos >= 0) & ~np.isnan(valores)
+    grupos, valores = grupos[validos], valores[validos]
+    por_grupo = np.argsort(grupos.astype(np.int16) if len(nomes) < 2**15 else grupos, kind="stable")
+    grupos, valores = grupos[por_grupo], valores[por_grupo]
+    quantidades = np.bincount(grupos, minlength=len(nomes))
+    inicios = np.concatenate(([0], np.cumsum(quantidades)[:-1]))
+    presentes = np.flatnonzero(quantidades)
+    tabela = pd.DataFrame({"OS": quantidades[presentes],
+                           "Média": np.bincount(grupos, valores, len(nomes))[presentes] / quantidades[presentes]},
+                          index=pd.Index(np.asarray(nomes, dtype=object)[presentes]))
+    for percentil in PERCENTIS:
+        # Interpolação linear, como np.percentile, dentro do trecho ordenado de cada grupo
+        posicao = (quantidades[presentes] - 1) * percentil / 100
+        baixo = np.floor(posicao).astype(np.int64)
+        alto = np.minimum(baixo + 1, quantidades[presentes] - 1)
+        fracao = posicao - baixo
+        inicio = inicios[presentes]
+        tabela[f"p{percentil}"] = valores[inicio + baixo] * (1 - fracao) + valores[inicio + alto] * fracao
+    return tabela
+
+def concatenar(tabelas):
+    """Junta tabelas com as mesmas colunas, unindo as categorias (o concat do pandas as transformaria em objetos)"""
+    colunas = {}
+    for coluna in tabelas[0].columns:
+        partes = [tabela[coluna] for tabela in tabelas]
+        if all(isinstance(parte.dtype, pd.CategoricalDtype) for parte in partes):
+            colunas[coluna] = pd.api.types.union_categoricals(partes, ignore_order=True)
+        else:
+            colunas[coluna] = pd.concat(partes, ignore_index=True)
+    return pd.DataFrame(colunas)
+
+class TabelaIndicadores:
+    """Colunas preparadas de uma versão dos dados (instantes, tempos de atendimento e códigos), só para leitura"""
+
+    def __init__(self, df):
+        data = df["Data"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+        conclusao = df["Data Conclusão"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+        hora_abertura = horas_do_dia(df["Hora Abertura"])
+        hora_conclusao = horas_do_dia(df["Hora Conclusão"])
+        concluida = (df["Status"] == STATUS_CONCLUIDO).fillna(False).to_numpy(dtype=bool)
+
+        tem_abertura = data != _NAT
+        tem_conclusao = concluida & (conclusao != _NAT)
+        self.abertura = np.where(tem_abertura, data + np.nan_to_num(hora_abertura).astype(np.int64), _NAT)
+        self.conclusao = np.where(tem_conclusao, conclusao + np.nan_to_num(hora_conclusao).astype(np.int64), _NAT)
+
+        # Com as duas horas, o tempo exato; sem alguma delas, os dias corridos entre as datas
+        com_horas = ~np.isnan(hora_abertura) & ~np.isnan(hora_conclusao)
+        inicio = np.where(com_horas, self.abertura, data)
+        fim = np.where(com_horas, self.conclusao, conclusao)
+        horas = (fim - inicio) / _NS_HORA
+        horas[~(tem_abertura & tem_conclusao)] = np.nan
+        horas[horas < 0] = np.nan  # Conclusão antes da abertura: dado inconsistente, fora das estatísticas
+        self.horas = horas
+        self._ordem_horas = np.argsort(horas)  # Ordem crescente dos tempos, compartilhada pelos percentis
+
+        self.concluida = concluida
+        self.aberta = ~concluida & tem_abertura
+        self.colunas = {coluna: pd.Categorical(df[coluna]) for coluna in ("Tipo", "Status", "Local")}
+        self.colunas["Urgente"] = pd.Categorical(df["Urgente"].map({True: "Sim", False: "Não"}, na_action="ignore"))
+
+        # Executantes em formato longo: uma entrada por OS e executante (principal ou secundário)
+        executantes = pd.api.types.union_categoricals(
+            [pd.Categorical(df["Executante1"]), pd.Categorical(df["Executante2"])], ignore_order=True)
+        self.executantes = executantes
+        self.linhas_executante = np.tile(np.arange(len(df)), 2)
+
+        # Instantes ordenados para o backlog em qualquer data por busca binária
+        self._aberturas_ordenadas = np.sort(self.abertura[tem_abertura])
+        fechadas = tem_abertura & tem_conclusao
+        self._conclusoes_ordenadas = np.sort(self.conclusao[fechadas])
+        # Concluídas sem data de conclusão: não se sabe quando saíram do backlog, ficam fora da curva
+        self._sem_conclusao = np.sort(self.abertura[tem_abertura & concluida & ~tem_conclusao])
+        self.total = len(df)
+
+    def _grupos(self, por):
+        if por is None:
+            return np.zeros(self.total, dtype=np.int64), ["Todas"]
+        categorias = self.colunas[por]
+        return categorias.codes.astype(np.int64), list(categorias.categories)
+
+    def tempo_atendimento(self, por="Tipo", desde=None):
+        """Tempo de atendimento (horas) das OS concluídas por grupo: quantidade, média (MTTR) e percentis
+
+        desde limita às OS concluídas a partir da data.
+        """
+        grupos, nomes = self._grupos(por)
+        if desde is not None:
+            grupos = np.where(self.conclusao >= pd.Timestamp(desde).value, grupos, -1)
+        return _percentis(grupos, self.horas, nomes, self._ordem_horas).sort_values("OS", ascending=False)
+
+    def distribuicao_atendimento(self, faixas=FAIXAS_ATENDIMENTO, desde=None):
+        """Quantidade de OS concluídas por faixa de tempo de atendimento (horas)"""
+        horas = self.horas
+        if desde is not None:
+            horas = horas[self.conclusao >= pd.Timestamp(desde).value]
+        horas = horas[~np.isnan(horas)]
+        contagens = np.bincount(np.searchsorted(faixas, horas, side="left"), minlength=len(faixas) + 1)
+        return pd.Series(contagens, index=_rotulos_faixas(faixas, "h"), name="OS")
+
+    def envelhecimento(self, agora, por=None, faixas=FAIXAS_ENVELHECIMENTO):
+        """OS em aberto por faixa de idade (dias desde a abertura), opcionalmente por grupo nas colunas"""
+        dias = (pd.Timestamp(agora).value - self.abertura[self.aberta]) / (_NS_HORA * HORAS_DIA)
+        faixa = np.searchsorted(faixas, np.maximum(dias, 0), side="left")
+        rotulos = _rotulos_faixas(faixas, "d")
+        if por is None:
+            return pd.Series(np.bincount(faixa, minlength=len(rotulos)), index=rotulos, name="OS")
+        grupos, nomes = self._grupos(por)
+        grupos = grupos[self.aberta]
+        validos = grupos >= 0
+        celulas = np.bincount(faixa[validos] * len(nomes) + grupos[validos], minlength=len(rotulos) * len(nomes))
+        tabela = pd.DataFrame(celulas.reshape(len(rotulos), len(nomes)), index=rotulos, columns=nomes)
+        return tabela.loc[:, tabela.sum() > 0]
+
+    def idade_aberta(self, agora):
+        """Idade (dias) das OS em aberto: quantidade, média e percentis (None se não houver OS em aberto)"""
+        dias = (pd.Timestamp(agora).value - self.abertura[self.aberta]) / (_NS_HORA * HORAS_DIA)
+        if not len(dias):
+            return None
+        return _percentis(np.zeros(len(dias), dtype=np.int64), np.maximum(dias, 0), ["Em aberto"]).iloc[0]
+
+    def backlog_semanal(self, agora, semanas=26):
+        """Por semana (até o domingo): OS abertas, concluídas e o backlog em aberto no fim da semana"""
+        hoje = pd.Timestamp(agora).normalize()
+        domingo = hoje + pd.Timedelta(days=6 - hoje.weekday())
+        fins = pd.date_range(end=domingo, periods=semanas + 1, freq="7D") + pd.Timedelta(days=1)
+        limites = fins.to_numpy(dtype="datetime64[ns]").view(np.int64)
+        abertas_ate = np.searchsorted(self._aberturas_ordenadas, limites, side="left")
+        concluidas_ate = np.searchsorted(self._conclusoes_ordenadas, limites, side="left")
+        sem_conclusao = np.searchsorted(self._sem_conclusao, limites, side="left")
+        backlog = abertas_ate - concluidas_ate - sem_conclusao
+        return pd.DataFrame({"Abertas": np.diff(abertas_ate - sem_conclusao), "Concluídas": np.diff(concluidas_ate),
+                             "Backlog": backlog[1:]},
+                            index=pd.Index((fins[1:] - pd.Timedelta(days=1)).date, name="Semana"))
+
+    def vazao(self, agora, semanas=4):
+        """OS concluídas por executante nas últimas semanas: total, média por semana e tempo de atendimento"""
+        inicio = (pd.Timestamp(agora) - pd.Timedelta(weeks=semanas)).value
+        linhas = self.linhas_executante
+        selecionadas = np.flatnonzero(self.concluida[linhas] & (self.conclusao[linhas] >= inicio)
+                                      & (self.executantes.codes >= 0))
+        grupos = self.executantes.codes[selecionadas].astype(np.int64)
+        tabela = _percentis(grupos, self.horas[linhas[selecionadas]], list(self.executantes.categories))
+        concluidas = np.bincount(grupos, minlength=len(self.executantes.categories))
+        tabela = tabela.reindex(pd.Index(np.asarray(self.executantes.categories, dtype=object)[concluidas > 0]))
+        tabela.insert(0, "Concluídas", concluidas[concluidas > 0])
+        tabela.insert(1, "Por semana", tabela["Concluídas"] / semanas)
+        tabela = tabela.rename(columns={"OS": "Com tempo"})
+        return tabela.sort_values("Concluídas", ascending=False)
+
+class IndicadoresOS:
+    """Tabela de indicadores da versão atual dos dados, preparada uma vez e compartilhada"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.versao = 0
+        self._tabela = None
+        self._chave = None
+
+    def invalidar(self):
+        """Descarta a preparação: a próxima consulta relê os dados"""
+        with self.lock:
+            self.versao += 1
+            self._tabela = None
+
+    def recarregar(self, df):
+        self.invalidar()
+
+    def alterar(self, anterior, atual):
+        self.invalidar()
+
+    def tabela(self, carregar, chave=None):
+        """TabelaIndicadores da versão atual; carregar() só é chamado quando os dados (ou a chave extra) mudaram"""
+        with self.lock:
+            versao = (self.versao, chave)
+            if self._tabela is not None and self._chave == versao:
+                return self._tabela
+        tabela = TabelaIndicadores(carregar())  # Fora do lock: as alterações continuam chegando
+        with self.lock:
+            if self.versao == versao[0]:
+                self._tabela, self._chave = tabela, versao
+        return tabela
@@ -0,0 +1,128 @@
+"""Partes do arquivo de OS no GitHub e mesclagem em três vias.
+
+No GitHub, a tabela fica dividida em partes de TAMANHO_PARTE IDs seguidos
+(0000001000.csv guarda as OS 1000 a 1999), cada uma um CSV no formato de
+disco ordenado por ID. Uma gravação muda só a parte da OS: o envio leva
+apenas as partes alteradas, e o SHA de cada parte diz, sem baixá-la, se ela
+mudou desde a última sincronização.
+
+Quando outra instalação enviou alterações antes, as partes que mudaram no
+GitHub são mescladas OS a OS com as locais, contra a base (a versão da
+última sincronização): vale o lado que alterou a OS e, se os dois a
+alteraram, campo a campo, com o local prevalecendo no mesmo campo. Uma OS
+incluída dos dois lados com o mesmo ID fica com a versão do GitHub; a local
+é incluída de novo com outro ID. A mesclagem nunca apaga OS.
+"""
+import io
+import os
+
+import pandas as pd
+
+from armazenamento import COLUNAS_OS, gravar_csv_atomico, ler_csv, registro_para_gravacao
+from travas import caminho_temporario
+
+TAMANHO_PARTE = 1000  # IDs por parte: um envio leva ao menos uma parte inteira
+CAMPOS = COLUNAS_OS[1:]  # Campos de cada registro mesclado (o ID é a chave)
+
+def nome_parte(os_id):
+    """Nome da parte que guarda a OS"""
+    return f"{int(os_id) // TAMANHO_PARTE * TAMANHO_PARTE:010d}.csv"
+
+def dividir_em_partes(arquivo):
+    """{nome da parte: conteúdo} do CSV de ordens
+
+    O CSV gravado pelo aplicativo já está no formato de envio: os registros são separados sem
+    reinterpretar os valores (quebras de linha entre aspas continuam no registro) e só o fim de cada
+    registro vira "\\n". Um CSV em outro formato (arquivo antigo) é antes regravado no formato atual.
+    """
+    with open(arquivo, "rb") as f:
+        cabecalho = f.readline().rstrip(b"\r\n")
+    if cabecalho.decode("utf-8-sig") != ",".join(COLUNAS_OS):
+        temporario = caminho_temporario(arquivo)
+        try:
+            gravar_csv_atomico(ler_csv(arquivo), temporario)
+            return dividir_em_partes(temporario)
+        finally:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+
+    blocos = {}
+    with open(arquivo, "rb") as f:
+        f.readline()
+        registro = b""
+        for linha in f:
+            registro += linha
+            if registro.count(b'"') % 2:
+                continue  # Aspas abertas: o valor continua na próxima linha
+            os_id = int(registro[:registro.index(b",")])
+            blocos.setdefault(os_id // TAMANHO_PARTE, []).append((os_id, registro.rstrip(b"\r\n") + b"\n"))
+            registro = b""
+    partes = {}
+    for bloco, linhas in blocos.items():
+        linhas.sort(key=lambda linha: linha[0])
+        partes[nome_parte(bloco * TAMANHO_PARTE)] = cabecalho + b"\n" + b"".join(linha for _, linha in linhas)
+    return partes
+
+def juntar_partes(conteudos, destino):
+    """Grava em destino o CSV completo formado pelas partes (conteúdos na ordem dos nomes)"""
+    with open(destino, "wb") as f:
+        for posicao, conteudo in enumerate(conteudos):
+            # Cada parte começa pelo cabeçalho, que fica só uma vez
+            f.write(conteudo if posicao == 0 else conteudo.split(b"\n", 1)[1])
+
+def registros(conteudo):
+    """{ID: campos em texto} de uma parte (vazio para b"")"""
+    if not conteudo:
+        return {}
+    df = pd.read_csv(io.BytesIO(conteudo), dtype=str, keep_default_na=False).reindex(columns=COLUNAS_OS, fill_value="")
+    return {int(linha[0]): linha[1:] for linha in df.itertuples(index=False, name=None)}
+
+def registro_em_texto(registro):
+    """Campos em texto de uma OS lida do armazenamento, comparáveis aos de registros() (None se não houver OS)"""
+    if registro is None:
+        return None
+    texto = registro_para_gravacao(registro)
+    return tuple("" if texto[coluna] is None else str(texto[coluna]) for coluna in CAMPOS)
+
+def mesclar(base, local, remoto):
+    """Mescla em três vias registros {ID: campos}; retorna (alterações locais, conflitos)
+
+    As alterações são (ID, campos locais, campos mesclados, OS a incluir com ID novo) para cada OS cuja
+    versão mesclada difere da local; conflitos conta as OS alteradas no mesmo campo dos dois lados.
+    Com base=None (primeira sincronização, sem versão comum), OS presentes dos dois lados são a mesma
+    OS e vale a local.
+    """
+    alteracoes, conflitos = [], 0
+    sem_base = base is None
+    base = base or {}
+    for os_id in sorted(remoto.keys() - local.keys()):
+        alteracoes.append((os_id, None, remoto[os_id], None))
+    for os_id in sorted(remoto.keys() & local.keys()):
+        anterior, atual, outro = base.get(os_id), local[os_id], remoto[os_id]
+        if atual == outro or outro == anterior:
+            continue
+        if atual == anterior:
+            alteracoes.append((os_id, atual, outro, None))
+        elif anterior is None:
+            # Incluída dos dois lados: sem base, é a mesma OS; com base, o ID foi usado para duas OS
+            conflitos += 1
+            if not sem_base:
+                alteracoes.append((os_id, atual, outro, atual))
+        else:
+            mesclado = tuple(valor if valor != original else valor_remoto
+                             for original, valor, valor_remoto in zip(anterior, atual, outro))
+            conflitos += any(original != valor != valor_remoto != original
+                             for original, valor, valor_remoto in zip(anterior, atual, outro))
+            if mesclado != atual:
+                alteracoes.append((os_id, atual, mesclado, None))
+    return alteracoes, conflitos
+
+def mesclar_partes(base, local, remoto):
+    """Como mesclar, para as partes {nome: conteúdo} alteradas no GitHub (base=None: sem versão comum)"""
+    alteracoes, conflitos = [], 0
+    for nome, conteudo in remoto.items():
+        parte_base = registros(base.get(nome, b"")) if base is not None else None
+        alteracoes_parte, conflitos_parte = mesclar(parte_base, registros(local.get(nome, b"")), registros(conteudo))
+        alteracoes += alteracoes_parte
+        conflitos += conflitos_parte
+    return alteracoes, conflitos
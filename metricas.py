@@ -0,0 +1,196 @@
+"""Medição de tempo das operações mais usadas, dentro do próprio processo.
+
+Cada operação (leitura da tabela, gravação, backup, envio ao GitHub, cada
+gráfico e cada página) guarda as durações das últimas execuções numa janela
+circular, de onde saem os percentis, além de totais desde o início do
+processo. As sessões do Streamlit e a API compartilham o mesmo registro.
+
+A coleta vem desligada ("metricas": true no config.json a liga); desligada,
+cada ponto medido custa só a verificação de um atributo. Com
+"metricas_arquivo", o registro também é gravado em formato texto do
+Prometheus (ex.: para o coletor textfile do node_exporter), no máximo a cada
+"metricas_intervalo" segundos.
+
+Independente da coleta, o processo guarda quanto tempo levou cada etapa da
+partida (importações, inicialização, primeira página, importações adiadas),
+medida uma única vez, para o relatório de partida.
+"""
+import functools
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from travas import caminho_temporario
+
+JANELA = 1024  # Execuções recentes guardadas por operação, de onde saem os percentis
+PERCENTIS = (50, 90, 99)
+INTERVALO_EXPORTACAO = 15  # Segundos entre gravações do arquivo do Prometheus
+PREFIXO_PROMETHEUS = "os40"
+
+class _Nulo:
+    """Cronômetro da coleta desligada: não mede nada"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excecao):
+        return False
+
+_NULO = _Nulo()
+
+class _Cronometro:
+    __slots__ = ("registro", "nome", "inicio")
+
+    def __init__(self, registro, nome):
+        self.registro = registro
+        self.nome = nome
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, *excecao):
+        # Só exceções comuns contam como erro (não o BaseException de controle do Streamlit, como st.rerun)
+        erro = tipo is not None and issubclass(tipo, Exception)
+        self.registro.registrar(self.nome, time.perf_counter() - self.inicio, erro=erro)
+        return False
+
+class RegistroMetricas:
+    """Durações recentes e totais por operação, seguros entre threads"""
+
+    def __init__(self, janela=JANELA):
+        self.janela = janela
+        self.ativo = False
+        self.arquivo = None
+        self.intervalo = INTERVALO_EXPORTACAO
+        self.lock = threading.Lock()
+        self._operacoes = {}
+        self._ultima_exportacao = 0.0
+        self.inicio = time.time()
+
+    def configurar(self, ativo, arquivo=None, intervalo=INTERVALO_EXPORTACAO):
+        self.ativo = bool(ativo)
+        self.arquivo = arquivo
+        self.intervalo = intervalo
+
+    def medir(self, nome):
+        """Gerenciador de contexto que registra a duração do bloco (com erro, se ele levantar exceção)"""
+        return _Cronometro(self, nome) if self.ativo else _NULO
+
+    def registrar(self, nome, segundos, erro=False):
+        with self.lock:
+            operacao = self._operacoes.get(nome)
+            if operacao is None:
+                operacao = self._operacoes[nome] = {"duracoes": deque(maxlen=self.janela), "execucoes": 0,
+                                                    "total": 0.0, "erros": 0, "maximo": 0.0}
+            operacao["duracoes"].append(segundos)
+            operacao["execucoes"] += 1
+            operacao["total"] += segundos
+            operacao["erros"] += erro
+            operacao["maximo"] = max(operacao["maximo"], segundos)
+            exportar = self.arquivo and time.monotonic() - self._ultima_exportacao >= self.intervalo
+            if exportar:
+                self._ultima_exportacao = time.monotonic()
+        if exportar:
+            try:
+                self.exportar_prometheus(self.arquivo)
+            except OSError:
+                pass  # Falha ao gravar as métricas não pode derrubar a operação medida
+
+    def limpar(self):
+        with self.lock:
+            self._operacoes = {}
+            self.inicio = time.time()
+
+    def resumo(self):
+        """Uma linha por operação, da que mais tomou tempo à que menos: execuções, erros, totais e percentis da janela"""
+        with self.lock:
+            operacoes = {nome: {**operacao, "duracoes": np.array(operacao["duracoes"])}
+                         for nome, operacao in self._operacoes.items()}
+        linhas = []
+        for nome, operacao in operacoes.items():
+            percentis = np.percentile(operacao["duracoes"], PERCENTIS)
+            linhas.append({"operacao": nome, "execucoes": operacao["execucoes"], "erros": operacao["erros"],
+                           "total": operacao["total"], "media": operacao["total"] / operacao["execucoes"],
+                           "maximo": operacao["maximo"],
+                           **{f"p{percentil}": valor for percentil, valor in zip(PERCENTIS, percentis)}})
+        return sorted(linhas, key=lambda linha: linha["total"], reverse=True)
+
+    def texto_prometheus(self):
+        """Registro no formato texto de exposição do Prometheus (summary por operação e contador de erros)"""
+        nome = f"{PREFIXO_PROMETHEUS}_operacao_segundos"
+        erros = f"{PREFIXO_PROMETHEUS}_operacao_erros_total"
+        linhas = [f"# HELP {nome} Duracao das operacoes (quantis das ultimas {self.janela} execucoes)",
+                  f"# TYPE {nome} summary"]
+        resumo = self.resumo()
+        for linha in resumo:
+            rotulo = _rotulo(linha["operacao"])
+            for percentil in PERCENTIS:
+                linhas.append(f'{nome}{{operacao="{rotulo}",quantile="{percentil / 100}"}} {linha[f"p{percentil}"]:.6f}')
+            linhas.append(f'{nome}_sum{{operacao="{rotulo}"}} {linha["total"]:.6f}')
+            linhas.append(f'{nome}_count{{operacao="{rotulo}"}} {linha["execucoes"]}')
+        linhas += [f"# HELP {erros} Execucoes que terminaram com erro", f"# TYPE {erros} counter"]
+        linhas += [f'{erros}{{operacao="{_rotulo(linha["operacao"])}"}} {linha["erros"]}' for linha in resumo]
+        linhas += [f"# HELP {PREFIXO_PROMETHEUS}_inicio_segundos Inicio da coleta (epoch)",
+                   f"# TYPE {PREFIXO_PROMETHEUS}_inicio_segundos gauge",
+                   f"{PREFIXO_PROMETHEUS}_inicio_segundos {self.inicio:.0f}"]
+        return "\n".join(linhas) + "\n"
+
+    def exportar_prometheus(self, caminho):
+        """Grava o texto do Prometheus de forma atômica (o coletor nunca lê um arquivo pela metade)"""
+        temporario = caminho_temporario(caminho)
+        with open(temporario, "w", encoding="utf-8") as f:
+            f.write(self.texto_prometheus())
+        os.replace(temporario, caminho)
+
+def _rotulo(texto):
+    return texto.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+_registro = RegistroMetricas()
+_partida = {}
+
+def _inicio_do_processo():
+    """Momento em que o processo começou (time.time()); no Linux, pelo /proc, senão a importação deste módulo"""
+    agora = time.time()
+    try:
+        with open("/proc/self/stat") as f:
+            inicio_desde_boot = int(f.read().rsplit(")", 1)[1].split()[19]) / os.sysconf("SC_CLK_TCK")
+        return agora - (time.clock_gettime(time.CLOCK_BOOTTIME) - inicio_desde_boot)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return agora
+
+INICIO_PROCESSO = _inicio_do_processo()
+
+def registrar_partida(etapa, segundos):
+    """Guarda a duração de uma etapa da partida só na primeira vez; retorna se foi a primeira"""
+    if etapa in _partida:
+        return False
+    _partida[etapa] = {"etapa": etapa, "segundos": segundos, "concluida_apos": time.time() - INICIO_PROCESSO}
+    return True
+
+def relatorio_partida():
+    """Etapas da partida na ordem em que terminaram: duração e segundos desde o início do processo"""
+    return sorted(_partida.values(), key=lambda etapa: etapa["concluida_apos"])
+
+def obter_metricas():
+    """Registro de métricas do processo"""
+    return _registro
+
+def medir(nome):
+    """Mede o bloco no registro do processo (ex.: with medir("grafico.tipos"): ...)"""
+    return _registro.medir(nome)
+
+def cronometrar(nome):
+    """Decorador que mede cada chamada da função no registro do processo"""
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def medida(*args, **kwargs):
+            if not _registro.ativo:
+                return funcao(*args, **kwargs)
+            with _Cronometro(_registro, nome):
+                return funcao(*args, **kwargs)
+        return medida
+    return decorador
@@ -1,16 +1,27 @@
+import time
+_inicio_importacoes = time.perf_counter()  # Relatório de partida: tempo das importações abaixo
 import streamlit as st
+import streamlit.components.v1 as components
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 from datetime import datetime, timedelta
 import os
-import shutil
-import time
-import glob
 import base64
-import json
+from armazenamento import COLUNAS_DATAS_ORIGINAIS, COLUNAS_OS
+from sincronizacao import carregar_configuracao
+from graficos import CacheGraficos
+from metricas import INICIO_PROCESSO, medir, obter_metricas, registrar_partida, relatorio_partida
+from paginacao import ORDENACOES
+from sedes import ServicoSedes
+from servico import (CONFIG_FILE, FUSO_LOCAL, GITHUB_AVAILABLE, LOCAL_FILENAME,
+                     RETENCAO_BACKUPS, STATUS_OPCOES, TIPOS_MANUTENCAO, ConflitoEdicao, DadosInvalidos,
+                     agora_local, obter_servico, versao_registro)
 
+# O matplotlib, o seaborn, o PyGithub e o servidor da API são importados só quando usados
+registrar_partida("importações do aplicativo", time.perf_counter() - _inicio_importacoes)
+
+@st.cache_resource(show_spinner=False)
 def carregar_imagem(caminho_arquivo):
+    """Imagem como data URI, lida e codificada uma única vez por processo"""
     with open(caminho_arquivo, "rb") as f:
         dados = f.read()
         encoded = base64.b64encode(dados).decode()
@@ -23,221 +34,247 @@ st.set_page_config(
     layout="wide"
 )
 
-# Tenta importar o PyGithub com fallback
-try:
-    from github import Github
-    GITHUB_AVAILABLE = True
-except ImportError:
-    GITHUB_AVAILABLE = False
+if not GITHUB_AVAILABLE:
     st.warning("Funcionalidade do GitHub não disponível (PyGithub não instalado)")
 
 # Constantes
-LOCAL_FILENAME = "ordens_servico4.0.csv"
-BACKUP_DIR = "backups"
-MAX_BACKUPS = 10
 SENHA_SUPERVISAO = "king@2025"
-CONFIG_FILE = "config.json"
-
-# Executantes pré-definidos
-EXECUTANTES_PREDEFINIDOS = ["Robson", "Guilherme", "Paulinho"]
-
-# Variáveis globais para configuração do GitHub
-GITHUB_REPO = None
-GITHUB_FILEPATH = None
-GITHUB_TOKEN = None
-
-TIPOS_MANUTENCAO = {
-    1: "Elétrica",
-    2: "Mecânica",
-    3: "Refrigeração",
-    4: "Hidráulica",
-    5: "Civil",
-    6: "Instalação"
-}
+LIMITE_CACHE_GRAFICOS = 32 * 1024 * 1024  # Memória máxima das imagens de gráficos em cache
+
+# Mecanismo de armazenamento: "csv" (CSV com journal), "sqlite" (banco indexado) ou
+# "particionado" (OS em aberto em CSV com journal e concluídas num arquivo mensal colunar)
+TIPO_ARMAZENAMENTO = "csv"
+
+TAMANHOS_PAGINA = [25, 50, 100, 200]
+
+# Segundos entre as consultas de OS novas/alteradas na página inicial: o intervalo volta ao mínimo quando
+# o feed de alterações andou e dobra, até o máximo, a cada consulta sem alteração
+INTERVALO_NOTIFICACOES = 5
+INTERVALO_NOTIFICACOES_MAXIMO = 120
+QUANTIDADE_NOTIFICACOES = 3
+QUANTIDADE_FILA_DESPACHO = 20  # OS da fila exibidas na tela de despacho
 
-STATUS_OPCOES = {
-    1: "Pendente",
-    2: "Pausado",
-    3: "Em execução",
-    4: "Concluído"
+# Componente sem interface que executa a página de novo a cada intervalo (no lugar de recarregar o navegador)
+_atualizacao_automatica = components.declare_component(
+    "atualizacao_automatica",
+    path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "componentes", "atualizacao_automatica"))
+
+# Exibição das colunas tipadas (datas e Urgente) nas tabelas das páginas
+FORMATO_COLUNAS = {
+    "Data": st.column_config.DateColumn("Data", format="DD/MM/YYYY"),
+    "Data Conclusão": st.column_config.DateColumn("Data Conclusão", format="DD/MM/YYYY"),
+    "Urgente": st.column_config.CheckboxColumn("Urgente"),
+    # Texto das datas não interpretadas: só é usado nas gravações
+    **{original: None for original in COLUNAS_DATAS_ORIGINAIS.values()}
 }
 
 def carregar_config():
-    """Carrega as configurações do GitHub do arquivo config.json"""
-    global GITHUB_REPO, GITHUB_FILEPATH, GITHUB_TOKEN
+    """Carrega o mecanismo de armazenamento do arquivo config.json (o GitHub é lido pelo serviço)"""
+    global TIPO_ARMAZENAMENTO
     try:
-        if os.path.exists(CONFIG_FILE):
-            with open(CONFIG_FILE) as f:
-                config = json.load(f)
-                GITHUB_REPO = config.get('github_repo')
-                GITHUB_FILEPATH = config.get('github_filepath')
-                GITHUB_TOKEN = config.get('github_token')
+        TIPO_ARMAZENAMENTO = carregar_configuracao(CONFIG_FILE).get('armazenamento', "csv")
     except Exception as e:
         st.error(f"Erro ao carregar configurações: {str(e)}")
 
-def converter_arquivo_antigo(df):
-    """Converte o formato antigo (com 'Executante') para o novo (com 'Executante1' e 'Executante2')"""
-    if 'Executante' in df.columns and 'Executante1' not in df.columns:
-        df['Executante1'] = df['Executante']
-        df['Executante2'] = ""
-        df['Observações'] = ""  # Adiciona coluna de observações se não existir
-        df.drop('Executante', axis=1, inplace=True)
-    if 'Observações' not in df.columns:  # Garante que a coluna existe
-        df['Observações'] = ""
-    return df
+def servico_principal():
+    """Serviço do diretório de dados compartilhado pelas sessões e pela API (ServicoSedes com "sedes" no config.json)"""
+    return obter_servico(".", TIPO_ARMAZENAMENTO)
+
+def sede_da_sessao(servico):
+    """Sede escolhida na barra lateral (a primeira configurada, até a escolha)"""
+    sede = st.session_state.get("sede")
+    return sede if sede in servico.sedes else servico.nomes[0]
+
+def servico_os():
+    """Serviço das OS (armazenamento, índices, backups e GitHub); com sedes, o da sede escolhida na sessão"""
+    servico = servico_principal()
+    if isinstance(servico, ServicoSedes):
+        return servico.servico(sede_da_sessao(servico))
+    return servico
+
+def configuracao_atual():
+    """Configuração lida do config.json (GitHub, armazenamento e API)"""
+    return servico_os().configuracao
+
+def github_configurado():
+    return servico_os().github_ativo()
 
 def inicializar_arquivos():
     """Garante que todos os arquivos necessários existam e estejam válidos"""
-    os.makedirs(BACKUP_DIR, exist_ok=True)
     carregar_config()
-    
-    usar_github = GITHUB_AVAILABLE and GITHUB_REPO and GITHUB_FILEPATH and GITHUB_TOKEN
-    
-    if not os.path.exists(LOCAL_FILENAME) or os.path.getsize(LOCAL_FILENAME) == 0:
-        if usar_github:
-            baixar_do_github()
+    try:
+        servico = servico_principal()
+        if isinstance(servico, ServicoSedes):
+            servico.inicializar_arquivos(sede_da_sessao(servico))
         else:
-            df = pd.DataFrame(columns=["ID", "Descrição", "Data", "Hora Abertura", "Solicitante", "Local", 
-                                     "Tipo", "Status", "Data Conclusão", "Hora Conclusão", "Executante1", "Executante2", "Urgente", "Observações"])
-            df.to_csv(LOCAL_FILENAME, index=False)
+            servico.inicializar_arquivos()
+    except Exception as e:
+        st.error(f"Erro ao baixar do GitHub: {str(e)}")
+
+@st.cache_resource(show_spinner=False)
+def iniciar_api(porta, host, token):
+    """Sobe a API HTTP em segundo plano uma única vez por processo ("api_porta" no config.json)"""
+    from api import ServidorAPI
+    return ServidorAPI(servico_principal(), host, porta, token).iniciar_em_segundo_plano()
 
 def baixar_do_github():
     """Baixa o arquivo do GitHub se estiver mais atualizado"""
-    if not GITHUB_AVAILABLE:
-        st.error("Funcionalidade do GitHub não está disponível")
-        return False
-    
-    global GITHUB_REPO, GITHUB_FILEPATH, GITHUB_TOKEN
     try:
-        g = Github(GITHUB_TOKEN)
-        repo = g.get_repo(GITHUB_REPO)
-        contents = repo.get_contents(GITHUB_FILEPATH)
-        file_content = contents.decoded_content.decode('utf-8')
-        
-        with open(LOCAL_FILENAME, 'w', encoding='utf-8') as f:
-            f.write(file_content)
+        servico_os().baixar_do_github()
         return True
     except Exception as e:
         st.error(f"Erro ao baixar do GitHub: {str(e)}")
         return False
 
-def enviar_para_github():
-    """Envia o arquivo local para o GitHub"""
-    if not GITHUB_AVAILABLE:
-        st.error("Funcionalidade do GitHub não disponível")
-        return False
-    
-    global GITHUB_REPO, GITHUB_FILEPATH, GITHUB_TOKEN
-    try:
-        g = Github(GITHUB_TOKEN)
-        repo = g.get_repo(GITHUB_REPO)
-        
-        with open(LOCAL_FILENAME, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        try:
-            contents = repo.get_contents(GITHUB_FILEPATH)
-            repo.update_file(contents.path, "Atualização automática do sistema de OS", content, contents.sha)
-        except:
-            repo.create_file(GITHUB_FILEPATH, "Criação inicial do arquivo de OS", content)
-        return True
-    except Exception as e:
-        st.error(f"Erro ao enviar para GitHub: {str(e)}")
-        return False
+def obter_repositorio_backups():
+    """Repositório de backups compartilhado pelo processo (manifesto carregado uma única vez)"""
+    return servico_os().repositorio_backups
 
 def fazer_backup():
-    """Cria um backup dos dados atuais"""
-    if os.path.exists(LOCAL_FILENAME) and os.path.getsize(LOCAL_FILENAME) > 0:
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_name = os.path.join(BACKUP_DIR, f"ordens_servico_{timestamp}.csv")
-        shutil.copy(LOCAL_FILENAME, backup_name)
-        limpar_backups_antigos(MAX_BACKUPS)
-        return backup_name
-    return None
+    """Cria um backup dos dados atuais; retorna (entrada do manifesto, criado) ou (None, False)"""
+    return servico_os().fazer_backup()
 
-def limpar_backups_antigos(max_backups):
-    """Remove backups antigos mantendo apenas os mais recentes"""
-    backups = sorted(glob.glob(os.path.join(BACKUP_DIR, "ordens_servico4.0_*.csv")))
-    while len(backups) > max_backups:
-        try:
-            os.remove(backups[0])
-            backups.pop(0)
-        except:
-            continue
-
-def carregar_ultimo_backup():
-    """Retorna o caminho do backup mais recente"""
-    backups = sorted(glob.glob(os.path.join(BACKUP_DIR, "ordens_servico4.0_*.csv")))
-    if backups:
-        return backups[-1]
-    return None
+def restaurar_backup(nome):
+    """Restaura os dados a partir de um backup do manifesto (checksum conferido antes de aplicar)"""
+    servico_os().restaurar_backup(nome)
+
+def obter_armazenamento():
+    """Retorna o armazenamento configurado (CSV com journal ou SQLite)"""
+    return servico_os().armazenamento
+
+@st.cache_resource(show_spinner=False)
+def obter_cache_graficos():
+    """Imagens dos gráficos compartilhadas por todas as sessões (LRU limitado em memória)"""
+    return CacheGraficos(LIMITE_CACHE_GRAFICOS)
+
+def obter_cubo():
+    """Cubo de indicadores já com as alterações feitas por outros processos"""
+    return servico_os().cubo
+
+def obter_indicadores():
+    """Tempos de atendimento, backlog e vazão, preparados uma vez por versão dos dados (None se falhar)"""
+    try:
+        return servico_os().tabela_indicadores()
+    except Exception as e:
+        st.error(f"Erro ao calcular indicadores: {str(e)}")
+        return None
+
+def obter_sincronizador():
+    return servico_os().sincronizador
 
 def carregar_csv():
     """Carrega os dados do CSV local"""
     try:
         if not os.path.exists(LOCAL_FILENAME):
             inicializar_arquivos()
-            
-        df = pd.read_csv(LOCAL_FILENAME)
-        df = converter_arquivo_antigo(df)
-        
-        colunas_necessarias = ["ID", "Descrição", "Data", "Hora Abertura", "Solicitante", "Local", 
-                             "Tipo", "Status", "Data Conclusão", "Hora Conclusão", "Executante1", "Executante2", "Urgente", "Observações"]
-        
-        for coluna in colunas_necessarias:
-            if coluna not in df.columns:
-                df[coluna] = ""
-        
-        df["Executante1"] = df["Executante1"].astype(str)
-        df["Executante2"] = df["Executante2"].astype(str)
-        df["Data Conclusão"] = df["Data Conclusão"].astype(str)
-        df["Hora Conclusão"] = df["Hora Conclusão"].astype(str)
-        df["Urgente"] = df["Urgente"].astype(str)
-        df["Observações"] = df["Observações"].astype(str)
-        
-        return df
+        return servico_os().carregar()
     except Exception as e:
         st.error(f"Erro ao ler arquivo local: {str(e)}")
-        backup = carregar_ultimo_backup()
-        if backup:
-            try:
-                df = pd.read_csv(backup)
-                df = converter_arquivo_antigo(df)
-                df.to_csv(LOCAL_FILENAME, index=False)
-                return df
-            except Exception as e:
-                st.error(f"Erro ao carregar backup: {str(e)}")
-        
-        return pd.DataFrame(columns=["ID", "Descrição", "Data", "Hora Abertura", "Solicitante", "Local", 
-                                   "Tipo", "Status", "Data Conclusão", "Hora Conclusão", "Executante1", "Executante2", "Urgente", "Observações"])
+        return pd.DataFrame(columns=COLUNAS_OS)
+
+def consultar_os(filtros=None, busca=None, incluir_arquivo=True):
+    """Consulta as OS aplicando os filtros no próprio armazenamento (ex.: {"Status": "Pendente"}, busca=("Local", "mat"))"""
+    try:
+        if not os.path.exists(LOCAL_FILENAME):
+            inicializar_arquivos()
+        return servico_os().consultar(filtros, busca, incluir_arquivo)
+    except Exception as e:
+        st.error(f"Erro ao consultar dados: {str(e)}")
+        return pd.DataFrame(columns=COLUNAS_OS)
+
+def pesquisar_os(texto, campos=None, incluir_arquivo=False):
+    """Busca textual pelo índice (sem acentos, vários termos, trechos de palavra), da OS mais relevante à menos"""
+    try:
+        return servico_os().pesquisar(texto, campos, incluir_arquivo=incluir_arquivo)
+    except Exception as e:
+        st.error(f"Erro ao buscar dados: {str(e)}")
+        return pd.DataFrame(columns=COLUNAS_OS)
+
+def atualizar_periodicamente(segundos, chave):
+    """Executa a página de novo a cada intervalo enquanto ela estiver aberta (e a aba visível)"""
+    _atualizacao_automatica(intervalo_ms=int(segundos * 1000), key=chave, default=0)
+
+def intervalo_notificacoes():
+    """Segundos até a próxima execução da página inicial, conforme o feed tenha andado desde a anterior"""
+    cursor = st.session_state.get("notificacoes", {}).get("cursor")
+    anterior, intervalo = st.session_state.get("intervalo_notificacoes", (None, INTERVALO_NOTIFICACOES))
+    intervalo = min(intervalo * 2, INTERVALO_NOTIFICACOES_MAXIMO) if cursor == anterior else INTERVALO_NOTIFICACOES
+    st.session_state.intervalo_notificacoes = (cursor, intervalo)
+    return intervalo
+
+def _ultimas(ordens):
+    return sorted(ordens, key=lambda os_data: os_data["ID"], reverse=True)[:QUANTIDADE_NOTIFICACOES]
+
+def notificacoes_pendentes():
+    """Últimas OS pendentes, da mais recente à mais antiga, guardadas na sessão
+
+    A cada execução da página, só as OS incluídas/alteradas desde a anterior (feed de alterações) são
+    lidas; a consulta completa das pendentes só é refeita quando uma OS listada deixa de estar pendente
+    ou o feed pede para reiniciar.
+    """
+    servico = servico_os()
+    estado = st.session_state.get("notificacoes")
+    try:
+        if estado is not None:
+            ordens = {os_data["ID"]: os_data for os_data in estado["ordens"]}
+            cursor, reiniciar = estado["cursor"], False
+            while not reiniciar:
+                eventos, cursor, reiniciar = servico.alteracoes(cursor)
+                for evento in eventos:
+                    registro = evento["registro"]
+                    if registro is None or (evento["ID"] in ordens and registro["Status"] != "Pendente"):
+                        reiniciar = True  # Releitura da tabela ou OS listada que saiu das pendentes
+                        break
+                    if registro["Status"] == "Pendente":
+                        ordens[evento["ID"]] = registro
+                if not eventos:
+                    break
+            if not reiniciar:
+                estado = {"cursor": cursor, "ordens": _ultimas(ordens.values())}
+                st.session_state.notificacoes = estado
+                return estado["ordens"]
+        cursor = servico.alteracoes()[1]  # Antes da consulta: o que mudar durante ela vem no próximo feed
+    except Exception as e:
+        st.error(f"Erro ao consultar dados: {str(e)}")
+        return []
+    pendentes = consultar_os({"Status": "Pendente"}, incluir_arquivo=False)
+    estado = {"cursor": cursor, "ordens": _ultimas(pendentes.to_dict("records"))}
+    st.session_state.notificacoes = estado
+    return estado["ordens"]
 
 def salvar_csv(df):
     """Salva o DataFrame no arquivo CSV local e faz backup"""
     try:
-        colunas_necessarias = ["ID", "Descrição", "Data", "Hora Abertura", "Solicitante", "Local", 
-                             "Tipo", "Status", "Data Conclusão", "Hora Conclusão", "Executante1", "Executante2", "Urgente", "Observações"]
-        
-        for coluna in colunas_necessarias:
-            if coluna not in df.columns:
-                df[coluna] = ""
-        
-        df["Executante1"] = df["Executante1"].astype(str)
-        df["Executante2"] = df["Executante2"].astype(str)
-        df["Data Conclusão"] = df["Data Conclusão"].astype(str)
-        df["Hora Conclusão"] = df["Hora Conclusão"].astype(str)
-        df["Urgente"] = df["Urgente"].astype(str)
-        df["Observações"] = df["Observações"].astype(str)
-        
-        df.to_csv(LOCAL_FILENAME, index=False, encoding='utf-8')
-        fazer_backup()
-        
-        if GITHUB_AVAILABLE and GITHUB_REPO and GITHUB_FILEPATH and GITHUB_TOKEN:
-            enviar_para_github()
+        servico_os().salvar_tabela(df)
         return True
     except Exception as e:
         st.error(f"Erro ao salvar dados: {str(e)}")
         return False
 
+def consolidar_dados():
+    """Incorpora as alterações pendentes ao CSV local, gerando backup e sincronizando com o GitHub"""
+    try:
+        servico_os().consolidar()
+        return True
+    except Exception as e:
+        st.error(f"Erro ao consolidar dados: {str(e)}")
+        return False
+
+def salvar_registro(gravacao):
+    """Executa uma gravação do serviço (cadastrar/atualizar) e exibe o erro de validação, conflito ou gravação
+
+    Retorna o resultado da gravação, ou None se nada foi gravado.
+    """
+    try:
+        return gravacao()
+    except DadosInvalidos as e:
+        st.error(str(e))
+    except ConflitoEdicao:
+        st.error("Esta OS foi alterada por outro usuário enquanto você editava. Os dados foram recarregados: revise e salve novamente.")
+    except Exception as e:
+        st.error(f"Erro ao salvar dados: {str(e)}")
+    return None
+
 def pagina_inicial():
     # Carrega a imagem
     logo = carregar_imagem("logo.png")
@@ -255,35 +292,31 @@ def pagina_inicial():
                unsafe_allow_html=True)
     st.markdown("---")
 
-    df = carregar_csv()
-    if not df.empty:
-        # Mostrar apenas OS com status "Pendente"
-        novas_os = df[df["Status"] == "Pendente"]
-        if not novas_os.empty:
-            # Pegar as últimas 3 OS (ou menos se não houver 3)
-            ultimas_os = novas_os.tail(3).iloc[::-1]  # Inverte para mostrar a mais recente primeiro
+    # Mostrar apenas OS com status "Pendente", conferidas de novo com mais frequência enquanto o feed muda
+    ultimas_os = notificacoes_pendentes()
+    atualizar_periodicamente(intervalo_notificacoes(), "atualizacao_pagina_inicial")
+    if ultimas_os:
+        # Container para as notificações
+        with st.container():
+            # Botão para limpar notificações
+            if st.button("🗑️ Limpar Notificações", key="limpar_notificacoes"):
+                st.session_state.notificacoes_limpas = True
+                st.rerun()
+            
+            st.markdown("<style>div[data-testid='stVerticalBlock'] > div:has(>.stAlert) {margin-bottom: -1rem;}</style>", unsafe_allow_html=True)
             
-            # Container para as notificações
-            with st.container():
-                # Botão para limpar notificações
-                if st.button("🗑️ Limpar Notificações", key="limpar_notificacoes"):
-                    st.session_state.notificacoes_limpas = True
+            if not st.session_state.get('notificacoes_limpas', False):
+                for os_data in ultimas_os:
+                    if pd.notna(os_data["Urgente"]) and os_data["Urgente"]:
+                        st.error(f"🚨 ORDEM DE SERVIÇO URGENTE: ID {os_data['ID']} - {os_data['Descrição']}")
+                    else:
+                        st.warning(f"⚠️ NOVA ORDEM DE SERVIÇO ABERTA: ID {os_data['ID']} - {os_data['Descrição']}")
+            else:
+                st.info("Notificações limpas")
+                if st.button("Mostrar Notificações"):
+                    st.session_state.notificacoes_limpas = False
                     st.rerun()
-                
-                st.markdown("<style>div[data-testid='stVerticalBlock'] > div:has(>.stAlert) {margin-bottom: -1rem;}</style>", unsafe_allow_html=True)
-                
-                if not st.session_state.get('notificacoes_limpas', False):
-                    for _, os_data in ultimas_os.iterrows():
-                        if os_data.get("Urgente", "") == "Sim":
-                            st.error(f"🚨 ORDEM DE SERVIÇO URGENTE: ID {os_data['ID']} - {os_data['Descrição']}")
-                        else:
-                            st.warning(f"⚠️ NOVA ORDEM DE SERVIÇO ABERTA: ID {os_data['ID']} - {os_data['Descrição']}")
-                else:
-                    st.info("Notificações limpas")
-                    if st.button("Mostrar Notificações"):
-                        st.session_state.notificacoes_limpas = False
-                        st.rerun()
-            st.markdown("---")
+        st.markdown("---")
 
     st.markdown("""
     ### Bem-vindo ao Sistema de Gestão de Ordens de Serviço
@@ -295,13 +328,13 @@ def pagina_inicial():
     - 🔐 **Supervisão** (área restrita)
     """)
 
-    backups = sorted(glob.glob(os.path.join(BACKUP_DIR, "ordens_servico4.0_*.csv")), reverse=True)
+    backups = obter_repositorio_backups().listar()
     if backups:
         with st.expander("📁 Backups disponíveis"):
-            st.write(f"Último backup: {os.path.basename(backups[0])}")
+            st.write(f"Último backup: {backups[0]['nome']}")
             st.write(f"Total de backups: {len(backups)}")
 
-    if GITHUB_AVAILABLE and GITHUB_REPO:
+    if github_configurado():
         st.info("✅ Sincronização com GitHub ativa")
     elif GITHUB_AVAILABLE:
         st.warning("⚠️ Sincronização com GitHub não configurada")
@@ -318,65 +351,72 @@ def cadastrar_os():
 
         submitted = st.form_submit_button("Cadastrar OS")
         if submitted:
-            if not descricao or not solicitante or not local:
-                st.error("Preencha todos os campos obrigatórios (*)")
-            else:
-                df = carregar_csv()
-                novo_id = int(df["ID"].max()) + 1 if not df.empty and not pd.isna(df["ID"].max()) else 1
-                data_hora_utc = datetime.utcnow()
-                data_hora_local = data_hora_utc - timedelta(hours=3)
-                data_abertura = data_hora_local.strftime("%d/%m/%Y")
-                hora_abertura = data_hora_local.strftime("%H:%M")
-                
-                nova_os = pd.DataFrame([{
-                    "ID": novo_id,
-                    "Descrição": descricao,
-                    "Data": data_abertura,
-                    "Hora Abertura": hora_abertura,
-                    "Solicitante": solicitante,
-                    "Local": local,
-                    "Tipo": "",
-                    "Status": "Pendente",
-                    "Data Conclusão": "",
-                    "Hora Conclusão": "",
-                    "Executante1": "",
-                    "Executante2": "",
-                    "Urgente": "Sim" if urgente else "Não",
-                    "Observações": ""
-                }])
-
-                df = pd.concat([df, nova_os], ignore_index=True)
-                if salvar_csv(df):
-                    st.success("Ordem cadastrada com sucesso! Backup automático realizado.")
-                    time.sleep(1)
-                    st.rerun()
+            # Campos obrigatórios, data/hora de abertura e ID são tratados pelo serviço, como nos pedidos da API
+            if salvar_registro(lambda: servico_os().cadastrar(descricao, solicitante, local, urgente)) is not None:
+                st.success("Ordem cadastrada com sucesso!")
+                time.sleep(1)
+                st.rerun()
 
 def listar_os():
     st.header("📋 Listagem Completa de OS")
-    df = carregar_csv()
 
-    if df.empty:
+    if obter_armazenamento().contar() == 0:
         st.warning("Nenhuma ordem de serviço cadastrada ainda.")
     else:
         with st.expander("Filtrar OS"):
             col1, col2 = st.columns(2)
             with col1:
-                filtro_status = st.selectbox("Status", ["Todos"] + list(STATUS_OPCOES.values()))
+                filtro_status = st.selectbox("Status", ["Em aberto", "Todos"] + list(STATUS_OPCOES.values()))
             with col2:
                 filtro_tipo = st.selectbox("Tipo de Manutenção", ["Todos"] + list(TIPOS_MANUTENCAO.values()))
 
-        if filtro_status != "Todos":
-            df = df[df["Status"] == filtro_status]
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            ordenacao = st.selectbox("Ordenar por", ORDENACOES)
+        with col2:
+            decrescente = st.selectbox("Ordem", ["Crescente", "Decrescente"]) == "Decrescente"
+        with col3:
+            tamanho = st.selectbox("OS por página", TAMANHOS_PAGINA, index=1)
+
+        filtros = {}
+        if filtro_status == "Em aberto":
+            # Sem as concluídas, que no armazenamento particionado ficam no arquivo e não precisam ser lidas
+            filtros["Status"] = [status for status in STATUS_OPCOES.values() if status != "Concluído"]
+        elif filtro_status != "Todos":
+            filtros["Status"] = filtro_status
         if filtro_tipo != "Todos":
-            df = df[df["Tipo"] == filtro_tipo]
+            filtros["Tipo"] = filtro_tipo
 
-        st.dataframe(df, use_container_width=True)
+        # Cursores das páginas já visitadas; mudar filtros ou ordenação volta à primeira página
+        consulta = (filtro_status, filtro_tipo, ordenacao, decrescente, tamanho)
+        if st.session_state.get("listagem_consulta") != consulta:
+            st.session_state.listagem_consulta = consulta
+            st.session_state.listagem_cursores = [None]
+        cursores = st.session_state.listagem_cursores
+
+        try:
+            linhas, proximo, total = servico_os().pagina(ordenacao, filtros, cursores[-1], tamanho, decrescente)
+        except Exception as e:
+            st.error(f"Erro ao consultar dados: {str(e)}")
+            return
+        st.dataframe(linhas, use_container_width=True, hide_index=True, column_config=FORMATO_COLUNAS)
+
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col1:
+            if st.button("⬅️ Anterior", disabled=len(cursores) == 1):
+                cursores.pop()
+                st.rerun()
+        with col2:
+            st.caption(f"Página {len(cursores)} de {max(1, -(-total // tamanho))} — {total} OS")
+        with col3:
+            if st.button("Próxima ➡️", disabled=proximo is None):
+                cursores.append(proximo)
+                st.rerun()
 
 def buscar_os():
     st.header("🔍 Busca Avançada")
-    df = carregar_csv()
 
-    if df.empty:
+    if obter_armazenamento().contar() == 0:
         st.warning("Nenhuma OS cadastrada para busca.")
         return
 
@@ -384,68 +424,60 @@ def buscar_os():
         col1, col2 = st.columns([1, 3])
         with col1:
             criterio = st.radio("Critério de busca:",
-                              ["Status", "ID", "Solicitante", "Local", "Tipo", "Executante1", "Executante2", "Observações"])
+                              ["Status", "ID", "Texto", "Solicitante", "Local", "Tipo", "Executante1", "Executante2", "Observações"])
         with col2:
+            # No armazenamento particionado, as concluídas arquivadas só são lidas se pedidas
+            arquivo = True
+            if servico_os().particionado and criterio not in ("ID", "Status"):
+                arquivo = st.checkbox("Incluir OS concluídas arquivadas")
             if criterio == "ID":
                 busca = st.number_input("Digite o ID da OS", min_value=1)
-                resultado = df[df["ID"] == busca]
+                resultado = consultar_os({"ID": busca})
             elif criterio == "Status":
                 busca = st.selectbox("Selecione o status", list(STATUS_OPCOES.values()))
-                resultado = df[df["Status"] == busca]
+                resultado = consultar_os({"Status": busca})
             elif criterio == "Tipo":
                 busca = st.selectbox("Selecione o tipo", list(TIPOS_MANUTENCAO.values()))
-                resultado = df[df["Tipo"] == busca]
+                resultado = consultar_os({"Tipo": busca}, incluir_arquivo=arquivo)
+            elif criterio == "Texto":
+                busca = st.text_input("Digite os termos (descrição, observações, solicitante, local ou executantes)")
+                resultado = pesquisar_os(busca, incluir_arquivo=arquivo) if busca.strip() else consultar_os(incluir_arquivo=arquivo)
             else:
                 busca = st.text_input(f"Digite o {criterio.lower()}")
-                resultado = df[df[criterio].astype(str).str.contains(busca, case=False)]
+                resultado = (pesquisar_os(busca, [criterio], incluir_arquivo=arquivo) if busca.strip()
+                             else consultar_os(incluir_arquivo=arquivo))
 
     if not resultado.empty:
         st.success(f"Encontradas {len(resultado)} OS:")
-        st.dataframe(resultado, use_container_width=True)
+        st.dataframe(resultado, use_container_width=True, column_config=FORMATO_COLUNAS)
     else:
         st.warning("Nenhuma OS encontrada com os critérios informados.")
 
 def dashboard():
     st.header("📊 Dashboard Analítico")
-    df = carregar_csv()
 
-    if df.empty:
+    if obter_armazenamento().contar() == 0:
         st.warning("Nenhuma OS cadastrada para análise.")
         return
 
-    tab1, tab2, tab3 = st.tabs(["🔧 Tipos", "👥 Executantes", "📈 Status"])
+    cubo = obter_cubo()
+    graficos = obter_cache_graficos()
+    if st.button("🔁 Recalcular Indicadores"):
+        try:
+            cubo = servico_os().recalcular_indicadores()
+        except Exception as e:
+            st.error(f"Erro ao recalcular indicadores: {str(e)}")
+
+    tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs(["🔧 Tipos", "👥 Executantes", "📈 Status", "⏱️ Atendimento",
+                                                  "📦 Backlog", "🏭 Vazão"])
 
     with tab1:
         st.subheader("Distribuição por Tipo de Manutenção")
-        tipo_counts = df["Tipo"].value_counts()
+        tipo_counts = cubo.contagem("Tipo")
         
-        if not tipo_counts.empty:
-            fig, ax = plt.subplots(figsize=(3, 2))
-            
-            wedges, texts, autotexts = ax.pie(
-                tipo_counts.values,
-                labels=None,
-                autopct='%1.1f%%',
-                startangle=90,
-                wedgeprops=dict(width=0.4),
-                textprops={'fontsize': 4, 'color': 'black'}
-            )
-            
-            centre_circle = plt.Circle((0,0), 0.70, fc='white')
-            ax.add_artist(centre_circle)
-            
-            ax.legend(
-                wedges,
-                tipo_counts.index,
-                title="Tipos",
-                loc="lower right",
-                bbox_to_anchor=(1.5, 0),
-                prop={'size': 4},
-                title_fontsize='6'
-            )
-            
-            ax.set_title("Distribuição por Tipo", fontsize=10)
-            st.pyplot(fig, bbox_inches='tight')
+        if tipo_counts:
+            with medir("grafico.tipos"):
+                st.image(graficos.rosca(tipo_counts, "Distribuição por Tipo", "Tipos"), use_column_width=True)
         else:
             st.warning("Nenhum dado de tipo disponível")
 
@@ -457,16 +489,8 @@ def dashboard():
         with col1:
             periodo = st.selectbox("Período", ["Todos", "Por Mês/Ano"])
         
-        df_filtrado = df.copy()
-        
         if periodo == "Por Mês/Ano":
             with col2:
-                # Converter a coluna Data Conclusão para datetime
-                df_filtrado['Data Conclusão'] = pd.to_datetime(df_filtrado['Data Conclusão'], dayfirst=True, errors='coerce')
-                
-                # Filtrar apenas OS concluídas
-                df_filtrado = df_filtrado[df_filtrado['Status'] == 'Concluído']
-                
                 # Criar listas de meses e anos disponíveis
                 meses = list(range(1, 13))
                 anos = list(range(2024, 2031))  # De 2024 até 2030
@@ -474,77 +498,97 @@ def dashboard():
                 mes_selecionado = st.selectbox("Mês", meses, format_func=lambda x: f"{x:02d}")
                 ano_selecionado = st.selectbox("Ano", anos)
                 
-                # Filtrar os dados pela data de conclusão
-                df_filtrado = df_filtrado[
-                    (df_filtrado['Data Conclusão'].dt.month == mes_selecionado) & 
-                    (df_filtrado['Data Conclusão'].dt.year == ano_selecionado)
-                ]
+            # Apenas OS concluídas no mês selecionado, lidas direto do cubo
+            executante_counts = cubo.contagem("Executante", Status="Concluído",
+                                              Mes=f"{ano_selecionado}-{mes_selecionado:02d}")
         else:
             # Filtrar apenas OS concluídas quando selecionado "Todos"
-            df_filtrado = df_filtrado[df_filtrado['Status'] == 'Concluído']
-        
-        # Concatenar executantes e filtrar valores inválidos
-        executantes = pd.concat([df_filtrado["Executante1"], df_filtrado["Executante2"]])
-        executantes = executantes[~executantes.isin(['', 'nan'])]
+            executante_counts = cubo.contagem("Executante", Status="Concluído")
         
-        if not executantes.empty:
-            executante_counts = executantes.value_counts()
-            
-            fig, ax = plt.subplots(figsize=(3, 2))
-            
-            wedges, texts, autotexts = ax.pie(
-                executante_counts.values,
-                labels=None,
-                autopct='%1.1f%%',
-                startangle=90,
-                wedgeprops=dict(width=0.4),
-                textprops={'fontsize': 4, 'color': 'black'}
-            )
-            
-            centre_circle = plt.Circle((0,0), 0.70, fc='white')
-            ax.add_artist(centre_circle)
-            
-            ax.legend(
-                wedges,
-                executante_counts.index,
-                title="Executantes",
-                loc="lower right",
-                bbox_to_anchor=(1.5, 0),
-                prop={'size': 4},
-                title_fontsize='6'
-            )
-            
-            ax.set_title("OS por Executantes", fontsize=10)
-            st.pyplot(fig, bbox_inches='tight')
+        if executante_counts:
+            with medir("grafico.executantes"):
+                st.image(graficos.rosca(executante_counts, "OS por Executantes", "Executantes"), use_column_width=True)
         else:
             st.warning("Nenhuma OS concluída encontrada para o período selecionado")
 
     with tab3:
         st.subheader("Distribuição por Status")
-        status_counts = df["Status"].value_counts()
+        status_counts = cubo.contagem("Status")
         
-        if not status_counts.empty:
-            fig, ax = plt.subplots(figsize=(3, 2))
-            
-            bars = ax.bar(
-                status_counts.index,
-                status_counts.values,
-                color=sns.color_palette("pastel")
-            )
-            
-            for bar in bars:
-                height = bar.get_height()
-                ax.text(bar.get_x() + bar.get_width()/2., height,
-                        f'{height}',
-                        ha='center', va='bottom',
-                        fontsize=4)
-            
-            ax.set_title("Distribuição por Status", fontsize=10)
-            plt.xticks(rotation=45, fontsize=6)
-            st.pyplot(fig, bbox_inches='tight')
+        if status_counts:
+            with medir("grafico.status"):
+                st.image(graficos.barras(status_counts, "Distribuição por Status"), use_column_width=True)
         else:
             st.warning("Nenhum dado de status disponível")
 
+    indicadores = obter_indicadores()
+    if indicadores is None:
+        return
+    agora = agora_local()
+    formato_horas = {coluna: st.column_config.NumberColumn(coluna, format="%.1f")
+                     for coluna in ["Média", "p50", "p90", "p99", "Por semana"]}
+
+    with tab4:
+        st.subheader("Tempo de Atendimento (abertura até conclusão, em horas)")
+        col1, col2 = st.columns(2)
+        with col1:
+            agrupar = st.selectbox("Agrupar por", ["Tipo", "Local", "Urgente"], key="atendimento_grupo")
+        with col2:
+            periodos = {"Todo o histórico": None, "Últimos 90 dias": 90, "Últimos 30 dias": 30}
+            periodo = st.selectbox("Concluídas em", list(periodos), key="atendimento_periodo")
+        desde = agora - timedelta(days=periodos[periodo]) if periodos[periodo] else None
+
+        tempos = indicadores.tempo_atendimento(agrupar, desde)
+        if tempos.empty:
+            st.warning("Nenhuma OS concluída com datas de abertura e conclusão no período")
+        else:
+            st.caption("Média = MTTR; p50/p90/p99 = tempo dentro do qual ficaram 50%/90%/99% das OS. "
+                       "Sem as horas de abertura e conclusão, conta-se em dias corridos (múltiplos de 24 h).")
+            st.dataframe(tempos, use_container_width=True, column_config=formato_horas)
+            distribuicao = {faixa: int(quantidade) for faixa, quantidade in
+                            indicadores.distribuicao_atendimento(desde=desde).items()}
+            with medir("grafico.atendimento"):
+                st.image(graficos.barras(distribuicao, "OS por Tempo de Atendimento"), use_column_width=True)
+
+    with tab5:
+        st.subheader("Backlog e Envelhecimento das OS em Aberto")
+        idade = indicadores.idade_aberta(agora)
+        if idade is None:
+            st.info("Nenhuma OS em aberto")
+        else:
+            col1, col2, col3 = st.columns(3)
+            col1.metric("OS em aberto", f"{int(idade['OS'])}")
+            col2.metric("Idade média", f"{idade['Média']:.1f} dias")
+            col3.metric("Idade p90", f"{idade['p90']:.1f} dias")
+            envelhecimento = {faixa: int(quantidade) for faixa, quantidade in indicadores.envelhecimento(agora).items()}
+            with medir("grafico.envelhecimento"):
+                st.image(graficos.barras(envelhecimento, "OS em Aberto por Idade"), use_column_width=True)
+            with st.expander("Idade por Tipo"):
+                st.dataframe(indicadores.envelhecimento(agora, "Tipo"), use_container_width=True)
+
+        semanas = st.selectbox("Semanas", [12, 26, 52], index=1, key="backlog_semanas")
+        backlog = indicadores.backlog_semanal(agora, semanas)
+        series = {coluna: {semana.strftime("%d/%m/%y"): int(valor) for semana, valor in backlog[coluna].items()}
+                  for coluna in backlog.columns}
+        with medir("grafico.backlog"):
+            st.image(graficos.linhas(series, "Backlog Semanal"), use_column_width=True)
+        with st.expander("Tabela semanal"):
+            st.dataframe(backlog, use_container_width=True)
+
+    with tab6:
+        st.subheader("Vazão por Executante (OS concluídas)")
+        semanas = st.selectbox("Últimas semanas", [1, 4, 12, 52], index=1, key="vazao_semanas")
+        vazao = indicadores.vazao(agora, semanas)
+        if vazao.empty:
+            st.warning("Nenhuma OS concluída no período")
+        else:
+            st.caption("Cada executante (principal ou secundário) conta a OS; tempos de atendimento em horas.")
+            st.dataframe(vazao, use_container_width=True, column_config=formato_horas)
+            with medir("grafico.vazao"):
+                st.image(graficos.barras({executante: int(quantidade) for executante, quantidade in
+                                          vazao["Concluídas"].items()}, "OS Concluídas por Executante"),
+                         use_column_width=True)
+
 def pagina_supervisao():
     st.header("🔐 Área de Supervisão")
     
@@ -559,33 +603,104 @@ def pagina_supervisao():
     
     st.success("Acesso autorizado à área de supervisão")
     
-    opcao_supervisao = st.selectbox(
-        "Selecione a função de supervisão:",
-        [
-            "🔄 Atualizar OS",
-            "💾 Gerenciar Backups",
-            "⚙️ Configurar GitHub"
-        ]
-    )
+    opcoes = [
+        "🔄 Atualizar OS",
+        "🚚 Despacho",
+        "💾 Gerenciar Backups",
+        "⚙️ Configurar GitHub",
+        "📡 Status da Sincronização",
+        "📈 Desempenho"
+    ]
+    if isinstance(servico_principal(), ServicoSedes):
+        opcoes.append("🌐 Visão Geral das Sedes")
+    opcao_supervisao = st.selectbox("Selecione a função de supervisão:", opcoes)
     
     if opcao_supervisao == "🔄 Atualizar OS":
         atualizar_os()
+    elif opcao_supervisao == "🚚 Despacho":
+        despacho()
     elif opcao_supervisao == "💾 Gerenciar Backups":
         gerenciar_backups()
     elif opcao_supervisao == "⚙️ Configurar GitHub":
         configurar_github()
+    elif opcao_supervisao == "📡 Status da Sincronização":
+        status_sincronizacao()
+    elif opcao_supervisao == "📈 Desempenho":
+        desempenho()
+    elif opcao_supervisao == "🌐 Visão Geral das Sedes":
+        visao_geral_sedes()
+
+def despacho():
+    st.header("🚚 Despacho")
+
+    servico = servico_os()
+    try:
+        os_data, sugestao = servico.proxima_os()
+        fila, total = servico.fila_despacho(QUANTIDADE_FILA_DESPACHO)
+        cargas = servico.cargas_executantes()
+    except Exception as e:
+        st.error(f"Erro ao consultar a fila de despacho: {str(e)}")
+        return
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("OS na fila", total)
+    col2.metric("Próxima OS", os_data["ID"] if os_data else "-")
+    col3.metric("Executante sugerido", sugestao or "-")
+
+    if os_data is None:
+        st.info("Nenhuma OS pendente ou pausada à espera de despacho")
+    else:
+        urgente = pd.notna(os_data["Urgente"]) and os_data["Urgente"]
+        aviso = st.error if urgente else st.warning
+        aviso(f"{'🚨 URGENTE - ' if urgente else ''}OS {os_data['ID']}: {os_data['Descrição']}")
+        abertura = os_data["Data"].strftime("%d/%m/%Y") if pd.notna(os_data["Data"]) else "-"
+        st.write(f"**Local:** {os_data['Local']}  |  **Solicitante:** {os_data['Solicitante']}  |  "
+                 f"**Aberta em:** {abertura} {os_data['Hora Abertura'] if pd.notna(os_data['Hora Abertura']) else ''}  |  "
+                 f"**Status:** {os_data['Status']}")
+
+        executantes = list(cargas)
+        with st.form("despacho_form"):
+            executante = st.selectbox("Executante", executantes,
+                                      index=executantes.index(sugestao) if sugestao in executantes else 0,
+                                      format_func=lambda nome: f"{nome} ({cargas[nome][0]} em aberto, "
+                                                               f"{cargas[nome][1]} em execução)")
+            if st.form_submit_button("▶️ Despachar"):
+                # Vale a OS que estava na tela, mesmo que outra tenha passado à frente na fila
+                os_id, versao = (st.session_state.pop("despacho_exibido", None)
+                                 or (os_data["ID"], versao_registro(os_data)))
+                if salvar_registro(lambda: servico.despachar(os_id, executante, versao)) is not None:
+                    st.success(f"OS {os_id} em execução com {executante}")
+                    time.sleep(1)
+                    st.rerun()
+            else:
+                st.session_state.despacho_exibido = (os_data["ID"], versao_registro(os_data))
+
+    st.subheader("Fila de despacho")
+    st.caption("Urgentes primeiro, depois as abertas há mais tempo")
+    if fila.empty:
+        st.info("Fila vazia")
+    else:
+        st.dataframe(fila[["ID", "Urgente", "Data", "Hora Abertura", "Descrição", "Local", "Status"]],
+                     use_container_width=True, hide_index=True, column_config=FORMATO_COLUNAS)
+
+    st.subheader("Carga dos executantes")
+    st.dataframe(pd.DataFrame.from_dict(cargas, orient="index", columns=["Em aberto", "Em execução"])
+                 .rename_axis("Executante"), use_container_width=True)
 
 def atualizar_os():
     st.header("🔄 Atualizar Ordem de Serviço")
-    df = carregar_csv()
 
-    nao_concluidas = df[df["Status"] != "Concluído"]
+    nao_concluidas = obter_armazenamento().listar_abertas()
     if nao_concluidas.empty:
         st.warning("Nenhuma OS pendente")
         return
 
     os_id = st.selectbox("Selecione a OS", nao_concluidas["ID"])
-    os_data = df[df["ID"] == os_id].iloc[0]
+    os_data = obter_armazenamento().obter(os_id)
+    executantes = servico_os().executantes()
+    sugestao = servico_os().despacho.sugerir(executantes)
+    # Versão da OS que o usuário está vendo; na submissão vale a registrada quando o formulário foi exibido
+    versoes_exibidas = st.session_state.setdefault("versoes_os", {})
 
     with st.form("atualizar_form"):
         st.write(f"**Descrição:** {os_data['Descrição']}")
@@ -607,34 +722,34 @@ def atualizar_os():
                 index=list(STATUS_OPCOES.values()).index(os_data["Status"])
             )
 
-            executante1_atual = str(os_data["Executante1"]) if pd.notna(os_data["Executante1"]) else ""
+            # Sem executante definido, vem marcado o de menor carga
+            executante1_atual = str(os_data["Executante1"]) if pd.notna(os_data["Executante1"]) else sugestao
             try:
-                index_executante1 = EXECUTANTES_PREDEFINIDOS.index(executante1_atual)
+                index_executante1 = executantes.index(executante1_atual)
             except ValueError:
                 index_executante1 = 0
 
             executante1 = st.selectbox(
                 "Executante Principal*",
-                EXECUTANTES_PREDEFINIDOS,
+                executantes,
                 index=index_executante1
             )
 
         with col2:
             executante2_atual = str(os_data["Executante2"]) if pd.notna(os_data["Executante2"]) else ""
             try:
-                index_executante2 = EXECUTANTES_PREDEFINIDOS.index(executante2_atual) + 1
+                index_executante2 = executantes.index(executante2_atual) + 1
             except ValueError:
                 index_executante2 = 0
 
             executante2 = st.selectbox(
                 "Executante Secundário (opcional)",
-                [""] + EXECUTANTES_PREDEFINIDOS,
+                [""] + executantes,
                 index=index_executante2
             )
 
             if novo_status == "Concluído":
-                data_hora_utc = datetime.utcnow()
-                data_hora_local = data_hora_utc - timedelta(hours=3)
+                data_hora_local = agora_local()
                 data_atual = data_hora_local.strftime("%d/%m/%Y")
                 hora_atual = data_hora_local.strftime("%H:%M")
                 
@@ -655,82 +770,213 @@ def atualizar_os():
                 data_conclusao = ""
                 hora_conclusao = ""
 
-        observacoes = st.text_area("Observações", value=os_data.get("Observações", ""))
+        observacoes = st.text_area("Observações", value=os_data["Observações"] if pd.notna(os_data["Observações"]) else "")
 
         submitted = st.form_submit_button("Atualizar OS")
 
         if submitted:
-            if novo_status in ["Em execução", "Concluído"] and not executante1:
-                st.error("Selecione pelo menos um executante principal para este status!")
-            else:
-                df.loc[df["ID"] == os_id, "Status"] = novo_status
-                df.loc[df["ID"] == os_id, "Executante1"] = executante1
-                df.loc[df["ID"] == os_id, "Executante2"] = executante2 if executante2 != "" else ""
-                df.loc[df["ID"] == os_id, "Tipo"] = tipo
-                df.loc[df["ID"] == os_id, "Observações"] = observacoes
-                
-                if novo_status == "Concluído":
-                    df.loc[df["ID"] == os_id, "Data Conclusão"] = data_conclusao
-                    df.loc[df["ID"] == os_id, "Hora Conclusão"] = hora_conclusao
-                else:
-                    df.loc[df["ID"] == os_id, "Data Conclusão"] = ""
-                    df.loc[df["ID"] == os_id, "Hora Conclusão"] = ""
-                
-                if salvar_csv(df):
-                    st.success("OS atualizada com sucesso! Backup automático realizado.")
-                    time.sleep(1)
-                    st.rerun()
+            alteracoes = {
+                "Status": novo_status,
+                "Executante1": executante1,
+                "Executante2": executante2 if executante2 != "" else "",
+                "Tipo": tipo,
+                "Observações": observacoes,
+                "Data Conclusão": data_conclusao if novo_status == "Concluído" else "",
+                "Hora Conclusão": hora_conclusao if novo_status == "Concluído" else ""
+            }
+
+            # Executante obrigatório e conflito com outra sessão são verificados pelo serviço
+            versao = versoes_exibidas.pop(os_id, None) or versao_registro(os_data)
+            if salvar_registro(lambda: servico_os().atualizar(os_id, alteracoes, versao)) is not None:
+                st.success("OS atualizada com sucesso!")
+                time.sleep(1)
+                st.rerun()
+        else:
+            versoes_exibidas[os_id] = versao_registro(os_data)
 
 def gerenciar_backups():
     st.header("💾 Gerenciamento de Backups")
-    backups = sorted(glob.glob(os.path.join(BACKUP_DIR, "ordens_servico4.0_*.csv")), reverse=True)
     
-    if not backups:
-        st.warning("Nenhum backup disponível")
-        return
+    pendencias = obter_armazenamento().pendencias()
+    st.write(f"Alterações ainda não consolidadas no CSV: {pendencias}")
+    if st.button("🗜️ Consolidar Alterações", disabled=pendencias == 0):
+        if consolidar_dados():
+            st.success("Alterações incorporadas ao arquivo de dados")
+            time.sleep(1)
+            st.rerun()
     
-    st.write(f"Total de backups: {len(backups)}")
-    st.write(f"Último backup: {os.path.basename(backups[0])}")
+    repositorio = obter_repositorio_backups()
     
     col1, col2 = st.columns(2)
     with col1:
         if st.button("🔄 Criar Backup Agora"):
-            backup_path = fazer_backup()
-            if backup_path:
-                st.success(f"Backup criado: {os.path.basename(backup_path)}")
+            entrada, criado = fazer_backup()
+            if entrada and criado:
+                st.success(f"Backup criado: {entrada['nome']}")
                 time.sleep(1)
                 st.rerun()
+            elif entrada:
+                st.info(f"Nenhuma alteração desde o backup {entrada['nome']}")
             else:
                 st.error("Falha ao criar backup")
     
     with col2:
-        if st.button("🧹 Limpar Backups Antigos"):
-            limpar_backups_antigos(MAX_BACKUPS)
-            st.success(f"Mantidos apenas os {MAX_BACKUPS} backups mais recentes")
+        if st.button("🧹 Aplicar Política de Retenção"):
+            removidos = repositorio.aplicar_retencao()
+            st.success(f"{removidos} backup(s) removido(s) pela política de retenção")
             time.sleep(1)
             st.rerun()
     
+    backups = repositorio.listar()
+    
+    if not backups:
+        st.warning("Nenhum backup disponível")
+        return
+    
+    tamanho_original = sum(b["tamanho"] for b in backups)
+    tamanho_disco = sum(b["tamanho_comprimido"] for b in backups)
+    st.write(f"Total de backups: {len(backups)}")
+    st.write(f"Último backup: {backups[0]['nome']}")
+    st.write(f"Espaço em disco: {tamanho_disco / 1024:.1f} KB (dados originais: {tamanho_original / 1024:.1f} KB)")
+    st.caption(f"Retenção: último backup de cada hora nas últimas {RETENCAO_BACKUPS['horas']} horas, "
+               f"de cada dia nos últimos {RETENCAO_BACKUPS['dias']} dias e de cada mês nos últimos {RETENCAO_BACKUPS['meses']} meses")
+    
     st.markdown("---")
     st.subheader("Restaurar Backup")
     
     backup_selecionado = st.selectbox(
         "Selecione um backup para restaurar",
-        [os.path.basename(b) for b in backups]
+        [b["nome"] for b in backups]
     )
     
     if st.button("🔙 Restaurar Backup Selecionado"):
-        backup_fullpath = os.path.join(BACKUP_DIR, backup_selecionado)
         try:
-            shutil.copy(backup_fullpath, LOCAL_FILENAME)
+            restaurar_backup(backup_selecionado)
             st.success(f"Dados restaurados do backup: {backup_selecionado}")
             time.sleep(2)
             st.rerun()
         except Exception as e:
             st.error(f"Erro ao restaurar: {str(e)}")
 
+def formatar_momento(momento):
+    """Formata um timestamp (segundos desde a época) no horário local usado pelo sistema"""
+    if not momento:
+        return "-"
+    return datetime.fromtimestamp(momento, FUSO_LOCAL).strftime("%d/%m/%Y %H:%M:%S")
+
+def status_sincronizacao():
+    st.header("📡 Status da Sincronização")
+    
+    if not github_configurado():
+        st.warning("⚠️ Sincronização com GitHub não configurada")
+        return
+    
+    status = obter_sincronizador().status()
+    
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Alterações na fila", status["pendentes"])
+    col2.metric("Tentativas com erro", status["tentativas"])
+    col3.metric("Enviando agora", "Sim" if status["enviando"] else "Não")
+    
+    st.write(f"**Última sincronização:** {formatar_momento(status['ultima_sincronizacao'])}")
+    if status["ultimos_conflitos"]:
+        st.warning(f"⚠️ {status['ultimos_conflitos']} OS com conflito na última sincronização: nos campos alterados "
+                   "aqui e no GitHub ficou o valor local, e as OS incluídas dos dois lados com o mesmo ID "
+                   "ficaram com ID novo aqui")
+    st.caption(f"OS com conflito desde o início da fila: {status['conflitos']}")
+    if status["ultimo_erro"]:
+        st.error(f"Último erro: {status['ultimo_erro']}")
+        st.write(f"**Próxima tentativa:** {formatar_momento(status['proxima_tentativa'])}")
+    
+    if st.button("📤 Sincronizar Agora"):
+        obter_sincronizador().sincronizar_agora()
+        st.success("Envio solicitado")
+        time.sleep(1)
+        st.rerun()
+
+def desempenho():
+    st.header("📈 Desempenho")
+
+    metricas = obter_metricas()
+    config = configuracao_atual()
+    with st.form("metricas_form"):
+        ativo = st.checkbox("Coletar métricas de desempenho", value=metricas.ativo)
+        arquivo = st.text_input("Arquivo para o Prometheus (opcional, ex.: metricas.prom)",
+                                value=config.get('metricas_arquivo') or "")
+        if st.form_submit_button("Salvar"):
+            try:
+                servico_os().configurar_metricas(ativo, arquivo.strip())
+                st.success("Configuração salva")
+            except Exception as e:
+                st.error(f"Erro ao salvar configuração: {str(e)}")
+
+    partida = relatorio_partida()
+    if partida:
+        st.subheader("Partida do processo")
+        st.caption(f"Processo iniciado em {formatar_momento(INICIO_PROCESSO)}")
+        st.dataframe(pd.DataFrame(partida).rename(columns={"etapa": "Etapa", "segundos": "Duração (s)",
+                                                             "concluida_apos": "Concluída após (s)"}),
+                     use_container_width=True, hide_index=True,
+                     column_config={coluna: st.column_config.NumberColumn(format="%.2f")
+                                    for coluna in ("Duração (s)", "Concluída após (s)")})
+
+    if not metricas.ativo:
+        st.info("A coleta está desligada: ligue-a acima e use o sistema para ver os tempos de cada operação.")
+        return
+
+    resumo = metricas.resumo()
+    st.caption(f"Desde {formatar_momento(metricas.inicio)}; percentis das últimas {metricas.janela} execuções de cada operação")
+    if not resumo:
+        st.info("Nenhuma operação medida ainda")
+    else:
+        tabela = pd.DataFrame(resumo)
+        milissegundos = ["media", "p50", "p90", "p99", "maximo"]
+        tabela[milissegundos] = tabela[milissegundos] * 1000
+        tabela = tabela.rename(columns={"operacao": "Operação", "execucoes": "Execuções", "erros": "Erros",
+                                        "total": "Total (s)", "media": "Média (ms)", "p50": "p50 (ms)",
+                                        "p90": "p90 (ms)", "p99": "p99 (ms)", "maximo": "Máximo (ms)"})
+        st.dataframe(tabela, use_container_width=True, hide_index=True,
+                     column_config={coluna: st.column_config.NumberColumn(format="%.1f")
+                                    for coluna in tabela.columns if "(ms)" in coluna or coluna == "Total (s)"})
+
+    graficos = obter_cache_graficos()
+    st.write(f"**Cache de gráficos:** {graficos.acertos} acertos, {graficos.falhas} renderizações")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button("⬇️ Baixar no formato do Prometheus", metricas.texto_prometheus(),
+                           file_name="metricas.prom", mime="text/plain")
+    with col2:
+        if st.button("🧹 Zerar Métricas"):
+            metricas.limpar()
+            st.rerun()
+
+def visao_geral_sedes():
+    st.header("🌐 Visão Geral das Sedes")
+
+    servico = servico_principal()
+    try:
+        visao = servico.visao_geral()
+    except Exception as e:
+        st.error(f"Erro ao consultar as sedes: {str(e)}")
+        return
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Sedes", len(visao))
+    col2.metric("Total de OS", int(visao["OS"].sum()))
+    col3.metric("Em aberto", int(visao[["Pendente", "Em execução", "Pausado"]].sum().sum()))
+
+    st.dataframe(visao, use_container_width=True,
+                 column_config={coluna: st.column_config.NumberColumn(format="%.1f")
+                                for coluna in ("MTTR (h)", "p90 atendimento (h)", "Idade média em aberto (dias)")})
+    st.caption("Sedes consultadas em paralelo, cada uma nos seus próprios arquivos")
+
+    graficos = obter_cache_graficos()
+    st.image(graficos.barras({sede: int(total) for sede, total in visao["OS"].items()}, "OS por Sede"),
+             use_column_width=True)
+
 def configurar_github():
     st.header("⚙️ Configuração do GitHub")
-    global GITHUB_REPO, GITHUB_FILEPATH, GITHUB_TOKEN
     
     if not GITHUB_AVAILABLE:
         st.error("""Funcionalidade do GitHub não está disponível. 
@@ -738,31 +984,18 @@ def configurar_github():
                 `pip install PyGithub`""")
         return
     
+    config = configuracao_atual()
     with st.form("github_config_form"):
-        repo = st.text_input("Repositório GitHub (user/repo)", value=GITHUB_REPO or "vilelarobson0971/OS_4.0")
-        filepath = st.text_input("Caminho do arquivo no repositório", value=GITHUB_FILEPATH or "ordens_servico4.0.csv")
-        token = st.text_input("Token de acesso GitHub", type="password", value=GITHUB_TOKEN or "")
+        repo = st.text_input("Repositório GitHub (user/repo)", value=config.get('github_repo') or "vilelarobson0971/OS_4.0")
+        filepath = st.text_input("Caminho do arquivo no repositório", value=config.get('github_filepath') or "ordens_servico4.0.csv")
+        token = st.text_input("Token de acesso GitHub", type="password", value=config.get('github_token') or "")
         
         submitted = st.form_submit_button("Salvar Configurações")
         
         if submitted:
             if repo and filepath and token:
                 try:
-                    g = Github(token)
-                    g.get_repo(repo).get_contents(filepath)
-                    
-                    config = {
-                        'github_repo': repo,
-                        'github_filepath': filepath,
-                        'github_token': token
-                    }
-                    
-                    with open(CONFIG_FILE, 'w') as f:
-                        json.dump(config, f)
-                    
-                    GITHUB_REPO = repo
-                    GITHUB_FILEPATH = filepath
-                    GITHUB_TOKEN = token
+                    servico_os().configurar_github(repo, filepath, token)
                     
                     st.success("Configurações salvas e validadas com sucesso!")
                     
@@ -780,24 +1013,20 @@ def main():
     if 'notificacoes_limpas' not in st.session_state:
         st.session_state.notificacoes_limpas = False
         
+    inicio = time.perf_counter()
     inicializar_arquivos()
+    registrar_partida("inicialização dos arquivos", time.perf_counter() - inicio)
     
-    # Adiciona o JavaScript para recarregar a página a cada 10 minutos (600000 milissegundos)
-    st.markdown("""
-    <script>
-    function checkReload() {
-        // Verifica se estamos na página principal (não na área de supervisão)
-        if (!window.location.href.includes('Supervis%C3%A3o')) {
-            setTimeout(function() {
-                window.location.reload();
-            }, 600000); // 10 minutos = 600000 ms
-        }
-    }
-    window.onload = checkReload;
-    </script>
-    """, unsafe_allow_html=True)
+    # API HTTP para quiosques e integrações, no mesmo processo e sobre o mesmo serviço
+    config = configuracao_atual()
+    if config.get('api_porta'):
+        iniciar_api(int(config['api_porta']), config.get('api_host', "127.0.0.1"), config.get('api_token'))
     
     st.sidebar.title("Menu")
+    servico = servico_principal()
+    if isinstance(servico, ServicoSedes):
+        # Cada sessão trabalha só com as OS da sede escolhida
+        st.sidebar.selectbox("Sede", servico.nomes, key="sede")
     opcao = st.sidebar.selectbox(
         "Selecione",
         [
@@ -810,18 +1039,19 @@ def main():
         ]
     )
 
-    if opcao == "🏠 Página Inicial":
-        pagina_inicial()
-    elif opcao == "📝 Cadastrar OS":
-        cadastrar_os()
-    elif opcao == "📋 Listar OS":
-        listar_os()
-    elif opcao == "🔍 Buscar OS":
-        buscar_os()
-    elif opcao == "📊 Dashboard":
-        dashboard()
-    elif opcao == "🔐 Supervisão":
-        pagina_supervisao()
+    paginas = {
+        "🏠 Página Inicial": pagina_inicial,
+        "📝 Cadastrar OS": cadastrar_os,
+        "📋 Listar OS": listar_os,
+        "🔍 Buscar OS": buscar_os,
+        "📊 Dashboard": dashboard,
+        "🔐 Supervisão": pagina_supervisao
+    }
+    pagina = paginas[opcao]
+    inicio = time.perf_counter()
+    with medir(f"pagina.{pagina.__name__}"):
+        pagina()
+    registrar_partida("primeira página", time.perf_counter() - inicio)  # Vai para o painel de desempenho, na Supervisão
 
     st.sidebar.markdown("---")
     st.sidebar.markdown("**Sistema de Ordens de Serviço 4.0**")
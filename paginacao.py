@@ -0,0 +1,144 @@
+"""Índice de paginação da listagem de OS.
+
+Para cada ordenação disponível (ID, Data, Status) o índice mantém a lista
+ordenada de pares (chave, ID); o ID desempata, então a ordem é estável. Uma
+página é lida a partir de um cursor — o par da última linha da página
+anterior —, de modo que só os IDs visíveis são percorridos e entregues à
+página, que busca apenas essas linhas no armazenamento. Os totais por
+Status × Tipo ficam num contador, sem filtrar a tabela. Como o cubo e o
+índice de busca, é observador do armazenamento. paginar() intercala as
+páginas de vários índices (OS em aberto e arquivo de concluídas) com o
+mesmo cursor.
+"""
+import threading
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+ORDENACOES = ("ID", "Data", "Status")
+FILTROS = ("Status", "Tipo")
+
+def _texto(valor):
+    if valor is None or (not isinstance(valor, str) and pd.isna(valor)):
+        return None
+    return str(valor)
+
+def _atende_valor(valor, filtro):
+    """Filtro de igualdade: um valor ou uma lista de valores aceitos"""
+    if isinstance(filtro, (list, tuple, set)):
+        return valor in filtro
+    return valor == filtro
+
+def chave_ordenacao(coluna, valor):
+    """Chave de ordenação de um valor: datas como "aaaammdd", vazios como "" (vêm primeiro)"""
+    if coluna == "ID" or valor is None or (not isinstance(valor, str) and pd.isna(valor)):
+        return ""
+    if coluna == "Data":
+        return valor.strftime("%Y%m%d")
+    return str(valor)
+
+def chaves_datas(datas):
+    """Chaves de ordenação de uma coluna de datas, formatando cada data distinta uma única vez"""
+    codigos, unicas = pd.factorize(datas)
+    texto = np.append(np.asarray(unicas.strftime("%Y%m%d"), dtype=object), "")  # O código -1 (vazio) pega o ""
+    return texto[codigos].tolist()
+
+class IndicePaginacao:
+    """Listas ordenadas (chave, ID) por ordenação e totais por filtro, atualizadas a cada gravação"""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self._ordenadas = {coluna: [] for coluna in ORDENACOES}
+        self._chaves = {}       # ID -> chaves na ordem de ORDENACOES
+        self._filtros = {}      # ID -> (Status, Tipo)
+        self._totais = Counter()
+
+    def recarregar(self, df):
+        """Reconstrói o índice a partir da tabela completa"""
+        ids = [int(i) for i in df["ID"]]
+        chaves = {
+            "ID": [""] * len(ids),
+            "Data": chaves_datas(df["Data"]),
+            "Status": df["Status"].astype(object).where(df["Status"].notna(), "").tolist()
+        }
+        filtros = list(zip(*(df[coluna].astype(object).where(df[coluna].notna(), None) for coluna in FILTROS)))
+
+        with self.lock:
+            self._ordenadas = {coluna: sorted(zip(chaves[coluna], ids)) for coluna in ORDENACOES}
+            self._chaves = dict(zip(ids, zip(*(chaves[coluna] for coluna in ORDENACOES))))
+            self._filtros = dict(zip(ids, filtros))
+            self._totais = Counter(filtros)
+
+    def alterar(self, anterior, atual):
+        """Reposiciona uma OS incluída (anterior=None) ou alterada"""
+        os_id = int(atual["ID"])
+        chaves = tuple(chave_ordenacao(coluna, atual.get(coluna)) for coluna in ORDENACOES)
+        filtros = tuple(_texto(atual.get(coluna)) for coluna in FILTROS)
+        with self.lock:
+            if os_id in self._chaves:
+                for coluna, chave in zip(ORDENACOES, self._chaves[os_id]):
+                    lista = self._ordenadas[coluna]
+                    posicao = bisect_left(lista, (chave, os_id))
+                    if posicao < len(lista) and lista[posicao] == (chave, os_id):
+                        del lista[posicao]
+                self._totais[self._filtros[os_id]] -= 1
+            for coluna, chave in zip(ORDENACOES, chaves):
+                insort(self._ordenadas[coluna], (chave, os_id))
+            self._chaves[os_id] = chaves
+            self._filtros[os_id] = filtros
+            self._totais[filtros] += 1
+
+    def _atende(self, os_id, filtros):
+        valores = self._filtros[os_id]
+        return all(_atende_valor(valores[FILTROS.index(coluna)], valor) for coluna, valor in filtros.items())
+
+    def contar(self, filtros=None):
+        """Total de OS que atendem aos filtros de igualdade (ex.: {"Status": "Pendente"} ou {"Status": [...]})"""
+        filtros = filtros or {}
+        posicoes = [(FILTROS.index(coluna), valor) for coluna, valor in filtros.items()]
+        with self.lock:
+            return sum(total for valores, total in self._totais.items()
+                       if all(_atende_valor(valores[p], valor) for p, valor in posicoes))
+
+    def pagina(self, ordenacao="ID", filtros=None, cursor=None, tamanho=50, decrescente=False):
+        """IDs de uma página e o cursor da próxima (None na última)
+
+        O cursor é o par (chave, ID) devolvido pela página anterior; sem cursor, começa do início.
+        """
+        pares = self.pares(ordenacao, filtros, cursor, tamanho + 1, decrescente)
+        # Com um par além da página, há pelo menos mais uma: ela começa depois da última entregue
+        proximo = pares[tamanho - 1] if len(pares) > tamanho else None
+        return [os_id for _, os_id in pares[:tamanho]], proximo
+
+    def pares(self, ordenacao="ID", filtros=None, cursor=None, quantidade=50, decrescente=False):
+        """Até quantidade pares (chave, ID) que atendem aos filtros, a partir do cursor"""
+        filtros = filtros or {}
+        pares = []
+        with self.lock:
+            lista = self._ordenadas[ordenacao]
+            if decrescente:
+                inicio = bisect_left(lista, tuple(cursor)) - 1 if cursor else len(lista) - 1
+                posicoes = range(inicio, -1, -1)
+            else:
+                inicio = bisect_right(lista, tuple(cursor)) if cursor else 0
+                posicoes = range(inicio, len(lista))
+
+            for posicao in posicoes:
+                if len(pares) == quantidade:
+                    break
+                chave, os_id = lista[posicao]
+                if filtros and not self._atende(os_id, filtros):
+                    continue
+                pares.append((chave, os_id))
+        return pares
+
+def paginar(indices, ordenacao="ID", filtros=None, cursor=None, tamanho=50, decrescente=False):
+    """Como IndicePaginacao.pagina, sobre a união de vários índices com OS distintas"""
+    pares = []
+    for indice in indices:
+        pares.extend(indice.pares(ordenacao, filtros, cursor, tamanho + 1, decrescente))
+    pares.sort(reverse=decrescente)
+    proximo = pares[tamanho - 1] if len(pares) > tamanho else None
+    return [os_id for _, os_id in pares[:tamanho]], proximo
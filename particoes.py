@@ -0,0 +1,487 @@
+"""Arquivo das OS concluídas em partições mensais colunares.
+
+A maior parte das telas só trata das OS em aberto. No armazenamento
+particionado, elas formam a tabela quente (CSV com journal, mantida em
+memória), e as concluídas passam, na compactação, para um arquivo Parquet
+comprimido (zstd) por mês de Data Conclusão. O manifesto guarda, para cada
+partição, o arquivo atual, o total de linhas, o menor e o maior ID e as
+contagens do cubo do dashboard: totais e indicadores não leem as partições.
+As leituras abrem só os meses do período pedido (poda de partições), só as
+colunas necessárias e, na busca por ID, só os grupos de linhas que podem
+conter os IDs.
+
+Cada gravação cria arquivos novos e troca o manifesto de uma vez; os
+arquivos substituídos são apagados depois. Assim um leitor nunca vê uma
+partição pela metade, e uma gravação interrompida não altera o arquivo.
+"""
+import glob
+import json
+import os
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from agregados import CuboOS, meses_das_datas
+from armazenamento import (COLUNAS_CATEGORIAS, COLUNAS_DATAS, COLUNAS_OS, COLUNAS_TABELA, STATUS_CONCLUIDO,
+                           ArmazenamentoCSV, acrescentar_linhas, converter_coluna, filtrar_conclusao, filtrar_tabela,
+                           gravar_csv_atomico, gravar_lotes_csv_atomico, ids_da_consulta, ler_csv,
+                           normalizar_tabela, registro_para_gravacao, texto_para_gravacao)
+from travas import TravaArquivo, caminho_temporario, identidade_arquivo
+
+COMPRESSAO = "zstd"
+MES_SEM_DATA = "sem-data"  # Partição das concluídas sem Data Conclusão legível
+LINHAS_POR_GRUPO = 10000  # Grupos de linhas do Parquet: a busca por ID pula os grupos fora da faixa
+LIMITE_LINHAS_PREPARADAS = 200000  # Concluídas acumuladas na importação em lote antes de gravar as partições
+
+def _tipo_arrow(coluna):
+    if coluna == "ID":
+        return pa.int64()
+    if coluna in COLUNAS_DATAS:
+        return pa.timestamp("ns")
+    if coluna == "Urgente":
+        return pa.bool_()
+    if coluna in COLUNAS_CATEGORIAS:
+        return pa.dictionary(pa.int32(), pa.string())
+    return pa.string()
+
+# Esquema fixo: uma coluna toda vazia numa partição não pode mudar de tipo e impedir a leitura conjunta
+ESQUEMA = pa.schema([(coluna, _tipo_arrow(coluna)) for coluna in COLUNAS_TABELA])
+
+# Colunas lidas de uma partição para calcular suas contagens do cubo
+COLUNAS_CUBO = ["Tipo", "Status", "Local", "Data Conclusão", "Executante1", "Executante2"]
+
+# Conversão na leitura que não depende dos metadados do pandas no arquivo (booleanos com ausentes seguem booleanos)
+TIPOS_PANDAS = {pa.bool_(): pd.BooleanDtype(), pa.string(): pd.StringDtype()}
+
+def meses_de_conclusao(datas):
+    """Partição ("aaaa-mm", ou MES_SEM_DATA) de cada data de conclusão"""
+    return meses_das_datas(datas).fillna(MES_SEM_DATA)
+
+def inclui_concluidas(filtros):
+    """Se os filtros de igualdade admitem OS concluídas, isto é, se o arquivo precisa ser lido"""
+    status = (filtros or {}).get("Status")
+    if status is None:
+        return True
+    if isinstance(status, (list, tuple, set)):
+        return STATUS_CONCLUIDO in status
+    return status == STATUS_CONCLUIDO
+
+def _alcanca(ids, minimo, maximo):
+    """Se algum dos IDs (lista ordenada) está na faixa [minimo, maximo]"""
+    return np.searchsorted(ids, maximo, "right") > np.searchsorted(ids, minimo, "left")
+
+def _normalizar_colunas(df):
+    """Aplica o esquema às colunas lidas (a leitura pode ter só parte delas)"""
+    if set(COLUNAS_OS) <= set(df.columns):
+        return normalizar_tabela(df)
+    return pd.DataFrame({coluna: converter_coluna(coluna, df[coluna]) for coluna in df.columns}, index=df.index)
+
+def _celulas_json(contador):
+    return [list(chave) + [quantidade] for chave, quantidade in contador.items()]
+
+class AlteracaoArquivo:
+    """Partições regravadas em arquivos novos, que só passam a valer em confirmar()"""
+
+    def __init__(self, arquivo):
+        self.arquivo = arquivo
+        self.particoes = dict(arquivo._particoes)
+        self.criados = []
+
+    def _caminho(self, mes):
+        return self.arquivo._caminho(self.particoes[mes]["arquivo"])
+
+    def _ids(self, mes):
+        return pq.read_table(self._caminho(mes), columns=["ID"]).column("ID").to_numpy()
+
+    def _candidatas(self, ids):
+        """Partições cuja faixa de IDs alcança algum dos IDs (ids ordenado)"""
+        return [mes for mes, entrada in self.particoes.items() if _alcanca(ids, entrada["id_min"], entrada["id_max"])]
+
+    def _gravar(self, mes, tabela):
+        """Grava a partição (tabela do Arrow no ESQUEMA) num arquivo novo e registra sua entrada"""
+        if not tabela.num_rows:
+            self.particoes.pop(mes, None)
+            return
+        tabela = tabela.sort_by("ID")
+        nome = f"concluidas_{mes}_{uuid.uuid4().hex[:12]}.parquet"
+        caminho = self.arquivo._caminho(nome)
+        temporario = caminho_temporario(caminho)
+        pq.write_table(tabela, temporario, compression=COMPRESSAO, row_group_size=LINHAS_POR_GRUPO)
+        os.replace(temporario, caminho)
+        self.criados.append(nome)
+
+        cubo = CuboOS()
+        cubo.recarregar(tabela.select(COLUNAS_CUBO).to_pandas())
+        ids = tabela.column("ID")
+        self.particoes[mes] = {"arquivo": nome, "linhas": tabela.num_rows, "id_min": ids[0].as_py(),
+                               "id_max": ids[-1].as_py(), "por_os": _celulas_json(cubo.por_os),
+                               "por_executante": _celulas_json(cubo.por_executante)}
+
+    def incluir(self, df, remover=()):
+        """Grava OS concluídas (tabela no esquema) na partição do seu mês, substituindo as de mesmo ID
+        onde estiverem, e retira do arquivo os IDs de remover"""
+        ids = np.unique(np.concatenate([df["ID"].to_numpy(dtype="int64"), np.asarray(list(remover), dtype="int64")]))
+        if not len(ids):
+            return
+        meses = meses_de_conclusao(df["Data Conclusão"])
+        novas = {mes: grupo for mes, grupo in df.groupby(meses, sort=True, observed=True)}
+        afetadas = set(novas)
+        for mes in self._candidatas(ids):
+            if mes not in afetadas and np.isin(self._ids(mes), ids).any():
+                afetadas.add(mes)
+
+        # A partição atual e as OS novas são unidas no Arrow, sem converter a partição para o pandas
+        for mes in sorted(afetadas):
+            partes = []
+            if mes in self.particoes:
+                atual = pq.read_table(self._caminho(mes), schema=ESQUEMA)
+                partes.append(atual.filter(pc.invert(pc.is_in(atual.column("ID"), pa.array(ids)))))
+            if mes in novas:
+                partes.append(pa.Table.from_pandas(novas[mes], schema=ESQUEMA, preserve_index=False))
+            self._gravar(mes, pa.concat_tables(partes))
+
+    def remover(self, ids):
+        self.incluir(normalizar_tabela(pd.DataFrame(columns=COLUNAS_OS)), ids)
+
+    def limpar(self):
+        """Esvazia o arquivo (os arquivos atuais são apagados na confirmação)"""
+        self.particoes = {}
+
+    def confirmar(self):
+        self.arquivo._particoes = self.particoes
+        self.arquivo._gravar_manifesto()
+        self.arquivo._apagar_nao_referenciados()
+
+    def descartar(self):
+        for nome in self.criados:
+            caminho = self.arquivo._caminho(nome)
+            if os.path.exists(caminho):
+                os.remove(caminho)
+
+class ArquivoConcluidas:
+    """Partições mensais (Parquet) das OS concluídas, com manifesto de totais e contagens do cubo"""
+
+    def __init__(self, diretorio):
+        self.diretorio = diretorio
+        self.arquivo_manifesto = os.path.join(diretorio, "manifesto.json")
+        self._identidade = None
+        self._particoes = {}  # mês -> entrada do manifesto
+        self._resumo = (None, Counter(), Counter())  # (identidade, por_os, por_executante)
+
+        os.makedirs(diretorio, exist_ok=True)
+        # Outros processos também arquivam: manifesto e partições só mudam sob a trava
+        self.lock = TravaArquivo(os.path.join(diretorio, "manifesto.lock"))
+
+    def _atualizar(self):
+        """Relê o manifesto se outro processo o alterou desde a última leitura"""
+        if os.path.exists(self.arquivo_manifesto):
+            identidade = identidade_arquivo(self.arquivo_manifesto)
+            if identidade != self._identidade:
+                with open(self.arquivo_manifesto, encoding="utf-8") as f:
+                    self._particoes = json.load(f)
+                self._identidade = identidade
+
+    def _gravar_manifesto(self):
+        temporario = caminho_temporario(self.arquivo_manifesto)
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump(self._particoes, f, ensure_ascii=False)
+        os.replace(temporario, self.arquivo_manifesto)
+        self._identidade = identidade_arquivo(self.arquivo_manifesto)
+
+    def _caminho(self, nome):
+        return os.path.join(self.diretorio, nome)
+
+    def _apagar_nao_referenciados(self):
+        """Apaga partições substituídas (e restos de gravações interrompidas)"""
+        referenciados = {entrada["arquivo"] for entrada in self._particoes.values()}
+        for caminho in glob.glob(os.path.join(self.diretorio, "concluidas_*.parquet")):
+            if os.path.basename(caminho) not in referenciados:
+                os.remove(caminho)
+
+    def versao(self):
+        """Identifica o conteúdo atual do arquivo: muda a cada gravação"""
+        with self.lock:
+            self._atualizar()
+            return self._identidade
+
+    def meses(self, desde=None, ate=None):
+        """Meses com partição; com desde/ate (datas), só os do período de conclusão"""
+        with self.lock:
+            self._atualizar()
+            meses = sorted(self._particoes)
+        if desde is None and ate is None:
+            return meses
+        inicio = f"{desde.year:04d}-{desde.month:02d}" if desde is not None else ""
+        fim = f"{ate.year:04d}-{ate.month:02d}" if ate is not None else "9999-99"
+        return [mes for mes in meses if mes != MES_SEM_DATA and inicio <= mes <= fim]
+
+    def total(self):
+        with self.lock:
+            self._atualizar()
+            return sum(entrada["linhas"] for entrada in self._particoes.values())
+
+    def maior_id(self):
+        with self.lock:
+            self._atualizar()
+            return max((entrada["id_max"] for entrada in self._particoes.values()), default=0)
+
+    def resumo(self):
+        """Contagens do cubo (por_os, por_executante) somadas de todas as partições, sem lê-las"""
+        with self.lock:
+            self._atualizar()
+            if self._resumo[0] != self._identidade:
+                por_os, por_executante = Counter(), Counter()
+                for entrada in self._particoes.values():
+                    por_os.update({tuple(celula[:-1]): celula[-1] for celula in entrada["por_os"]})
+                    por_executante.update({tuple(celula[:-1]): celula[-1] for celula in entrada["por_executante"]})
+                self._resumo = (self._identidade, por_os, por_executante)
+            return self._resumo[1], self._resumo[2]
+
+    def ler(self, meses=None, colunas=None, filtros=None, ids=None):
+        """OS arquivadas no esquema da tabela, em ordem de ID
+
+        meses restringe as partições lidas (poda), colunas as colunas lidas; filtros de igualdade
+        (valor ou lista) e ids são aplicados na leitura, antes de chegar ao pandas.
+        """
+        condicoes = [(coluna, "in", list(valor) if isinstance(valor, (list, tuple, set)) else [valor])
+                     for coluna, valor in (filtros or {}).items()]
+        if ids is not None:
+            ids = sorted(int(i) for i in ids)
+            condicoes.append(("ID", "in", ids))
+        with self.lock:
+            self._atualizar()
+            entradas = [(mes, entrada) for mes, entrada in sorted(self._particoes.items())
+                        if meses is None or mes in meses]
+            if ids is not None:
+                entradas = [(mes, entrada) for mes, entrada in entradas
+                            if ids and _alcanca(ids, entrada["id_min"], entrada["id_max"])]
+            if not entradas:
+                return normalizar_tabela(pd.DataFrame(columns=COLUNAS_OS))[colunas or COLUNAS_TABELA]
+            if ids is not None and not filtros:
+                # Partições gravadas antes das colunas de texto das datas não as têm: ficam nulas
+                tabela = pa.concat_tables([self._ler_ids(entrada["arquivo"], colunas, ids) for _, entrada in entradas],
+                                          promote_options="default")
+            else:
+                tabela = pq.read_table([self._caminho(entrada["arquivo"]) for _, entrada in entradas],
+                                       columns=colunas, filters=condicoes or None, schema=ESQUEMA)
+        return _normalizar_colunas(tabela.to_pandas(types_mapper=TIPOS_PANDAS.get)).sort_values("ID", ignore_index=True)
+
+    def _ler_ids(self, nome, colunas, ids):
+        """Lê da partição só os grupos de linhas cuja faixa de IDs (estatísticas do Parquet) alcança os IDs"""
+        arquivo = pq.ParquetFile(self._caminho(nome))
+        coluna = arquivo.schema_arrow.get_field_index("ID")
+        grupos = []
+        for grupo in range(arquivo.num_row_groups):
+            estatisticas = arquivo.metadata.row_group(grupo).column(coluna).statistics
+            if _alcanca(ids, estatisticas.min, estatisticas.max):
+                grupos.append(grupo)
+        tabela = arquivo.read_row_groups(grupos, columns=colunas)
+        return tabela.filter(pc.is_in(tabela.column("ID"), pa.array(ids, pa.int64())))
+
+    def lotes(self, meses=None, filtros=None):
+        """Uma partição por vez, para percorrer o arquivo sem carregá-lo inteiro"""
+        for mes in (self.meses() if meses is None else meses):
+            yield self.ler([mes], filtros=filtros)
+
+    @contextmanager
+    def alteracao(self):
+        """Altera o arquivo sob a trava; as partições novas valem juntas ao fim do bloco, ou são descartadas"""
+        with self.lock:
+            self._atualizar()
+            alteracao = AlteracaoArquivo(self)
+            try:
+                yield alteracao
+            except BaseException:
+                alteracao.descartar()
+                raise
+            alteracao.confirmar()
+
+    def arquivar(self, df):
+        """Inclui OS concluídas (tabela no esquema) no arquivo; retorna o total"""
+        with self.alteracao() as alteracao:
+            alteracao.incluir(df)
+        return len(df)
+
+    def remover(self, ids):
+        with self.alteracao() as alteracao:
+            alteracao.remover(ids)
+
+    def substituir(self, df):
+        """Troca todo o conteúdo do arquivo pelas OS concluídas informadas"""
+        with self.alteracao() as alteracao:
+            alteracao.limpar()
+            alteracao.incluir(df)
+
+class ArmazenamentoParticionado(ArmazenamentoCSV):
+    """OS em aberto em CSV com journal (tabela quente) e concluídas no arquivo mensal colunar
+
+    Só a tabela quente é lida ao abrir o aplicativo e alimenta os observadores. A compactação
+    move para o arquivo as concluídas quando elas chegam a limite_concluidas e grava o CSV
+    completo (arquivo_exportacao) usado pelos backups e pelo GitHub. Alterar uma OS arquivada a
+    traz de volta à tabela quente. Uma OS presente nas duas (compactação interrompida) vale pela
+    tabela quente.
+    """
+
+    def __init__(self, arquivo, journal, diretorio_arquivo, arquivo_exportacao, limite_journal=256 * 1024,
+                 limite_concluidas=200):
+        super().__init__(arquivo, journal, limite_journal)
+        self.particoes = ArquivoConcluidas(diretorio_arquivo)
+        self.arquivo_exportacao = arquivo_exportacao
+        self.limite_concluidas = limite_concluidas
+        self._alteracao = None
+        self._concluidas_preparadas = []
+
+        with self.trava:
+            if not os.path.exists(arquivo):
+                # Primeira abertura: divide o CSV completo, se houver, entre a tabela quente e o arquivo
+                if os.path.exists(arquivo_exportacao) and os.path.getsize(arquivo_exportacao) > 0:
+                    self.restaurar(arquivo_exportacao)
+                else:
+                    gravar_csv_atomico(normalizar_tabela(pd.DataFrame(columns=COLUNAS_OS)), arquivo)
+
+    def _ids_quentes(self):
+        with self.lock:
+            self._tabela()
+            return list(self._posicoes)
+
+    def carregar(self):
+        """Tabela completa (quente e arquivo); as telas usam consultas e índices, que leem o arquivo só quando preciso"""
+        quentes = self.carregar_quente()
+        arquivadas = self.particoes.ler()
+        arquivadas = arquivadas[~arquivadas["ID"].isin(quentes["ID"])]
+        return acrescentar_linhas(quentes, arquivadas) if len(arquivadas) else quentes
+
+    def carregar_quente(self):
+        """Tabela quente, a mantida em memória e entregue aos observadores"""
+        return super().carregar()
+
+    def contar(self):
+        return super().contar() + self.particoes.total()
+
+    def consultar(self, filtros=None, busca=None, arquivo=True):
+        """Consulta a tabela quente e, se os filtros admitem concluídas (e arquivo=True), também o arquivo"""
+        quentes = super().consultar(filtros, busca)
+        if not arquivo or not inclui_concluidas(filtros):
+            return quentes
+        ids_quentes = self._ids_quentes()
+        ids = ids_da_consulta(filtros, busca)
+        if ids is not None:
+            faltantes = set(ids).difference(ids_quentes)
+            if not faltantes:
+                return quentes
+            arquivadas = self.particoes.ler(ids=faltantes)
+        else:
+            igualdade = {coluna: valor for coluna, valor in (filtros or {}).items() if coluna != "ID"}
+            arquivadas = filtrar_tabela(self.particoes.ler(filtros=igualdade), filtros, busca)
+        arquivadas = arquivadas[~arquivadas["ID"].isin(ids_quentes)]
+        if arquivadas.empty:
+            return quentes
+        return acrescentar_linhas(quentes, arquivadas).sort_values("ID", ignore_index=True)
+
+    def obter(self, os_id):
+        registro = super().obter(os_id)
+        if registro is None:
+            arquivadas = self.particoes.ler(ids=[int(os_id)])
+            if not arquivadas.empty:
+                return arquivadas.iloc[0].to_dict()
+        return registro
+
+    def proximo_id(self):
+        return max(super().proximo_id(), self.particoes.maior_id() + 1)
+
+    def _maior_id_em_disco(self):
+        return max(super()._maior_id_em_disco(), self.particoes.maior_id())
+
+    def atualizar(self, os_id, campos, versao=None):
+        """Altera uma OS; se ela estiver arquivada, volta antes para a tabela quente"""
+        with self.trava:
+            if super().obter(os_id) is None:
+                arquivadas = self.particoes.ler(ids=[int(os_id)])
+                if not arquivadas.empty:
+                    registro = registro_para_gravacao(arquivadas.iloc[0].to_dict())
+                    self._registrar("insert", os_id, {coluna: valor for coluna, valor in registro.items() if coluna != "ID"})
+                    self.particoes.remover([os_id])
+            super().atualizar(os_id, campos, versao)
+
+    def precisa_compactar(self):
+        if super().precisa_compactar():
+            return True
+        df = self._tabela()
+        return int((df["Status"] == STATUS_CONCLUIDO).sum()) >= self.limite_concluidas
+
+    def compactar(self, arquivar_todas=False):
+        """Incorpora o journal ao CSV quente, arquivando as concluídas, e regrava o CSV completo"""
+        with self.trava, self.lock:
+            df = self._tabela()
+            concluidas = df["Status"] == STATUS_CONCLUIDO
+            if concluidas.any() and (arquivar_todas or concluidas.sum() >= self.limite_concluidas):
+                self.particoes.arquivar(df[concluidas])
+                df = df[~concluidas]
+            super().salvar_tabela(df)
+            self.exportar()
+
+    def exportar(self):
+        """Grava o CSV completo (tabela quente e depois o arquivo, mês a mês), uma partição na memória por vez"""
+        with self.trava:
+            quentes = self.carregar_quente()
+
+            def lotes():
+                yield texto_para_gravacao(quentes)
+                for arquivadas in self.particoes.lotes():
+                    yield texto_para_gravacao(arquivadas[~arquivadas["ID"].isin(quentes["ID"])])
+            gravar_lotes_csv_atomico(lotes(), self.arquivo_exportacao)
+
+    def salvar_tabela(self, df):
+        """Substitui a tabela inteira, dividindo-a entre a tabela quente e o arquivo"""
+        df = normalizar_tabela(df)
+        concluidas = df["Status"] == STATUS_CONCLUIDO
+        with self.trava, self.lock:
+            self.particoes.substituir(df[concluidas])
+            super().salvar_tabela(df[~concluidas])
+            self.exportar()
+
+    def restaurar(self, origem):
+        self.salvar_tabela(ler_csv(origem))
+
+    def inserir_lotes(self, lotes, alocar=None):
+        """Como no CSV, mas as concluídas vão direto para o arquivo, confirmado logo após o CSV quente"""
+        with self.trava, self.particoes.alteracao() as alteracao:
+            self._alteracao, self._concluidas_preparadas = alteracao, []
+            try:
+                total = super().inserir_lotes(lotes, alocar)
+            finally:
+                preparadas, self._alteracao, self._concluidas_preparadas = self._concluidas_preparadas, None, []
+            if preparadas:
+                alteracao.incluir(pd.concat(preparadas, ignore_index=True))
+        if total:
+            self.exportar()
+        return total
+
+    def _acrescentar_lote(self, arquivo, lote):
+        concluidas = lote["Status"] == STATUS_CONCLUIDO
+        if concluidas.any():
+            self._concluidas_preparadas.append(lote[concluidas])
+            if sum(len(parte) for parte in self._concluidas_preparadas) >= LIMITE_LINHAS_PREPARADAS:
+                self._alteracao.incluir(pd.concat(self._concluidas_preparadas, ignore_index=True))
+                self._concluidas_preparadas = []
+        super()._acrescentar_lote(arquivo, lote[~concluidas])
+
+    def ler_lotes(self, tamanho=50000, filtros=None, conclusao=None):
+        """Tabela quente e depois o arquivo, mês a mês; com conclusao=(desde, ate), só os meses do período"""
+        ids_quentes = self._ids_quentes()
+        yield from super().ler_lotes(tamanho, filtros, conclusao)
+        if not inclui_concluidas(filtros):
+            return
+        meses = self.particoes.meses(*conclusao) if conclusao else None
+        igualdade = {coluna: valor for coluna, valor in (filtros or {}).items() if coluna != "ID"}
+        for arquivadas in self.particoes.lotes(meses, igualdade):
+            arquivadas = filtrar_conclusao(filtrar_tabela(arquivadas[~arquivadas["ID"].isin(ids_quentes)], filtros),
+                                           conclusao)
+            for inicio in range(0, len(arquivadas), tamanho):
+                yield arquivadas.iloc[inicio:inicio + tamanho]
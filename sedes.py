@@ -0,0 +1,618 @@
+"""OS divididas por sede, cada sede com o próprio diretório de dados.
+
+Com "sedes" no config.json, cada sede guarda as suas OS num diretório
+próprio (sedes/<nome>/), com CSV ou banco, journal, backups, fila de envio ao
+GitHub e índices separados: as sessões da interface trabalham só com a sede
+escolhida, e uma sede nova não deixa as outras mais lentas. O config.json da
+raiz continua valendo para todas (armazenamento, GitHub, métricas, API);
+no GitHub, cada sede tem o seu arquivo em sedes/<nome>/ ao lado do
+github_filepath configurado.
+
+    "sedes": {"Matriz": ["ADM", "SCI"], "Filial Norte": ["CD"], "Estoque": []}
+
+A sede de uma OS sai do Local: o nome da sede ou um de seus apelidos,
+comparados sem acentos nem maiúsculas, igual ao Local ou contido nele como
+palavras inteiras (ex.: "Sala 2 - ADM" é da Matriz). Locais que não
+correspondem a nenhuma sede ficam em "Outras". Também vale uma lista de
+nomes, sem apelidos.
+
+Os IDs continuam únicos entre as sedes: vêm de uma numeração compartilhada
+(sedes/sequencia_ids.txt), reservada sob trava entre processos. Ao lado dela,
+o mapa de IDs (sedes/sedes_ids.txt) registra a sede de cada faixa de IDs
+reservada, para que obter/atualizar uma OS vá direto à sua sede; OS fora do
+mapa (ex.: vindas do GitHub) são procuradas em todas as sedes e registradas.
+Na primeira abertura, as OS do diretório de dados são distribuídas entre as
+sedes; os arquivos originais ficam como estavam. Uma sede incluída depois
+começa vazia: as OS já gravadas não mudam de sede.
+
+O ServicoSedes tem as operações do ServicoOS usadas pela API e pelas
+importações, consultando as sedes em paralelo (contagens, páginas, buscas,
+feed de alterações) e gravando cada OS na sede do seu Local.
+
+    python sedes.py dividir   # distribui as OS do diretório de dados (se ainda não foram)
+    python sedes.py listar    # sedes, diretórios e quantidade de OS
+"""
+import argparse
+import bisect
+import heapq
+import os
+import threading
+import unicodedata
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, islice
+
+import numpy as np
+import pandas as pd
+
+from alteracoes import LIMITE_CONSULTA, CursorInvalido
+from despacho import sugerir_executante
+from armazenamento import COLUNAS_OS, texto_para_gravacao
+from paginacao import paginar
+from servico import (ABERTAS_FILENAME, CONFIG_FILE, LOCAL_FILENAME, SQLITE_FILENAME, DadosInvalidos, OSInexistente,
+                     ServicoOS, agora_local)
+from sincronizacao import ArquivoRemotoInexistente, carregar_configuracao
+from travas import TravaArquivo, caminho_temporario
+
+SEDES_DIR = "sedes"
+SEQUENCIA_FILENAME = "sequencia_ids.txt"
+MAPA_IDS_FILENAME = "sedes_ids.txt"
+SEDE_PADRAO = "Outras"  # OS cujo Local não corresponde a nenhuma sede
+MAXIMO_THREADS = 8  # Sedes consultadas ao mesmo tempo
+TAMANHO_LOTE_IMPORTACAO = 50000  # OS acumuladas por sede antes de gravá-las
+
+def chave_local(texto):
+    """Texto sem acentos, em minúsculas e só com letras e números separados por um espaço"""
+    if texto is None or pd.isna(texto):
+        return ""
+    texto = unicodedata.normalize("NFKD", str(texto)).encode("ascii", "ignore").decode().lower()
+    return " ".join("".join(c if c.isalnum() else " " for c in texto).split())
+
+def diretorio_da_sede(nome):
+    """Nome do diretório da sede (ex.: "Filial Norte" -> "filial_norte")"""
+    return chave_local(nome).replace(" ", "_") or "sede"
+
+def ler_sedes(config):
+    """Sedes do config.json como {nome: [apelidos]}, sempre com a sede padrão por último"""
+    sedes = config.get("sedes") or {}
+    if isinstance(sedes, (list, tuple)):
+        sedes = {nome: [] for nome in sedes}
+    sedes = {str(nome): [str(apelido) for apelido in (apelidos or [])] for nome, apelidos in sedes.items()}
+    sedes.setdefault(SEDE_PADRAO, [])
+    return sedes
+
+class MapaSedes:
+    """Sede de cada Local: igual ao nome/apelido, senão o primeiro contido nele como palavras inteiras"""
+
+    def __init__(self, sedes):
+        self.exatos = {}
+        self.termos = []
+        for nome, apelidos in sedes.items():
+            if nome == SEDE_PADRAO:
+                continue
+            for termo in [nome] + apelidos:
+                chave = chave_local(termo)
+                if chave:
+                    self.exatos.setdefault(chave, nome)
+                    self.termos.append((f" {chave} ", nome))
+        self._cache = {}
+        self.lock = threading.Lock()
+
+    def sede(self, local):
+        chave = chave_local(local)
+        with self.lock:
+            if chave not in self._cache:
+                sede = self.exatos.get(chave)
+                if sede is None:
+                    palavras = f" {chave} "
+                    sede = next((nome for termo, nome in self.termos if termo in palavras), SEDE_PADRAO)
+                self._cache[chave] = sede
+            return self._cache[chave]
+
+    def sedes(self, locais):
+        """Sede de cada Local de uma coluna, decidindo uma vez por Local distinto"""
+        codigos, unicos = pd.factorize(pd.Series(locais).astype(object))
+        nomes = np.array([self.sede(local) for local in unicos] + [SEDE_PADRAO], dtype=object)
+        return nomes[codigos]  # Código -1 (Local vazio) cai na última posição: a sede padrão
+
+class MapaIDs:
+    """Sede de cada faixa de IDs, num arquivo só de acréscimos ("primeiro\túltimo\tsede" por linha)
+
+    Cada processo lê só as linhas acrescentadas desde a última consulta. O mapa é uma indicação: quem o
+    consulta confere se a OS está mesmo na sede. Entre faixas sobrepostas, vale a de início maior.
+    """
+
+    def __init__(self, arquivo, trava):
+        self.arquivo = arquivo
+        self.trava = trava
+        self.lock = threading.Lock()
+        self._inicios, self._fins, self._sedes = [], [], []
+        self._posicao = 0
+        self._identidade = None
+
+    def _atualizar(self):
+        """Incorpora as linhas gravadas por este ou outros processos (chamado com o lock)"""
+        try:
+            with open(self.arquivo, "rb") as f:
+                identidade = os.fstat(f.fileno()).st_ino
+                if identidade != self._identidade or os.fstat(f.fileno()).st_size < self._posicao:
+                    self._inicios, self._fins, self._sedes = [], [], []
+                    self._posicao, self._identidade = 0, identidade
+                f.seek(self._posicao)
+                dados = f.read()
+        except FileNotFoundError:
+            return
+        completas = dados[:dados.rfind(b"\n") + 1]  # Uma linha ainda sendo gravada fica para a próxima
+        self._posicao += len(completas)
+        faixas = []
+        for linha in completas.decode("utf-8").splitlines():
+            primeiro, ultimo, sede = linha.split("\t", 2)
+            faixas.append((int(primeiro), int(ultimo), sede))
+        inicios = [self._inicios[-1]] if self._inicios else []
+        inicios += [primeiro for primeiro, _, _ in faixas]
+        if any(anterior > seguinte for anterior, seguinte in zip(inicios, inicios[1:])):
+            # Faixa registrada fora de ordem (OS achada na procura): reordena, com as mais novas por último
+            faixas = sorted(list(zip(self._inicios, self._fins, self._sedes)) + faixas, key=lambda faixa: faixa[0])
+            self._inicios, self._fins, self._sedes = [], [], []
+        for primeiro, ultimo, sede in faixas:
+            self._inicios.append(primeiro)
+            self._fins.append(ultimo)
+            self._sedes.append(sede)
+
+    def sede(self, os_id):
+        """Sede registrada para o ID, ou None"""
+        with self.lock:
+            self._atualizar()
+            posicao = bisect.bisect_right(self._inicios, os_id) - 1
+            if posicao >= 0 and os_id <= self._fins[posicao]:
+                return self._sedes[posicao]
+            return None
+
+    def registrar(self, primeiro, ultimo, sede):
+        """Acrescenta a faixa de IDs da sede (sob a trava da numeração)"""
+        with self.trava:
+            with open(self.arquivo, "a", encoding="utf-8") as f:
+                f.write(f"{int(primeiro)}\t{int(ultimo)}\t{sede}\n")
+
+    def gravar(self, ids, sedes):
+        """Substitui o mapa pelas faixas seguidas de IDs da mesma sede (ids e sedes alinhados)"""
+        ordem = np.argsort(ids, kind="stable")
+        ids, sedes = np.asarray(ids)[ordem], np.asarray(sedes, dtype=object)[ordem]
+        inicios = np.flatnonzero(np.r_[True, sedes[1:] != sedes[:-1]]) if len(ids) else np.array([], dtype=int)
+        fins = np.r_[inicios[1:] - 1, len(ids) - 1] if len(ids) else inicios
+        with self.trava:
+            temporario = caminho_temporario(self.arquivo)
+            with open(temporario, "w", encoding="utf-8") as f:
+                f.writelines(f"{ids[inicio]}\t{ids[fim]}\t{sedes[inicio]}\n" for inicio, fim in zip(inicios, fins))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporario, self.arquivo)
+
+class SequenciaIDs:
+    """Próximo ID livre num arquivo, compartilhado por todas as sedes e processos, com o mapa de IDs ao lado"""
+
+    def __init__(self, arquivo):
+        self.arquivo = arquivo
+        self.trava = TravaArquivo(f"{arquivo}.lock")
+        self.mapa_ids = MapaIDs(os.path.join(os.path.dirname(arquivo), MAPA_IDS_FILENAME), self.trava)
+
+    def existe(self):
+        return os.path.exists(self.arquivo)
+
+    def _ler(self):
+        with open(self.arquivo, encoding="utf-8") as f:
+            return int(f.read().strip() or 1)
+
+    def _gravar(self, proximo):
+        temporario = caminho_temporario(self.arquivo)
+        with open(temporario, "w", encoding="utf-8") as f:
+            f.write(f"{proximo}\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporario, self.arquivo)
+
+    def reservar(self, quantidade=1, sede=None):
+        """Reserva quantidade IDs seguidos; retorna o primeiro (com sede, a faixa vai para o mapa de IDs)"""
+        with self.trava:
+            primeiro = self._ler() if self.existe() else 1
+            self._gravar(primeiro + quantidade)
+            if sede is not None:
+                self.mapa_ids.registrar(primeiro, primeiro + quantidade - 1, sede)
+            return primeiro
+
+    def iniciar(self, proximo):
+        """Garante que a numeração continue a partir de proximo (nunca volta)"""
+        with self.trava:
+            atual = self._ler() if self.existe() else 1
+            self._gravar(max(atual, int(proximo)))
+
+class SequenciaSede:
+    """A numeração compartilhada vista por uma sede: os IDs que ela reserva ficam como dela no mapa de IDs"""
+
+    def __init__(self, sequencia, sede):
+        self.sequencia = sequencia
+        self.sede = sede
+
+    def reservar(self, quantidade=1):
+        return self.sequencia.reservar(quantidade, self.sede)
+
+    def iniciar(self, proximo):
+        self.sequencia.iniciar(proximo)
+
+class ServicoSede(ServicoOS):
+    """Serviço das OS de uma sede: diretório próprio, config.json da raiz e a numeração compartilhada"""
+
+    def __init__(self, nome, diretorio, tipo_armazenamento, arquivo_config, sequencia):
+        self.nome = nome
+        super().__init__(diretorio, tipo_armazenamento, arquivo_config)
+        self.sequencia = SequenciaSede(sequencia, nome)
+
+    def ler_configuracao(self):
+        """Configuração da raiz, com o arquivo do GitHub da sede (sedes/<nome>/ ao lado do configurado)"""
+        config = super().ler_configuracao()
+        if config.get("github_filepath"):
+            pasta, arquivo = os.path.split(config["github_filepath"].replace("\\", "/"))
+            config["github_filepath"] = "/".join(filter(None, [pasta, SEDES_DIR, os.path.basename(self.diretorio),
+                                                               arquivo]))
+        return config
+
+    def inicializar_arquivos(self):
+        """Como no ServicoOS; uma sede que ainda não existe no GitHub começa vazia"""
+        try:
+            super().inicializar_arquivos()
+        except ArquivoRemotoInexistente:
+            pd.DataFrame(columns=COLUNAS_OS).to_csv(self.caminho(LOCAL_FILENAME), index=False)
+
+class ServicoSedes:
+    """As OS de todas as sedes: cada operação vai à sede da OS, ou a todas em paralelo"""
+
+    def __init__(self, diretorio=".", tipo_armazenamento=None):
+        self.diretorio = diretorio
+        self.arquivo_config = os.path.join(diretorio, CONFIG_FILE)
+        self.lock = threading.RLock()
+        self._servicos = {}
+        self.executor = ThreadPoolExecutor(MAXIMO_THREADS, thread_name_prefix="sedes")
+        self.sequencia = SequenciaIDs(os.path.join(diretorio, SEDES_DIR, SEQUENCIA_FILENAME))
+        self.recarregar_configuracao()
+        self.tipo_armazenamento = tipo_armazenamento or self.configuracao.get("armazenamento", "csv")
+
+    # Configuração
+
+    def recarregar_configuracao(self):
+        """Relê o config.json e as sedes (uma sede nova passa a receber as OS do seu Local)"""
+        self.configuracao = carregar_configuracao(self.arquivo_config)
+        sedes = ler_sedes(self.configuracao)
+        if sedes != getattr(self, "sedes", None):
+            self.sedes = sedes
+            self.mapa = MapaSedes(sedes)
+
+    @property
+    def nomes(self):
+        return list(self.sedes)
+
+    def github_ativo(self):
+        return any(servico.github_ativo() for servico in self.servicos())
+
+    def diretorio_da_sede(self, sede):
+        return os.path.join(self.diretorio, SEDES_DIR, diretorio_da_sede(sede))
+
+    # Sedes
+
+    def servico(self, sede):
+        """Serviço da sede, criado na primeira vez que é usado"""
+        with self.lock:
+            if sede not in self._servicos:
+                if sede not in self.sedes:
+                    raise KeyError(f"Sede desconhecida: {sede}")
+                self._servicos[sede] = ServicoSede(sede, self.diretorio_da_sede(sede), self.tipo_armazenamento,
+                                                   self.arquivo_config, self.sequencia)
+            return self._servicos[sede]
+
+    def servicos(self):
+        return [self.servico(sede) for sede in self.nomes]
+
+    def sede_do_local(self, local):
+        return self.mapa.sede(local)
+
+    def em_paralelo(self, funcao, sedes=None):
+        """{sede: funcao(serviço da sede)}, com as sedes consultadas ao mesmo tempo"""
+        sedes = self.nomes if sedes is None else list(sedes)
+        servicos = [self.servico(sede) for sede in sedes]
+        return dict(zip(sedes, self.executor.map(funcao, servicos)))
+
+    # Arquivos
+
+    def inicializar_arquivos(self, sede=None):
+        """Distribui as OS entre as sedes na primeira vez e prepara os arquivos da sede (ou de todas)"""
+        self.recarregar_configuracao()
+        if not self.sequencia.existe():
+            self.dividir()
+        if sede is not None:
+            self.servico(sede).inicializar_arquivos()
+        else:
+            self.em_paralelo(lambda servico: servico.inicializar_arquivos())
+
+    def dividir(self):
+        """Grava no diretório de cada sede as OS do diretório de dados cujo Local é dela; retorna {sede: OS}
+
+        Feito uma única vez (a numeração compartilhada é gravada por último e marca a divisão como feita).
+        Os arquivos de dados originais não são alterados.
+        """
+        os.makedirs(os.path.join(self.diretorio, SEDES_DIR), exist_ok=True)
+        with self.sequencia.trava:
+            if self.sequencia.existe():
+                return {}
+            quantidades = Counter()
+            maior_id = 0
+            ids, sedes_ids = [], []
+            if any(os.path.exists(os.path.join(self.diretorio, arquivo))
+                   for arquivo in (LOCAL_FILENAME, SQLITE_FILENAME, ABERTAS_FILENAME)):
+                origem = ServicoOS(self.diretorio, self.tipo_armazenamento)
+                for lote in origem.exportar_lotes():
+                    if not len(lote):
+                        continue
+                    maior_id = max(maior_id, int(lote["ID"].max()))
+                    sedes_lote = self.mapa.sedes(lote["Local"])
+                    ids.append(lote["ID"].to_numpy(dtype=np.int64))
+                    sedes_ids.append(sedes_lote)
+                    for sede, parte in lote.groupby(sedes_lote, sort=False):
+                        diretorio = self.diretorio_da_sede(sede)
+                        os.makedirs(diretorio, exist_ok=True)
+                        primeiro = sede not in quantidades
+                        with open(os.path.join(diretorio, LOCAL_FILENAME), "w" if primeiro else "a",
+                                  encoding="utf-8", newline="") as f:
+                            texto_para_gravacao(parte)[COLUNAS_OS].to_csv(f, header=primeiro, index=False)
+                        quantidades[sede] += len(parte)
+            for sede in self.nomes:
+                if sede not in quantidades:
+                    diretorio = self.diretorio_da_sede(sede)
+                    os.makedirs(diretorio, exist_ok=True)
+                    # Com o GitHub, a sede sem OS aqui é baixada de lá por inicializar_arquivos
+                    if not self.github_ativo() and not os.path.exists(os.path.join(diretorio, LOCAL_FILENAME)):
+                        pd.DataFrame(columns=COLUNAS_OS).to_csv(os.path.join(diretorio, LOCAL_FILENAME), index=False)
+            self.sequencia.mapa_ids.gravar(np.concatenate(ids) if ids else np.array([], dtype=np.int64),
+                                           np.concatenate(sedes_ids) if sedes_ids else np.array([], dtype=object))
+            self.sequencia.iniciar(maior_id + 1)
+            return {sede: quantidades[sede] for sede in self.nomes}
+
+    def fazer_backup(self):
+        """Backup de cada sede (só as que mudaram desde o último geram arquivo novo)"""
+        return self.em_paralelo(lambda servico: servico.fazer_backup())
+
+    def consolidar(self):
+        self.em_paralelo(lambda servico: servico.consolidar())
+
+    # Consultas
+
+    def contar(self):
+        return sum(self.em_paralelo(lambda servico: servico.contar()).values())
+
+    def contar_por_sede(self):
+        return self.em_paralelo(lambda servico: servico.contar())
+
+    def consultar(self, filtros=None, busca=None, incluir_arquivo=True):
+        """Consulta em todas as sedes, em ordem de ID"""
+        partes = self.em_paralelo(lambda servico: servico.consultar(filtros, busca, incluir_arquivo))
+        partes = [parte for parte in partes.values() if len(parte)]
+        if not partes:
+            return pd.DataFrame(columns=COLUNAS_OS)
+        return pd.concat(partes, ignore_index=True).sort_values("ID", ignore_index=True)
+
+    def _localizar(self, os_id):
+        """Sede da OS (ou None): a do mapa de IDs, conferida; fora do mapa, procurada em todas as sedes ao mesmo tempo
+
+        A sede encontrada na procura é registrada no mapa, para as próximas consultas irem direto a ela.
+        """
+        os_id = int(os_id)
+        sede = self.sequencia.mapa_ids.sede(os_id)
+        if sede in self.sedes and self.servico(sede).armazenamento.obter(os_id) is not None:
+            return sede
+        encontradas = self.em_paralelo(lambda servico: servico.armazenamento.obter(os_id) is not None)
+        sede = next((sede for sede, encontrada in encontradas.items() if encontrada), None)
+        if sede is not None:
+            self.sequencia.mapa_ids.registrar(os_id, os_id, sede)
+        return sede
+
+    def obter(self, os_id):
+        """Registro da OS como dicionário; OSInexistente se não houver em nenhuma sede"""
+        sede = self._localizar(os_id)
+        if sede is None:
+            raise OSInexistente(f"OS {os_id} não encontrada")
+        return self.servico(sede).obter(os_id)
+
+    def linhas_por_id(self, ids):
+        """Busca só as OS informadas, na ordem dos IDs"""
+        if not ids:
+            return pd.DataFrame(columns=COLUNAS_OS)
+        linhas = self.consultar({"ID": list(ids)})
+        posicoes = pd.Index(linhas["ID"]).get_indexer(ids)
+        return linhas.iloc[posicoes[posicoes >= 0]]
+
+    def pesquisar(self, texto, campos=None, limite=None, incluir_arquivo=False):
+        """Busca textual em todas as sedes, da OS mais relevante à menos (como ServicoOS.pesquisar)
+
+        Os resultados das sedes são intercalados pela relevância antes do limite; só as linhas das OS
+        que ficaram são lidas, cada uma na sua sede.
+        """
+        resultados = self.em_paralelo(lambda servico: servico.pontuar_busca(texto, campos, limite, incluir_arquivo))
+        # Mesma ordem da busca numa sede: tabela quente antes do arquivo, relevância e, nos empates, ID maior
+        ordenados = heapq.merge(*[[(arquivada, -pontos, -os_id, sede) for os_id, pontos, arquivada in pontuados]
+                                  for sede, pontuados in resultados.items()])
+        escolhidos = list(islice(ordenados, limite))
+        if not escolhidos:
+            return pd.DataFrame(columns=COLUNAS_OS)
+        por_sede = {}
+        for _, _, os_id, sede in escolhidos:
+            por_sede.setdefault(sede, []).append(-os_id)
+        partes = self.em_paralelo(lambda servico: servico.linhas_por_id(por_sede[servico.nome]), por_sede)
+        partes = [parte for parte in partes.values() if len(parte)]
+        if not partes:
+            return pd.DataFrame(columns=COLUNAS_OS)
+        linhas = pd.concat(partes, ignore_index=True)
+        posicoes = pd.Index(linhas["ID"]).get_indexer([-chave[2] for chave in escolhidos])
+        return linhas.iloc[posicoes[posicoes >= 0]].reset_index(drop=True)
+
+    def pagina(self, ordenacao="ID", filtros=None, cursor=None, tamanho=50, decrescente=False):
+        """Como ServicoOS.pagina, sobre os índices de paginação de todas as sedes"""
+        indices = list(chain.from_iterable(
+            self.em_paralelo(lambda servico: servico.indices_paginacao(filtros)).values()))
+        ids, proximo = paginar(indices, ordenacao, filtros, cursor, tamanho, decrescente)
+        return self.linhas_por_id(ids), proximo, sum(indice.contar(filtros) for indice in indices)
+
+    def contagem(self, dimensao, **filtros):
+        """Contagens do cubo somadas entre as sedes, em ordem decrescente"""
+        total = Counter()
+        for contagem in self.em_paralelo(lambda servico: servico.contagem(dimensao, **filtros)).values():
+            total.update(contagem)
+        return dict(total.most_common())
+
+    def alteracoes(self, cursor=None, limite=LIMITE_CONSULTA):
+        """Feed de todas as sedes: (eventos em ordem de momento, próximo cursor, reiniciar)
+
+        O cursor junta o de cada sede ("sede:cursor" separados por "|"); uma sede que não está nele
+        (incluída depois) entra a partir do seu momento atual.
+        """
+        cursores = {}
+        if cursor is not None:
+            for parte in str(cursor).split("|"):
+                sede, separador, cursor_sede = parte.rpartition(":")
+                if not separador or sede not in self.sedes:
+                    raise CursorInvalido(f"Cursor inválido: {cursor}")
+                cursores[sede] = cursor_sede
+        resultados = self.em_paralelo(
+            lambda servico: servico.alteracoes(cursores.get(servico.nome) if cursor is not None else None, limite))
+        reiniciar = any(resultado[2] for resultado in resultados.values())
+        eventos = heapq.merge(*[[{**evento, "sede": sede} for evento in resultado[0]]
+                                for sede, resultado in resultados.items()], key=lambda evento: evento["momento"])
+        eventos = list(eventos)[:limite]
+        # Eventos além do limite ficam para a próxima consulta: o cursor de cada sede avança só até os entregues
+        proximos = {}
+        for sede, (eventos_sede, proximo, _) in resultados.items():
+            entregues = [evento["seq"] for evento in eventos if evento["sede"] == sede]
+            if len(entregues) < len(eventos_sede):
+                epoca = proximo.partition("-")[0]
+                proximo = f"{epoca}-{entregues[-1]}" if entregues else cursores.get(sede, proximo)
+            proximos[sede] = proximo
+        return eventos, "|".join(f"{sede}:{proximo}" for sede, proximo in proximos.items()), reiniciar
+
+    def visao_geral(self, agora=None):
+        """Uma linha por sede, consultadas em paralelo: OS por status, tempo de atendimento e idade das abertas"""
+        agora = agora or agora_local()
+
+        def resumir(servico):
+            status = servico.contagem("Status")
+            tabela = servico.tabela_indicadores()
+            atendimento = tabela.tempo_atendimento(por=None)
+            idade = tabela.idade_aberta(agora)
+            return {"OS": servico.contar(),
+                    **{nome: status.get(nome, 0) for nome in ["Pendente", "Em execução", "Pausado", "Concluído"]},
+                    "MTTR (h)": atendimento["Média"].iloc[0] if len(atendimento) else np.nan,
+                    "p90 atendimento (h)": atendimento["p90"].iloc[0] if len(atendimento) else np.nan,
+                    "Idade média em aberto (dias)": idade["Média"] if idade is not None else np.nan}
+
+        return pd.DataFrame.from_dict(self.em_paralelo(resumir), orient="index").rename_axis("Sede")
+
+    def _primeiras_da_fila(self, quantidade):
+        """[(chave, sede)] das quantidade OS mais prioritárias entre as filas de despacho de todas as sedes"""
+        por_sede = self.em_paralelo(lambda servico: servico.despacho.primeiras(quantidade))
+        return list(islice(heapq.merge(*[[(chave, sede) for chave in chaves] for sede, chaves in por_sede.items()]),
+                           quantidade))
+
+    def fila_despacho(self, quantidade=10):
+        """Como ServicoOS.fila_despacho, juntando as filas de todas as sedes"""
+        primeiras = self._primeiras_da_fila(quantidade)
+        total = sum(self.em_paralelo(lambda servico: len(servico.despacho)).values())
+        return self.linhas_por_id([chave[2] for chave, _ in primeiras]), total
+
+    def cargas_executantes(self):
+        """Carga de cada executante somada entre as sedes"""
+        executantes = self.servico(self.nomes[0]).executantes()
+        cargas = {nome: (0, 0) for nome in executantes}
+        for cargas_sede in self.em_paralelo(lambda servico: servico.despacho.cargas(executantes)).values():
+            for nome, (abertas, executando) in cargas_sede.items():
+                cargas[nome] = (cargas[nome][0] + abertas, cargas[nome][1] + executando)
+        return cargas
+
+    def proxima_os(self):
+        """(OS mais prioritária entre as sedes, executante de menor carga somando as sedes)"""
+        primeiras = self._primeiras_da_fila(1)
+        cargas = self.cargas_executantes()
+        sugestao = sugerir_executante(list(cargas), cargas)
+        if not primeiras:
+            return None, sugestao
+        (chave, sede), = primeiras
+        return self.servico(sede).obter(chave[2]), sugestao
+
+    # Gravações
+
+    def despachar(self, os_id=None, executante=None, versao=None):
+        """Como ServicoOS.despachar, com a próxima OS e o executante sugerido considerando todas as sedes"""
+        if os_id is None:
+            primeiras = self._primeiras_da_fila(1)
+            if not primeiras:
+                raise DadosInvalidos("Nenhuma OS à espera de despacho")
+            (chave, sede), = primeiras
+            os_id = chave[2]
+        else:
+            sede = self._localizar(os_id)
+            if sede is None:
+                raise OSInexistente(f"OS {os_id} não encontrada")
+        if not executante:
+            cargas = self.cargas_executantes()
+            executante = sugerir_executante(list(cargas), cargas)
+        return self.servico(sede).despachar(os_id, executante, versao)
+
+    def cadastrar(self, descricao, solicitante, local, urgente=False):
+        """Abre a OS na sede do Local; retorna o ID (único entre as sedes)"""
+        return self.servico(self.sede_do_local(local)).cadastrar(descricao, solicitante, local, urgente)
+
+    def atualizar(self, os_id, alteracoes, versao=None):
+        """Altera a OS na sede em que ela está (mesmo que o Local tenha passado a ser de outra sede)"""
+        sede = self._localizar(os_id)
+        if sede is None:
+            raise OSInexistente(f"OS {os_id} não encontrada")
+        return self.servico(sede).atualizar(os_id, alteracoes, versao)
+
+    def importar_lotes(self, lotes, tamanho=TAMANHO_LOTE_IMPORTACAO):
+        """Grava lotes já validados na sede do Local de cada OS; retorna o total incluído
+
+        As OS são acumuladas por sede e gravadas a cada tamanho OS, numa gravação por sede.
+        """
+        pendentes = {}
+        total = 0
+
+        def gravar(sede):
+            return self.servico(sede).importar_lotes(iter(pendentes.pop(sede)))
+
+        for lote in lotes:
+            for sede, parte in lote.groupby(self.mapa.sedes(lote["Local"]), sort=False):
+                pendentes.setdefault(sede, []).append(parte)
+                if sum(len(p) for p in pendentes[sede]) >= tamanho:
+                    total += gravar(sede)
+        for sede in list(pendentes):
+            total += gravar(sede)
+        return total
+
+    def exportar_lotes(self, filtros=None, tamanho=50000, conclusao=None):
+        """Lotes de cada sede, uma após a outra"""
+        return chain.from_iterable(servico.exportar_lotes(filtros, tamanho, conclusao) for servico in self.servicos())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OS divididas por sede")
+    parser.add_argument("comando", choices=["dividir", "listar"])
+    parser.add_argument("--diretorio", default=".", help="Diretório dos dados (com \"sedes\" no config.json)")
+    args = parser.parse_args()
+
+    if not ler_sedes(carregar_configuracao(os.path.join(args.diretorio, CONFIG_FILE))).keys() - {SEDE_PADRAO}:
+        parser.error("Nenhuma sede configurada (\"sedes\" no config.json)")
+    sedes = ServicoSedes(args.diretorio)
+    if args.comando == "dividir":
+        divididas = sedes.dividir()
+        if not divididas:
+            print("As OS já foram divididas entre as sedes")
+        for sede, quantidade in divididas.items():
+            print(f"{sede}: {quantidade} OS")
+    else:
+        sedes.inicializar_arquivos()
+        for sede, quantidade in sedes.contar_por_sede().items():
+            print(f"{sede}: {quantidade} OS em {sedes.diretorio_da_sede(sede)}")
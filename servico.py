@@ -0,0 +1,676 @@
+"""Serviço das ordens de serviço, independente da interface.
+
+Reúne o armazenamento, os índices mantidos a cada gravação (cubo do
+dashboard, busca textual e paginação), os backups e a sincronização com o
+GitHub num objeto que pode ser importado sem o Streamlit. No armazenamento
+particionado, os índices cobrem a tabela quente; os do arquivo de
+concluídas são montados só quando uma consulta precisa dele. A interface, a
+API HTTP (api.py), tarefas agendadas e importações em lote usam a mesma
+instância por diretório de dados, criada uma única vez por processo.
+
+Erros são levantados como exceções (DadosInvalidos, OSInexistente,
+ConflitoEdicao); cabe a quem chama exibi-los.
+"""
+import json
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+from agregados import CuboOS
+from alteracoes import LIMITE_CONSULTA, FeedAlteracoes
+from armazenamento import (COLUNAS_DATAS, COLUNAS_OS, STATUS_CONCLUIDO, VALORES_VAZIOS, ArmazenamentoCSV,
+                           ArmazenamentoSQLite, ConflitoEdicao, migrar_csv_para_sqlite, normalizar_tabela,
+                           versao_registro)
+from backups import RepositorioBackups
+from busca import PESOS_CAMPOS, IndiceBusca
+from despacho import STATUS_EM_EXECUCAO, FilaDespacho
+from indicadores import COLUNAS_INDICADORES, IndicadoresOS, concatenar
+from mesclagem import CAMPOS, registro_em_texto
+from metricas import INTERVALO_EXPORTACAO, cronometrar, obter_metricas
+from paginacao import IndicePaginacao, paginar
+from particoes import ArmazenamentoParticionado, inclui_concluidas
+from travas import caminho_temporario
+from sincronizacao import (GITHUB_AVAILABLE, ReplicaGitHub, Sincronizador, carregar_configuracao, github_configurado,
+                           obter_cliente)
+
+# Arquivos, relativos ao diretório de dados
+LOCAL_FILENAME = "ordens_servico4.0.csv"
+BACKUP_DIR = "backups"
+CONFIG_FILE = "config.json"
+JOURNAL_FILENAME = "ordens_servico4.0.journal"
+SQLITE_FILENAME = "ordens_servico4.0.db"
+SYNC_OUTBOX_FILENAME = "sync_outbox.json"
+SYNC_BASE_DIR = "github_base"  # Partes como estavam no último commit sincronizado (base da mesclagem)
+ABERTAS_FILENAME = "ordens_servico4.0_abertas.csv"  # Tabela quente do armazenamento particionado
+ARQUIVO_DIR = "arquivo_concluidas"
+
+RETENCAO_BACKUPS = {"horas": 48, "dias": 60, "meses": 24}  # Mantém o último backup de cada hora/dia/mês nessas janelas
+FUSO_LOCAL = timezone(timedelta(hours=-3))  # Horário local do sistema; as datas são gravadas sem fuso
+JOURNAL_LIMITE_BYTES = 256 * 1024  # Tamanho a partir do qual o journal é compactado no CSV
+SQLITE_LIMITE_PENDENCIAS = 200  # Alterações no banco até a próxima exportação para o CSV/backup/GitHub
+ARQUIVO_LIMITE_CONCLUIDAS = 200  # Concluídas na tabela quente até a compactação as levar ao arquivo
+
+# Executantes pré-definidos
+EXECUTANTES_PREDEFINIDOS = ["Robson", "Guilherme", "Paulinho"]
+EXECUTANTES_FILE = "executantes.txt"  # Executantes além dos predefinidos, um por linha (ao lado do config.json)
+
+TIPOS_MANUTENCAO = {
+    1: "Elétrica",
+    2: "Mecânica",
+    3: "Refrigeração",
+    4: "Hidráulica",
+    5: "Civil",
+    6: "Instalação"
+}
+
+STATUS_OPCOES = {
+    1: "Pendente",
+    2: "Pausado",
+    3: "Em execução",
+    4: "Concluído"
+}
+
+# Campos que uma atualização pode alterar; descrição, solicitante, local e abertura são fixados no cadastro
+CAMPOS_ATUALIZAVEIS = ["Tipo", "Status", "Executante1", "Executante2", "Urgente", "Observações",
+                       "Data Conclusão", "Hora Conclusão"]
+
+class DadosInvalidos(ValueError):
+    """Campos obrigatórios ausentes ou valores fora das opções do sistema"""
+
+class OSInexistente(LookupError):
+    """Não há OS com o ID informado"""
+
+def agora_local():
+    """Data e hora atuais no horário local usado pelo sistema (UTC-3), sem fuso, como são gravadas"""
+    return datetime.now(FUSO_LOCAL).replace(tzinfo=None)
+
+def validar_lote(bruto):
+    """Separa as OS válidas de um lote lido de arquivo das rejeitadas
+
+    O lote passa pela conversão do formato antigo e pelo esquema da tabela, e depois pelas regras do
+    cadastro: descrição, solicitante e local preenchidos, status e tipo entre as opções do sistema e
+    datas legíveis. Retorna (válidas no esquema da tabela, rejeitadas como lidas mais a coluna "Motivo").
+    """
+    bruto = bruto.reset_index(drop=True)
+    # Os IDs do arquivo são substituídos na gravação; o de origem fica só nas rejeitadas
+    tabela = normalizar_tabela(bruto.assign(ID=0))
+    motivos = pd.Series(pd.NA, index=tabela.index, dtype="string")
+
+    def rejeitar(mascara, motivo):
+        motivos[mascara & motivos.isna()] = motivo
+
+    for coluna in ("Descrição", "Solicitante", "Local"):
+        rejeitar(tabela[coluna].isna(), f"{coluna} não preenchido")
+    rejeitar(~tabela["Status"].isin(list(STATUS_OPCOES.values())), "Status inválido")
+    rejeitar(tabela["Tipo"].notna() & ~tabela["Tipo"].isin(list(TIPOS_MANUTENCAO.values())), "Tipo de manutenção inválido")
+    for coluna in COLUNAS_DATAS:
+        if coluna in bruto.columns:
+            texto = bruto[coluna].astype("string").str.strip()
+            rejeitar(tabela[coluna].isna() & texto.notna() & ~texto.isin(VALORES_VAZIOS), f"{coluna} inválida")
+
+    rejeitadas = motivos.notna()
+    return tabela[~rejeitadas], bruto[rejeitadas].assign(Motivo=motivos[rejeitadas])
+
+def _texto(valor):
+    return "" if valor is None or (not isinstance(valor, str) and pd.isna(valor)) else str(valor).strip()
+
+class ServicoOS:
+    """Operações sobre as ordens de serviço de um diretório de dados, compartilhadas por todas as interfaces"""
+
+    def __init__(self, diretorio=".", tipo_armazenamento=None, arquivo_config=None):
+        self.diretorio = diretorio
+        self.arquivo_config = arquivo_config or self.caminho(CONFIG_FILE)
+        self.lock = threading.RLock()
+        self._componentes = {}
+        self._diretorios_criados = False
+        self.configuracao = {}
+        self.sequencia = None  # Numeração compartilhada com outros serviços (sedes); sem ela, o armazenamento aloca os IDs
+        self.recarregar_configuracao()
+        self.tipo_armazenamento = tipo_armazenamento or self.configuracao.get("armazenamento", "csv")
+
+    def caminho(self, arquivo):
+        return os.path.join(self.diretorio, arquivo)
+
+    # Configuração
+
+    def ler_configuracao(self):
+        """Configuração deste serviço, lida do config.json (só relido quando muda em disco)"""
+        return carregar_configuracao(self.arquivo_config)
+
+    def recarregar_configuracao(self):
+        """Relê o config.json (GitHub, mecanismo de armazenamento e métricas)"""
+        self.configuracao = self.ler_configuracao()
+        arquivo_metricas = self.configuracao.get("metricas_arquivo")
+        obter_metricas().configurar(self.configuracao.get("metricas", False),
+                                    os.path.join(os.path.dirname(self.arquivo_config), arquivo_metricas)
+                                    if arquivo_metricas else None,
+                                    self.configuracao.get("metricas_intervalo", INTERVALO_EXPORTACAO))
+        return self.configuracao
+
+    def github_ativo(self):
+        return GITHUB_AVAILABLE and github_configurado(self.configuracao)
+
+    def configurar_github(self, repo, filepath, token):
+        """Valida as credenciais no GitHub e as grava no config.json"""
+        if not (repo and filepath and token):
+            raise DadosInvalidos("Preencha todos os campos para ativar a sincronização com GitHub")
+        config = carregar_configuracao(self.arquivo_config)
+        config.update({
+            'github_repo': repo,
+            'github_filepath': filepath,
+            'github_token': token
+        })
+        obter_cliente(config).validar()
+        self._gravar_configuracao(config)
+
+    def configurar_metricas(self, ativo, arquivo=None):
+        """Liga ou desliga a coleta de métricas (e o arquivo do Prometheus, relativo ao diretório) no config.json"""
+        config = carregar_configuracao(self.arquivo_config)
+        config["metricas"] = bool(ativo)
+        if arquivo:
+            config["metricas_arquivo"] = arquivo
+        else:
+            config.pop("metricas_arquivo", None)
+        self._gravar_configuracao(config)
+
+    def _gravar_configuracao(self, config):
+        arquivo = self.arquivo_config
+        temporario = caminho_temporario(arquivo)
+        with open(temporario, 'w') as f:
+            json.dump(config, f)
+        os.replace(temporario, arquivo)
+        self.recarregar_configuracao()
+
+    # Componentes, criados na primeira utilização
+
+    def _componente(self, nome, criar):
+        with self.lock:
+            if nome not in self._componentes:
+                self._componentes[nome] = criar()
+            return self._componentes[nome]
+
+    def _criar_armazenamento(self):
+        arquivo_csv = self.caminho(LOCAL_FILENAME)
+        if self.tipo_armazenamento == "sqlite":
+            arquivo_banco = self.caminho(SQLITE_FILENAME)
+            if not os.path.exists(arquivo_banco) and os.path.exists(arquivo_csv):
+                migrar_csv_para_sqlite(arquivo_csv, arquivo_banco)
+            return ArmazenamentoSQLite(arquivo_banco, arquivo_csv, SQLITE_LIMITE_PENDENCIAS)
+        if self.tipo_armazenamento == "particionado":
+            # Na primeira abertura, o CSV completo é dividido entre a tabela quente e o arquivo
+            return ArmazenamentoParticionado(self.caminho(ABERTAS_FILENAME), self.caminho(JOURNAL_FILENAME),
+                                             self.caminho(ARQUIVO_DIR), arquivo_csv, JOURNAL_LIMITE_BYTES,
+                                             ARQUIVO_LIMITE_CONCLUIDAS)
+        return ArmazenamentoCSV(arquivo_csv, self.caminho(JOURNAL_FILENAME), JOURNAL_LIMITE_BYTES)
+
+    @property
+    def armazenamento(self):
+        """Armazenamento configurado (CSV com journal, SQLite ou particionado)"""
+        return self._componente("armazenamento", self._criar_armazenamento)
+
+    @property
+    def particionado(self):
+        return isinstance(self.armazenamento, ArmazenamentoParticionado)
+
+    def _observador(self, nome, classe):
+        """Estrutura derivada registrada no armazenamento e já com as alterações feitas por outros processos"""
+        def criar():
+            observador = classe()
+            self.armazenamento.sincronizar()
+            self.armazenamento.registrar_observador(observador)
+            return observador
+        observador = self._componente(nome, criar)
+        self.armazenamento.sincronizar()
+        return observador
+
+    @property
+    def cubo(self):
+        """Cubo de indicadores do dashboard (com o resumo do arquivo de concluídas, sem ler as partições)"""
+        cubo = self._observador("cubo", CuboOS)
+        if self.particionado:
+            cubo.definir_base(*self.armazenamento.particoes.resumo())
+        return cubo
+
+    @property
+    def feed(self):
+        """Feed das inclusões/alterações de OS (as arquivadas que voltam à tabela quente não contam como novas)"""
+        feed = self._observador("feed", FeedAlteracoes)
+        if self.particionado:
+            feed.definir_maior_id(self.armazenamento.particoes.maior_id())
+        return feed
+
+    @property
+    def indicadores(self):
+        return self._observador("indicadores", IndicadoresOS)
+
+    def tabela_indicadores(self):
+        """Tempos de atendimento, backlog e vazão da versão atual dos dados (com as concluídas arquivadas)
+
+        A preparação é refeita só quando a tabela ou o arquivo de concluídas mudam.
+        """
+        indicadores = self.indicadores
+        if not self.particionado:
+            return indicadores.tabela(self.armazenamento.carregar)
+        particoes = self.armazenamento.particoes
+        with self.lock:
+            # Colunas das concluídas arquivadas guardadas por versão do arquivo: mudanças na tabela quente não as releem
+            versao = particoes.versao()
+            arquivadas, versao_arquivo = self._componentes.get("indicadores_arquivo", (None, None))
+            if arquivadas is None or versao_arquivo != versao:
+                arquivadas = particoes.ler(colunas=COLUNAS_INDICADORES)
+                self._componentes["indicadores_arquivo"] = (arquivadas, versao)
+
+        def carregar():
+            quentes = self.armazenamento.carregar_quente()[COLUNAS_INDICADORES]
+            restantes = arquivadas[~arquivadas["ID"].isin(quentes["ID"])]
+            return concatenar([quentes, restantes]) if len(restantes) else quentes
+        return indicadores.tabela(carregar, versao)
+
+    @property
+    def despacho(self):
+        """Fila de despacho das OS em aberto e carga dos executantes (a tabela quente, no particionado)"""
+        return self._observador("despacho", FilaDespacho)
+
+    @property
+    def indice_busca(self):
+        return self._observador("indice_busca", IndiceBusca)
+
+    @property
+    def indice_paginacao(self):
+        return self._observador("indice_paginacao", IndicePaginacao)
+
+    def _indice_arquivo(self, nome, classe, colunas):
+        """Índice das OS arquivadas, montado só das colunas necessárias e refeito quando o arquivo muda"""
+        particoes = self.armazenamento.particoes
+        with self.lock:
+            versao = particoes.versao()
+            indice, versao_indice = self._componentes.get(nome, (None, None))
+            if indice is None or versao_indice != versao:
+                indice = classe()
+                indice.recarregar(particoes.ler(colunas=colunas))
+                self._componentes[nome] = (indice, versao)
+            return indice
+
+    @property
+    def repositorio_backups(self):
+        """Repositório de backups (manifesto carregado uma única vez)"""
+        return self._componente("backups", lambda: RepositorioBackups(self.caminho(BACKUP_DIR), RETENCAO_BACKUPS,
+                                                                          agora=agora_local))
+
+    @property
+    def sincronizador(self):
+        """Fila de envio ao GitHub e sua thread"""
+        def criar():
+            def consolidar_antes_do_envio():
+                self.armazenamento.compactar()
+                self.fazer_backup()
+            return Sincronizador(self.caminho(SYNC_OUTBOX_FILENAME), self.caminho(LOCAL_FILENAME),
+                                 self.arquivo_config, preparar=consolidar_antes_do_envio,
+                                 ler_configuracao=self.ler_configuracao, enviar=self.enviar_ao_github)
+        return self._componente("sincronizador", criar)
+
+    @property
+    def replica_github(self):
+        """Base da mesclagem com o GitHub (partes do último commit sincronizado)"""
+        return self._componente("replica_github", lambda: ReplicaGitHub(self.caminho(SYNC_BASE_DIR)))
+
+    # Arquivos, backups e GitHub
+
+    def inicializar_arquivos(self):
+        """Garante que todos os arquivos necessários existam e estejam válidos
+
+        Chamado a cada execução das páginas: o diretório de backups é criado uma vez e o
+        config.json só é relido se tiver mudado.
+        """
+        if not self._diretorios_criados:
+            os.makedirs(self.caminho(BACKUP_DIR), exist_ok=True)
+            self._diretorios_criados = True
+        self.recarregar_configuracao()
+        arquivo = self.caminho(LOCAL_FILENAME)
+        if not os.path.exists(arquivo) or os.path.getsize(arquivo) == 0:
+            if self.github_ativo():
+                self.baixar_do_github()
+            else:
+                pd.DataFrame(columns=COLUNAS_OS).to_csv(arquivo, index=False)
+
+    def baixar_do_github(self):
+        """Baixa o arquivo do GitHub se estiver mais atualizado"""
+        if not GITHUB_AVAILABLE:
+            raise RuntimeError("Funcionalidade do GitHub não está disponível")
+        cliente = obter_cliente(self.configuracao)
+        arquivo = self.caminho(LOCAL_FILENAME)
+        temporario = f"{arquivo}.download"
+        # Sem download quando o ramo não andou desde a última sincronização; das partes, só as que mudaram
+        if self.replica_github.baixar(cliente, temporario, arquivo_atual=arquivo):
+            self.armazenamento.restaurar(temporario)
+            os.remove(temporario)
+            if self.sequencia:
+                self.sequencia.iniciar(self.armazenamento.proximo_id())
+
+    def enviar_ao_github(self, configuracao=None):
+        """Envia ao GitHub as partes alteradas, mesclando antes as OS alteradas por outras instalações
+
+        Retorna (commit criado ou None, OS com conflito na mesclagem), como ReplicaGitHub.enviar.
+        """
+        return self.replica_github.enviar(obter_cliente(configuracao or self.configuracao),
+                                          self.caminho(LOCAL_FILENAME), preparar=self.armazenamento.compactar,
+                                          aplicar=self._aplicar_mesclagem)
+
+    def _aplicar_mesclagem(self, alteracoes):
+        """Grava as OS mescladas com o GitHub (mesclagem.mesclar); False se alguma mudou aqui desde a leitura
+
+        As OS que ficaram com o ID de outra do GitHub são incluídas com ID novo depois das demais, para que
+        a numeração continue acima dos IDs vindos de lá.
+        """
+        completas, renumeradas = True, []
+        if self.sequencia:
+            self.sequencia.iniciar(max(alteracao[0] for alteracao in alteracoes) + 1)
+        for os_id, local, mesclado, renumerar in alteracoes:
+            atual = self.armazenamento.obter(os_id)
+            if registro_em_texto(atual) != local:
+                completas = False
+                continue
+            campos = dict(zip(CAMPOS, mesclado))
+            try:
+                if atual is None:
+                    self.armazenamento.inserir(os_id, campos)
+                else:
+                    self.armazenamento.atualizar(os_id, campos, versao_registro(atual))
+            except ConflitoEdicao:
+                completas = False
+                continue
+            if renumerar is not None:
+                renumeradas.append(dict(zip(CAMPOS, renumerar)))
+        for campos in renumeradas:
+            self.armazenamento.inserir(self.sequencia.reservar() if self.sequencia else None, campos)
+        return completas
+
+    @cronometrar("fazer_backup")
+    def fazer_backup(self):
+        """Cria um backup dos dados atuais; retorna (entrada do manifesto, criado) ou (None, False)"""
+        arquivo = self.caminho(LOCAL_FILENAME)
+        if os.path.exists(arquivo) and os.path.getsize(arquivo) > 0:
+            return self.repositorio_backups.criar(arquivo)
+        return None, False
+
+    @cronometrar("restaurar_backup")
+    def restaurar_backup(self, nome):
+        """Restaura os dados a partir de um backup do manifesto (checksum conferido antes de aplicar)"""
+        temporario = f"{self.caminho(LOCAL_FILENAME)}.restauracao"
+        try:
+            self.repositorio_backups.extrair(nome, temporario)
+            self.armazenamento.restaurar(temporario)
+        finally:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+
+    def agendar_sincronizacao(self):
+        """Enfileira o envio ao GitHub sem bloquear a gravação (o envio ocorre em segundo plano, agrupado)"""
+        if self.github_ativo():
+            self.sincronizador.agendar()
+
+    @cronometrar("consolidar")
+    def consolidar(self):
+        """Incorpora as alterações pendentes ao CSV local, gerando backup e sincronizando com o GitHub"""
+        self.armazenamento.compactar()
+        self.fazer_backup()
+        self.agendar_sincronizacao()
+
+    @cronometrar("importar_lotes")
+    def importar_lotes(self, lotes):
+        """Grava lotes já validados (validar_lote) de uma só vez, com IDs novos; retorna o total incluído"""
+        total = self.armazenamento.inserir_lotes(lotes, self.sequencia.reservar if self.sequencia else None)
+        if self.armazenamento.precisa_compactar():
+            self.consolidar()
+        else:
+            self.fazer_backup()
+            self.agendar_sincronizacao()
+        return total
+
+    def exportar_lotes(self, filtros=None, tamanho=50000, conclusao=None):
+        """Tabela em lotes (ex.: filtros={"Status": "Concluído"}), sem carregá-la inteira na memória
+
+        conclusao=(desde, ate) restringe às OS concluídas no período; no armazenamento particionado,
+        só as partições desses meses são lidas.
+        """
+        return self.armazenamento.ler_lotes(tamanho, filtros, conclusao)
+
+    @cronometrar("salvar_tabela")
+    def salvar_tabela(self, df):
+        """Substitui a tabela inteira, com backup e sincronização"""
+        self.armazenamento.salvar_tabela(df)
+        self.fazer_backup()
+        self.agendar_sincronizacao()
+
+    # Consultas
+
+    @cronometrar("carregar")
+    def carregar(self):
+        """Tabela completa, relendo o último backup se o arquivo de dados estiver ilegível"""
+        try:
+            return self.armazenamento.carregar()
+        except Exception:
+            backup = self.repositorio_backups.ultimo()
+            if not backup:
+                raise
+            self.restaurar_backup(backup["nome"])
+            return self.armazenamento.carregar()
+
+    def contar(self):
+        return self.armazenamento.contar()
+
+    @cronometrar("consultar")
+    def consultar(self, filtros=None, busca=None, incluir_arquivo=True):
+        """Consulta aplicando os filtros no próprio armazenamento (ex.: {"Status": "Pendente"}, busca=("Local", "mat"))
+
+        Com incluir_arquivo=False, o armazenamento particionado não lê as OS concluídas arquivadas.
+        """
+        if self.particionado:
+            return self.armazenamento.consultar(filtros, busca, incluir_arquivo)
+        return self.armazenamento.consultar(filtros, busca)
+
+    def obter(self, os_id):
+        """Registro da OS como dicionário; OSInexistente se não houver"""
+        registro = self.armazenamento.obter(os_id)
+        if registro is None:
+            raise OSInexistente(f"OS {os_id} não encontrada")
+        return registro
+
+    def listar_abertas(self):
+        return self.armazenamento.listar_abertas()
+
+    def linhas_por_id(self, ids):
+        """Busca só as OS informadas, na ordem dos IDs"""
+        if not ids:
+            return normalizar_tabela(pd.DataFrame(columns=COLUNAS_OS))
+        linhas = self.consultar({"ID": list(ids)})
+        posicoes = pd.Index(linhas["ID"]).get_indexer(ids)
+        return linhas.iloc[posicoes[posicoes >= 0]]
+
+    @cronometrar("pesquisar")
+    def pesquisar(self, texto, campos=None, limite=None, incluir_arquivo=False):
+        """Busca textual pelo índice (sem acentos, vários termos, trechos de palavra), da OS mais relevante à menos
+
+        Com incluir_arquivo, também nas concluídas arquivadas, listadas depois das OS da tabela quente.
+        """
+        return self.linhas_por_id([os_id for os_id, _, _ in self.pontuar_busca(texto, campos, limite, incluir_arquivo)])
+
+    def pontuar_busca(self, texto, campos=None, limite=None, incluir_arquivo=False):
+        """[(ID, relevância, arquivada)] da busca textual, na ordem de pesquisar (para intercalar com outras buscas)"""
+        pontuados = [(os_id, pontos, False) for os_id, pontos in self.indice_busca.pontuar(texto, campos, limite)]
+        if incluir_arquivo and self.particionado:
+            arquivo = self._indice_arquivo("busca_arquivo", IndiceBusca, ["ID"] + list(PESOS_CAMPOS))
+            quentes = {os_id for os_id, _, _ in pontuados}
+            pontuados += [(os_id, pontos, True) for os_id, pontos in arquivo.pontuar(texto, campos, limite)
+                          if os_id not in quentes]
+        return pontuados[:limite]
+
+    @cronometrar("pagina")
+    def pagina(self, ordenacao="ID", filtros=None, cursor=None, tamanho=50, decrescente=False):
+        """Linhas de uma página da listagem, o cursor da próxima (None na última) e o total com os filtros
+
+        No armazenamento particionado, o arquivo de concluídas só entra se os filtros admitem concluídas.
+        """
+        indices = self.indices_paginacao(filtros)
+        ids, proximo = paginar(indices, ordenacao, filtros, cursor, tamanho, decrescente)
+        return self.linhas_por_id(ids), proximo, sum(indice.contar(filtros) for indice in indices)
+
+    def indices_paginacao(self, filtros=None):
+        """Índices de paginação que podem ter OS com esses filtros (o do arquivo só se admitem concluídas)"""
+        indices = [self.indice_paginacao]
+        if self.particionado and inclui_concluidas(filtros):
+            indices.append(self._indice_arquivo("paginacao_arquivo", IndicePaginacao, ["ID", "Data", "Status", "Tipo"]))
+        return indices
+
+    def alteracoes(self, cursor=None, limite=LIMITE_CONSULTA):
+        """OS incluídas/alteradas depois do cursor: (eventos, próximo cursor, reiniciar); sem cursor, só o atual"""
+        return self.feed.desde(cursor, limite)
+
+    def contagem(self, dimensao, **filtros):
+        """Contagens do cubo por dimensão (ex.: contagem("Executante", Status="Concluído", Mes="2025-01"))"""
+        return self.cubo.contagem(dimensao, **filtros)
+
+    def executantes(self):
+        """Executantes predefinidos mais os do executantes.txt, sem repetir"""
+        nomes = list(EXECUTANTES_PREDEFINIDOS)
+        arquivo = os.path.join(os.path.dirname(self.arquivo_config), EXECUTANTES_FILE)
+        if os.path.exists(arquivo):
+            with open(arquivo, encoding="utf-8") as f:
+                nomes += [linha.strip() for linha in f if linha.strip()]
+        return list(dict.fromkeys(nomes))
+
+    def fila_despacho(self, quantidade=10):
+        """As quantidade OS mais prioritárias à espera de despacho (urgentes, depois as mais antigas) e o total na fila"""
+        despacho = self.despacho
+        ids = [chave[2] for chave in despacho.primeiras(quantidade)]
+        return self.linhas_por_id(ids), len(despacho)
+
+    def proxima_os(self):
+        """(OS mais prioritária à espera de despacho, executante sugerido); (None, sugestão) com a fila vazia"""
+        despacho = self.despacho
+        chave = despacho.proxima()
+        sugestao = despacho.sugerir(self.executantes())
+        return (self.obter(chave[2]) if chave else None), sugestao
+
+    def cargas_executantes(self):
+        """{executante: (OS em aberto, em execução)} dos executantes cadastrados"""
+        return self.despacho.cargas(self.executantes())
+
+    def recalcular_indicadores(self):
+        """Reconstrói o cubo do dashboard a partir da tabela em memória (a quente, no particionado)"""
+        cubo = self.cubo
+        cubo.recarregar(self.armazenamento.carregar_quente() if self.particionado else self.carregar())
+        return cubo
+
+    # Gravações
+
+    def _depois_de_gravar(self):
+        if self.armazenamento.precisa_compactar():
+            self.consolidar()
+        else:
+            self.agendar_sincronizacao()
+
+    @cronometrar("cadastrar")
+    def cadastrar(self, descricao, solicitante, local, urgente=False):
+        """Abre uma OS pendente com data e hora atuais; retorna o ID alocado"""
+        descricao, solicitante, local = _texto(descricao), _texto(solicitante), _texto(local)
+        if not descricao or not solicitante or not local:
+            raise DadosInvalidos("Preencha todos os campos obrigatórios (*)")
+        abertura = agora_local()
+        nova_os = {
+            "Descrição": descricao,
+            "Data": abertura.strftime("%d/%m/%Y"),
+            "Hora Abertura": abertura.strftime("%H:%M"),
+            "Solicitante": solicitante,
+            "Local": local,
+            "Tipo": "",
+            "Status": "Pendente",
+            "Data Conclusão": "",
+            "Hora Conclusão": "",
+            "Executante1": "",
+            "Executante2": "",
+            "Urgente": "Sim" if urgente else "Não",
+            "Observações": ""
+        }
+        # O ID é alocado pelo armazenamento no momento da gravação (ou pela numeração compartilhada das sedes),
+        # sem colidir com outras sessões
+        os_id = self.armazenamento.inserir(self.sequencia.reservar() if self.sequencia else None, nova_os)
+        self._depois_de_gravar()
+        return os_id
+
+    @cronometrar("atualizar")
+    def atualizar(self, os_id, alteracoes, versao=None):
+        """Altera uma OS; versao é o carimbo (versao_registro) da OS quando foi lida
+
+        Se outra sessão a alterou depois, nada é gravado e ConflitoEdicao é levantada. Ao concluir
+        sem data/hora de conclusão, usa o momento atual; nos demais status, elas ficam vazias.
+        """
+        desconhecidos = set(alteracoes) - set(CAMPOS_ATUALIZAVEIS)
+        if desconhecidos:
+            raise DadosInvalidos(f"Campos não alteráveis: {', '.join(sorted(desconhecidos))}")
+        atual = self.obter(os_id)
+        campos = {coluna: _texto(valor) if coluna != "Urgente" else valor for coluna, valor in alteracoes.items()}
+
+        status = campos.get("Status", _texto(atual["Status"]))
+        if status not in STATUS_OPCOES.values():
+            raise DadosInvalidos(f"Status inválido: {status}")
+        if campos.get("Tipo") and campos["Tipo"] not in TIPOS_MANUTENCAO.values():
+            raise DadosInvalidos(f"Tipo de manutenção inválido: {campos['Tipo']}")
+        executante1 = campos.get("Executante1", _texto(atual["Executante1"]))
+        if status in ["Em execução", "Concluído"] and not executante1:
+            raise DadosInvalidos("Selecione pelo menos um executante principal para este status!")
+        if "Urgente" in campos:
+            campos["Urgente"] = "Sim" if campos["Urgente"] in (True, "Sim") else "Não"
+
+        if "Status" in campos:
+            if status == STATUS_CONCLUIDO:
+                conclusao = agora_local()
+                campos["Data Conclusão"] = campos.get("Data Conclusão") or conclusao.strftime("%d/%m/%Y")
+                campos["Hora Conclusão"] = campos.get("Hora Conclusão") or conclusao.strftime("%H:%M")
+            else:
+                campos["Data Conclusão"] = ""
+                campos["Hora Conclusão"] = ""
+
+        self.armazenamento.atualizar(os_id, campos, versao)
+        self._depois_de_gravar()
+        return self.obter(os_id)
+
+    def despachar(self, os_id=None, executante=None, versao=None):
+        """Põe em execução a OS (a mais prioritária da fila, sem os_id) com o executante (o sugerido, sem ele)
+
+        Retorna a OS alterada; DadosInvalidos com a fila vazia ou sem executantes cadastrados.
+        """
+        if os_id is None:
+            chave = self.despacho.proxima()
+            if chave is None:
+                raise DadosInvalidos("Nenhuma OS à espera de despacho")
+            os_id = chave[2]
+        executante = _texto(executante) or self.despacho.sugerir(self.executantes())
+        if not executante:
+            raise DadosInvalidos("Nenhum executante cadastrado")
+        return self.atualizar(os_id, {"Status": STATUS_EM_EXECUCAO, "Executante1": executante}, versao)
+
+_servicos = {}
+_lock_servicos = threading.Lock()
+
+def obter_servico(diretorio=".", tipo_armazenamento=None):
+    """Serviço compartilhado pelo processo para o diretório de dados e o mecanismo de armazenamento
+
+    Sem tipo_armazenamento, vale o configurado no config.json do diretório. Com "sedes" no config.json,
+    retorna o ServicoSedes (sedes.py), que distribui as OS entre um serviço por sede.
+    """
+    config = carregar_configuracao(os.path.join(diretorio, CONFIG_FILE))
+    if tipo_armazenamento is None:
+        tipo_armazenamento = config.get("armazenamento", "csv")
+    chave = (os.path.abspath(diretorio), tipo_armazenamento, bool(config.get("sedes")))
+    with _lock_servicos:
+        if chave not in _servicos:
+            if config.get("sedes"):
+                from sedes import ServicoSedes
+                _servicos[chave] = ServicoSedes(diretorio, tipo_armazenamento)
+            else:
+                _servicos[chave] = ServicoOS(diretorio, tipo_armazenamento)
+        return _servicos[chave]
+
@@ -0,0 +1,619 @@
+"""Sincronização com o GitHub em segundo plano.
+
+Cada gravação apenas registra um pedido na fila de saída (outbox), que fica
+em disco e sobrevive a reinícios. Uma thread dedicada aguarda as gravações
+pararem (debounce), agrupa todos os pedidos acumulados num único envio e,
+se a rede ou o GitHub falharem, tenta de novo com espera exponencial.
+
+No GitHub, as OS ficam em partes por faixa de IDs (mesclagem.py), ao lado
+do arquivo configurado. Cada envio leva num único commit (API Git Data:
+blobs, árvore, commit e avanço do ramo sem forçar) só as partes alteradas
+desde a última sincronização. Se outra instalação enviou antes, o commit é
+recusado; as partes que mudaram lá são baixadas, mescladas com as locais e
+o envio é refeito sobre o commit novo. A ReplicaGitHub guarda a base dessa
+mesclagem: as partes como estavam no último commit sincronizado. As OS com
+conflito (mesmo campo alterado dos dois lados, em que fica o valor local, ou
+mesmo ID incluído dos dois lados) são contadas no status da sincronização.
+
+O PyGithub cuida do repositório e da API de conteúdos; a consulta
+condicional (ETag) e a API Git Data, que ele não expõe, passam por uma
+sessão HTTP própria (SessaoGitHub), com as mesmas exceções e retentativas.
+
+Para testes, "github_api_url" no config.json aponta o cliente para um
+servidor local que imite as APIs de conteúdos e Git Data do GitHub.
+"""
+import base64
+import hashlib
+import importlib.util
+import json
+import os
+import threading
+import time
+from urllib.parse import quote
+
+from mesclagem import dividir_em_partes, juntar_partes, mesclar_partes
+from metricas import cronometrar, registrar_partida
+from travas import TravaArquivo, caminho_temporario, identidade_arquivo
+
+# O PyGithub (com o requests) só é importado quando um cliente é criado: a importação é lenta
+# e a maior parte das execuções do aplicativo não fala com o GitHub
+GITHUB_AVAILABLE = importlib.util.find_spec("github") is not None
+Auth = Github = GithubException = UnknownObjectException = RequestException = requests = None
+API_GITHUB = "https://api.github.com"
+TEMPO_LIMITE = 15  # Segundos por requisição, o mesmo padrão do PyGithub
+
+def _importar_github():
+    global Auth, Github, GithubException, UnknownObjectException, RequestException, requests
+    if Github is None:
+        inicio = time.perf_counter()
+        import requests
+        from github import Auth, Github, GithubException, UnknownObjectException
+        from requests.exceptions import RequestException
+        registrar_partida("importação do PyGithub", time.perf_counter() - inicio)
+
+_configuracoes = {}
+_lock_configuracoes = threading.Lock()
+
+def carregar_configuracao(arquivo_config):
+    """Lê o config.json (ou retorna um dicionário vazio se não existir)
+
+    O arquivo só é relido quando muda em disco; cada chamada recebe uma cópia, que pode alterar.
+    """
+    try:
+        identidade = identidade_arquivo(arquivo_config)
+    except FileNotFoundError:
+        return {}
+    chave = os.path.abspath(arquivo_config)
+    with _lock_configuracoes:
+        lida = _configuracoes.get(chave)
+        if lida is None or lida[0] != identidade:
+            with open(arquivo_config) as f:
+                lida = _configuracoes[chave] = (identidade, json.load(f))
+        return dict(lida[1])
+
+def github_configurado(configuracao):
+    return bool(configuracao.get('github_repo') and configuracao.get('github_filepath') and configuracao.get('github_token'))
+
+def conectar_github(configuracao):
+    """Cria o cliente do GitHub, usando a URL da API alternativa se configurada"""
+    if not GITHUB_AVAILABLE:
+        raise RuntimeError("PyGithub não instalado")
+    _importar_github()
+    return Github(auth=Auth.Token(configuracao['github_token']), base_url=configuracao.get('github_api_url') or API_GITHUB)
+
+def sha_blob_git(dados):
+    """SHA que o GitHub atribui a um arquivo com este conteúdo (permite comparar sem baixar)"""
+    return hashlib.sha1(b"blob %d\0" % len(dados) + dados).hexdigest()
+
+def _cabecalho(cabecalhos, nome):
+    for chave, valor in (cabecalhos or {}).items():
+        if chave.lower() == nome:
+            return valor
+    return None
+
+class ArquivoRemotoInexistente(Exception):
+    pass
+
+class RemotoDivergente(Exception):
+    """O ramo no GitHub recebeu commits de outra instalação depois da última sincronização"""
+
+class SessaoGitHub:
+    """Requisições diretas à API REST de um repositório do GitHub, numa sessão HTTP com conexão persistente
+
+    Respostas de erro viram as exceções do PyGithub (UnknownObjectException no 404), com status e
+    cabeçalhos, para passarem pelas mesmas retentativas das chamadas feitas por ele.
+    """
+
+    def __init__(self, configuracao):
+        _importar_github()
+        self.url = f"{(configuracao.get('github_api_url') or API_GITHUB).rstrip('/')}/repos/{configuracao['github_repo']}"
+        self.sessao = requests.Session()
+        self.sessao.headers.update({"Authorization": f"token {configuracao['github_token']}",
+                                    "Accept": "application/vnd.github+json"})
+
+    def requisitar(self, metodo, caminho, cabecalhos=None, corpo=None):
+        """(cabeçalhos, JSON da resposta) da requisição a caminho (relativo a /repos/<repo>); JSON None no 304"""
+        resposta = self.sessao.request(metodo, self.url + caminho, headers=cabecalhos, json=corpo, timeout=TEMPO_LIMITE)
+        if resposta.status_code == 304:
+            return resposta.headers, None
+        try:
+            dados = resposta.json() if resposta.content else None
+        except ValueError:
+            dados = resposta.text
+        if resposta.status_code >= 400:
+            excecao = UnknownObjectException if resposta.status_code == 404 else GithubException
+            raise excecao(resposta.status_code, dados, dict(resposta.headers))
+        return resposta.headers, dados
+
+class ClienteGitHub:
+    """Cliente persistente para o arquivo de OS no GitHub.
+
+    Mantém a conexão e o repositório abertos entre chamadas e lembra o SHA
+    e o ETag do arquivo remoto: downloads usam requisição condicional
+    (304 = nada mudou) e envios não precisam consultar o SHA antes. As
+    partes (ReplicaGitHub) usam a API Git Data pelo mesmo cliente.
+    """
+
+    def __init__(self, configuracao, tentativas=4, espera_maxima=120):
+        self.configuracao = configuracao
+        self.caminho = configuracao['github_filepath']
+        self.tentativas = tentativas
+        self.espera_maxima = espera_maxima
+        self.lock = threading.RLock()
+        self.sha_remoto = None
+        self.etag = None
+        self._github = conectar_github(configuracao)
+        self._http = SessaoGitHub(configuracao)
+        self._repo = None
+
+    def _espera(self, erro, tentativa):
+        """Tempo até a próxima tentativa: respeita Retry-After e o reset do limite de requisições"""
+        cabecalhos = getattr(erro, "headers", None)
+        if _cabecalho(cabecalhos, "retry-after"):
+            return float(_cabecalho(cabecalhos, "retry-after"))
+        if _cabecalho(cabecalhos, "x-ratelimit-remaining") == "0" and _cabecalho(cabecalhos, "x-ratelimit-reset"):
+            return max(0, float(_cabecalho(cabecalhos, "x-ratelimit-reset")) - time.time()) + 1
+        return 2 ** tentativa
+
+    def _com_retentativas(self, operacao):
+        """Repete a operação em falhas temporárias (rede, 5xx, limite de requisições)"""
+        for tentativa in range(self.tentativas):
+            try:
+                return operacao()
+            except GithubException as e:
+                limite = e.status in (403, 429) and (_cabecalho(e.headers, "retry-after")
+                                                     or _cabecalho(e.headers, "x-ratelimit-remaining") == "0")
+                if not (limite or e.status >= 500) or tentativa == self.tentativas - 1:
+                    raise
+                espera = self._espera(e, tentativa)
+            except RequestException as e:
+                if tentativa == self.tentativas - 1:
+                    raise
+                espera = self._espera(e, tentativa)
+            # Esperas longas (limite esgotado por muito tempo) ficam por conta da fila de saída
+            if espera > self.espera_maxima:
+                raise RuntimeError(f"Limite de requisições do GitHub esgotado; nova tentativa em {espera:.0f}s")
+            time.sleep(espera)
+
+    @property
+    def repo(self):
+        if self._repo is None:
+            self._repo = self._com_retentativas(lambda: self._github.get_repo(self.configuracao['github_repo']))
+        return self._repo
+
+    def _consultar_remoto(self):
+        """Consulta o arquivo remoto; retorna None se ele não mudou desde a última consulta"""
+        cabecalhos = {"If-None-Match": self.etag} if self.etag else {}
+        try:
+            resposta, dados = self._http.requisitar("GET", f"/contents/{quote(self.caminho)}", cabecalhos)
+        except UnknownObjectException:
+            self.sha_remoto = self.etag = None
+            raise ArquivoRemotoInexistente(self.caminho)
+        if dados is None:
+            return None
+        self.etag = _cabecalho(resposta, "etag")
+        self.sha_remoto = dados["sha"]
+        return dados
+
+    def validar(self):
+        """Confirma acesso ao repositório e ao seu ramo padrão (as OS podem ainda não estar nele)"""
+        with self.lock:
+            self.commit_atual()
+
+    @cronometrar("github.baixar")
+    def baixar(self, destino, arquivo_atual=None):
+        """Grava o arquivo remoto em destino; retorna False (sem baixar) se não houver nada novo"""
+        with self.lock:
+            dados = self._com_retentativas(self._consultar_remoto)
+            if dados is None:
+                return False
+            if arquivo_atual and os.path.exists(arquivo_atual):
+                with open(arquivo_atual, "rb") as f:
+                    if sha_blob_git(f.read()) == self.sha_remoto:
+                        return False
+
+            if dados.get("encoding") == "base64" and dados.get("content"):
+                conteudo = base64.b64decode(dados["content"])
+            else:
+                # A API de conteúdos não devolve arquivos acima de 1 MB; o blob devolve
+                blob = self._com_retentativas(lambda: self.repo.get_git_blob(self.sha_remoto))
+                conteudo = base64.b64decode(blob.content)
+
+            with open(destino, "wb") as f:
+                f.write(conteudo)
+            return True
+
+    @cronometrar("github.enviar")
+    def enviar(self, arquivo_local, mensagem="Atualização automática do sistema de OS"):
+        """Envia o arquivo local; retorna False se o remoto já tinha exatamente este conteúdo"""
+        with open(arquivo_local, "rb") as f:
+            conteudo = f.read()
+
+        with self.lock:
+            if self.sha_remoto is None:
+                try:
+                    self._com_retentativas(self._consultar_remoto)
+                except ArquivoRemotoInexistente:
+                    resultado = self._com_retentativas(
+                        lambda: self.repo.create_file(self.caminho, "Criação inicial do arquivo de OS", conteudo))
+                    self.sha_remoto = resultado["content"].sha
+                    return True
+
+            if sha_blob_git(conteudo) == self.sha_remoto:
+                return False
+
+            try:
+                resultado = self._com_retentativas(
+                    lambda: self.repo.update_file(self.caminho, mensagem, conteudo, self.sha_remoto))
+            except GithubException as e:
+                if e.status not in (409, 422):
+                    raise
+                # O remoto mudou desde o último envio: atualiza o SHA e tenta de novo
+                self.etag = None
+                self._com_retentativas(self._consultar_remoto)
+                resultado = self._com_retentativas(
+                    lambda: self.repo.update_file(self.caminho, mensagem, conteudo, self.sha_remoto))
+            self.sha_remoto = resultado["content"].sha
+            self.etag = None
+            return True
+
+    # API Git Data: partes e commits com vários arquivos
+
+    @property
+    def diretorio_partes(self):
+        """Diretório das partes no repositório, ao lado do arquivo configurado (ordens.csv -> ordens_partes)"""
+        return f"{os.path.splitext(self.caminho)[0]}_partes"
+
+    def _api(self, metodo, caminho, corpo=None):
+        """Requisição à API do repositório (caminho relativo a /repos/<repo>), com retentativas"""
+        return self._com_retentativas(lambda: self._http.requisitar(metodo, caminho, corpo=corpo))[1]
+
+    def commit_atual(self):
+        """SHA do último commit do ramo padrão"""
+        return self._api("GET", f"/git/ref/heads/{quote(self.repo.default_branch)}")["object"]["sha"]
+
+    def listar_partes(self, commit):
+        """{nome: SHA} das partes no commit ({} se o diretório não existir), descendo a árvore só pelo caminho"""
+        arvore = self._api("GET", f"/git/commits/{commit}")["tree"]["sha"]
+        for componente in self.diretorio_partes.split("/"):
+            entradas = self._api("GET", f"/git/trees/{arvore}")["tree"]
+            arvore = next((entrada["sha"] for entrada in entradas
+                           if entrada["path"] == componente and entrada["type"] == "tree"), None)
+            if arvore is None:
+                return {}
+        return {entrada["path"]: entrada["sha"] for entrada in self._api("GET", f"/git/trees/{arvore}")["tree"]
+                if entrada["type"] == "blob"}
+
+    def baixar_parte(self, sha):
+        return base64.b64decode(self._api("GET", f"/git/blobs/{sha}")["content"])
+
+    @cronometrar("github.confirmar")
+    def confirmar(self, pai, partes, mensagem="Atualização automática do sistema de OS"):
+        """Grava as partes {nome: conteúdo} num único commit sobre pai e avança o ramo; retorna o commit
+
+        O ramo só avança se ainda estiver em pai: se outra instalação enviou antes, RemotoDivergente.
+        """
+        arvore_pai = self._api("GET", f"/git/commits/{pai}")["tree"]["sha"]
+        entradas = []
+        for nome, conteudo in sorted(partes.items()):
+            blob = self._api("POST", "/git/blobs", corpo={"content": base64.b64encode(conteudo).decode("ascii"),
+                                                          "encoding": "base64"})
+            entradas.append({"path": f"{self.diretorio_partes}/{nome}", "mode": "100644", "type": "blob",
+                             "sha": blob["sha"]})
+        arvore = self._api("POST", "/git/trees", corpo={"base_tree": arvore_pai, "tree": entradas})
+        commit = self._api("POST", "/git/commits", corpo={"message": mensagem, "tree": arvore["sha"],
+                                                          "parents": [pai]})
+        try:
+            self._api("PATCH", f"/git/refs/heads/{quote(self.repo.default_branch)}",
+                      corpo={"sha": commit["sha"], "force": False})
+        except GithubException as e:
+            if e.status not in (409, 422):
+                raise
+            raise RemotoDivergente(self.diretorio_partes)
+        return commit["sha"]
+
+_clientes = {}
+_lock_clientes = threading.Lock()
+
+def obter_cliente(configuracao):
+    """Cliente do GitHub compartilhado pelo processo para a configuração informada"""
+    chave = (configuracao['github_token'], configuracao['github_repo'],
+             configuracao['github_filepath'], configuracao.get('github_api_url'))
+    with _lock_clientes:
+        if chave not in _clientes:
+            _clientes[chave] = ClienteGitHub(configuracao)
+        return _clientes[chave]
+
+def enviar_arquivo_github(configuracao, arquivo_local):
+    """Envia o arquivo local para o GitHub, criando-o no repositório se ainda não existir"""
+    return obter_cliente(configuracao).enviar(arquivo_local)
+
+TENTATIVAS_MESCLAGEM = 4  # Rodadas de mesclagem e envio antes de desistir até a próxima sincronização
+
+class ReplicaGitHub:
+    """Base da mesclagem com o GitHub: as partes como estavam no último commit sincronizado
+
+    Em diretorio ficam o conteúdo de cada parte, num arquivo nomeado pelo SHA, e o estado.json com o
+    commit e o SHA de cada parte; o estado só aponta para arquivos já gravados, de modo que uma
+    interrupção no meio deixa a base anterior válida.
+    """
+
+    def __init__(self, diretorio):
+        self.diretorio = diretorio
+        self.arquivo_estado = os.path.join(diretorio, "estado.json")
+        os.makedirs(diretorio, exist_ok=True)
+        # Processos que sincronizam o mesmo diretório de dados se revezam
+        self.trava = TravaArquivo(os.path.join(diretorio, "estado.lock"))
+
+    @staticmethod
+    def _origem(cliente):
+        return f"{cliente.configuracao['github_repo']}/{cliente.diretorio_partes}"
+
+    def estado(self, cliente):
+        """(commit, {parte: SHA}) da última sincronização com o repositório do cliente; (None, {}) se não houver"""
+        if not os.path.exists(self.arquivo_estado):
+            return None, {}
+        with open(self.arquivo_estado) as f:
+            estado = json.load(f)
+        if estado.get("origem") != self._origem(cliente):
+            return None, {}
+        return estado["commit"], estado["partes"]
+
+    def parte(self, sha):
+        with open(os.path.join(self.diretorio, sha), "rb") as f:
+            return f.read()
+
+    def _gravar(self, cliente, commit, shas, conteudos):
+        """Grava as partes novas, depois o estado, e apaga as partes que deixaram de ser a base"""
+        for nome, conteudo in conteudos.items():
+            caminho = os.path.join(self.diretorio, shas[nome])
+            if not os.path.exists(caminho):
+                temporario = caminho_temporario(caminho)
+                with open(temporario, "wb") as f:
+                    f.write(conteudo)
+                os.replace(temporario, caminho)
+        temporario = caminho_temporario(self.arquivo_estado)
+        with open(temporario, "w") as f:
+            json.dump({"origem": self._origem(cliente), "commit": commit, "partes": shas}, f)
+        os.replace(temporario, self.arquivo_estado)
+        vigentes = set(shas.values())
+        for nome in os.listdir(self.diretorio):
+            if len(nome) == 40 and nome not in vigentes:
+                os.remove(os.path.join(self.diretorio, nome))
+
+    @cronometrar("github.sincronizar")
+    def enviar(self, cliente, arquivo_local, preparar=None, aplicar=None):
+        """Envia num único commit as partes do arquivo local alteradas desde a última sincronização
+
+        Se o ramo andou, as partes alteradas no GitHub são baixadas e mescladas; aplicar(alteracoes)
+        grava nos dados locais as OS mescladas (mesclagem.mesclar) e retorna False se alguma delas mudou
+        aqui nesse meio tempo, e preparar() regrava o arquivo local antes da rodada seguinte. Retorna
+        (commit criado ou None se o GitHub já tinha o conteúdo local, OS com conflito nas mesclagens aplicadas).
+        """
+        with cliente.lock, self.trava:
+            commit, shas = self.estado(cliente)
+            locais = None
+            conflitos = 0
+            for _ in range(TENTATIVAS_MESCLAGEM):
+                if locais is None:
+                    locais = dividir_em_partes(arquivo_local)
+                atual = cliente.commit_atual()
+                if atual != commit:
+                    remotas = cliente.listar_partes(atual)
+                    alteradas = {nome: sha for nome, sha in remotas.items() if shas.get(nome) != sha}
+                    conteudos = {nome: cliente.baixar_parte(sha) for nome, sha in alteradas.items()}
+                    if commit is None and not remotas:
+                        # Repositório ainda no arquivo único: o conteúdo dele entra na mesclagem como remoto
+                        conteudos = self._arquivo_antigo(cliente, arquivo_local)
+                    base = ({nome: self.parte(shas[nome]) for nome in alteradas if nome in shas}
+                            if commit is not None else None)
+                    alteracoes, conflitos_rodada = mesclar_partes(base, locais, conteudos)
+                    aplicadas = not alteracoes or (aplicar is not None and aplicar(alteracoes))
+                    if alteracoes:
+                        # Os dados locais mudaram: o arquivo é regravado e relido na rodada seguinte
+                        locais = None
+                        if preparar:
+                            preparar()
+                    if not aplicadas:
+                        continue  # A base não avança: a mesclagem é refeita sobre os dados relidos
+                    conflitos += conflitos_rodada
+                    self._gravar(cliente, atual, remotas, {nome: conteudos[nome] for nome in alteradas})
+                    commit, shas = atual, remotas
+                    if alteracoes:
+                        continue
+                novas = {nome: conteudo for nome, conteudo in locais.items() if sha_blob_git(conteudo) != shas.get(nome)}
+                if not novas:
+                    return None, conflitos
+                try:
+                    commit = cliente.confirmar(commit, novas)
+                except RemotoDivergente:
+                    continue
+                shas = {**shas, **{nome: sha_blob_git(conteudo) for nome, conteudo in novas.items()}}
+                self._gravar(cliente, commit, shas, novas)
+                return commit, conflitos
+            raise RuntimeError("As OS mudaram durante a mesclagem com o GitHub; nova tentativa na próxima sincronização")
+
+    def _arquivo_antigo(self, cliente, arquivo_local):
+        """Partes do arquivo único do GitHub (formato anterior às partes); {} se ele não existir"""
+        temporario = f"{arquivo_local}.download"
+        try:
+            cliente.etag = None
+            cliente.baixar(temporario)
+            return dividir_em_partes(temporario)
+        except ArquivoRemotoInexistente:
+            return {}
+        finally:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+
+    @cronometrar("github.baixar_partes")
+    def baixar(self, cliente, destino, arquivo_atual=None):
+        """Monta em destino o arquivo completo do GitHub; False (sem baixar) se nada mudou desde a última sincronização
+
+        Partes iguais às da base são lidas do disco. Um repositório sem partes cai no arquivo único,
+        e sem os dois, ArquivoRemotoInexistente.
+        """
+        with cliente.lock, self.trava:
+            commit, shas = self.estado(cliente)
+            atual = cliente.commit_atual()
+            if atual == commit and arquivo_atual and os.path.exists(arquivo_atual):
+                return False
+            remotas = cliente.listar_partes(atual)
+            if not remotas:
+                return cliente.baixar(destino, arquivo_atual=arquivo_atual)
+            conteudos = {nome: self.parte(sha) if shas.get(nome) == sha else cliente.baixar_parte(sha)
+                         for nome, sha in remotas.items()}
+            juntar_partes([conteudos[nome] for nome in sorted(conteudos)], destino)
+            self._gravar(cliente, atual, remotas, conteudos)
+            return True
+
+class Sincronizador:
+    """Fila de saída durável com envio agrupado, em segundo plano, para o GitHub
+
+    Vários processos do Streamlit compartilham o mesmo arquivo da fila: cada alteração relê o arquivo sob uma
+    trava entre processos e soma a sua parte ao que está gravado, e só um processo por vez faz o envio.
+    """
+
+    def __init__(self, arquivo_outbox, arquivo_local, arquivo_config, preparar=None,
+                 espera_gravacoes=5, espera_maxima=60, espera_erro=10, espera_erro_maxima=600,
+                 ler_configuracao=None, enviar=None):
+        self.arquivo_outbox = arquivo_outbox
+        self.arquivo_local = arquivo_local
+        self.arquivo_config = arquivo_config
+        # Configuração usada em cada envio; por padrão, o config.json como está em disco
+        self.ler_configuracao = ler_configuracao or (lambda: carregar_configuracao(self.arquivo_config))
+        self.preparar = preparar
+        # enviar(configuracao) faz o envio e retorna (commit, OS com conflito); por padrão, o arquivo local inteiro
+        self.enviar = enviar or (lambda configuracao: (enviar_arquivo_github(configuracao, self.arquivo_local), 0))
+        self.espera_gravacoes = espera_gravacoes
+        self.espera_maxima = espera_maxima
+        self.espera_erro = espera_erro
+        self.espera_erro_maxima = espera_erro_maxima
+        self.condicao = threading.Condition()
+        self.trava = TravaArquivo(f"{arquivo_outbox}.lock")
+        self.trava_envio = TravaArquivo(f"{arquivo_outbox}.envio.lock")
+        self.enviando = False
+        self._estado = {
+            "pendentes": 0,
+            "primeiro_pedido": None,
+            "ultimo_pedido": None,
+            "tentativas": 0,
+            "proxima_tentativa": None,
+            "ultimo_erro": None,
+            "ultima_sincronizacao": None,
+            "ultimos_conflitos": 0,  # OS com conflito no último envio
+            "conflitos": 0  # Total desde a criação da fila
+        }
+        self._carregar_outbox()
+        threading.Thread(target=self._executar, name="sincronizador-github", daemon=True).start()
+
+    def _carregar_outbox(self):
+        """Relê a fila gravada, que os outros processos também alteram (chamado com a condição adquirida)"""
+        if os.path.exists(self.arquivo_outbox):
+            with open(self.arquivo_outbox) as f:
+                self._estado.update(json.load(f))
+
+    def _gravar_outbox(self):
+        """Persiste a fila (chamado com a condição e a trava do arquivo adquiridas, depois de _carregar_outbox)"""
+        temporario = caminho_temporario(self.arquivo_outbox)
+        with open(temporario, "w") as f:
+            json.dump(self._estado, f)
+        os.replace(temporario, self.arquivo_outbox)
+
+    def agendar(self):
+        """Registra que os dados mudaram; o envio acontece depois, agrupado com os próximos pedidos"""
+        agora = time.time()
+        with self.condicao, self.trava:
+            self._carregar_outbox()
+            if not self._estado["pendentes"]:
+                self._estado["primeiro_pedido"] = agora
+            self._estado["pendentes"] += 1
+            self._estado["ultimo_pedido"] = agora
+            self._gravar_outbox()
+            self.condicao.notify()
+
+    def sincronizar_agora(self):
+        """Dispensa o debounce e a espera de nova tentativa para o próximo envio"""
+        with self.condicao, self.trava:
+            self._carregar_outbox()
+            if not self._estado["pendentes"]:
+                self._estado["pendentes"] = 1
+                self._estado["primeiro_pedido"] = time.time()
+            self._estado["ultimo_pedido"] = 0
+            self._estado["proxima_tentativa"] = None
+            self._gravar_outbox()
+            self.condicao.notify()
+
+    def status(self):
+        """Cópia do estado da fila, para exibição"""
+        with self.condicao:
+            self._carregar_outbox()
+            return {**self._estado, "enviando": self.enviando}
+
+    def _tempo_para_envio(self, agora):
+        """Segundos até o próximo envio (0 = enviar já), respeitando debounce, espera máxima e backoff"""
+        estado = self._estado
+        momento = min(estado["ultimo_pedido"] + self.espera_gravacoes, estado["primeiro_pedido"] + self.espera_maxima)
+        if estado["proxima_tentativa"]:
+            momento = max(momento, estado["proxima_tentativa"])
+        return max(0, momento - agora)
+
+    def _enviar(self):
+        configuracao = self.ler_configuracao()
+        if not github_configurado(configuracao):
+            raise RuntimeError("Sincronização com GitHub não configurada")
+        if self.preparar:
+            self.preparar()
+        _, conflitos = self.enviar(configuracao)
+        return conflitos
+
+    def _executar(self):
+        while True:
+            with self.condicao:
+                self._carregar_outbox()
+                while not self._estado["pendentes"]:
+                    self.condicao.wait()
+                    self._carregar_outbox()
+                espera = self._tempo_para_envio(time.time())
+                if espera > 0:
+                    self.condicao.wait(espera)
+                    continue
+
+            with self.trava_envio:
+                with self.condicao:
+                    # Outro processo pode ter feito o envio enquanto esta thread esperava a vez
+                    self._carregar_outbox()
+                    if not self._estado["pendentes"] or self._tempo_para_envio(time.time()) > 0:
+                        continue
+                    pedidos = self._estado["pendentes"]
+                    self.enviando = True
+
+                conflitos, erro = 0, None
+                try:
+                    conflitos = self._enviar()
+                except Exception as e:
+                    erro = str(e)
+                self._registrar_envio(pedidos, conflitos, erro)
+
+    def _registrar_envio(self, pedidos, conflitos, erro):
+        """Desconta da fila gravada os pedidos enviados (ou agenda a nova tentativa), somando aos demais processos"""
+        with self.condicao, self.trava:
+            self._carregar_outbox()
+            self.enviando = False
+            if erro is None:
+                # Pedidos feitos durante o envio continuam pendentes para a próxima rodada
+                self._estado["pendentes"] = max(0, self._estado["pendentes"] - pedidos)
+                if self._estado["pendentes"]:
+                    self._estado["primeiro_pedido"] = time.time()
+                self._estado["tentativas"] = 0
+                self._estado["proxima_tentativa"] = None
+                self._estado["ultimo_erro"] = None
+                self._estado["ultima_sincronizacao"] = time.time()
+                self._estado["ultimos_conflitos"] = conflitos
+                self._estado["conflitos"] += conflitos
+            else:
+                self._estado["tentativas"] += 1
+                espera_erro = min(self.espera_erro * 2 ** (self._estado["tentativas"] - 1), self.espera_erro_maxima)
+                self._estado["proxima_tentativa"] = time.time() + espera_erro
+                self._estado["ultimo_erro"] = erro
+            self._gravar_outbox()
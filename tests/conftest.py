@@ -0,0 +1,42 @@
+"""Os módulos do aplicativo ficam na raiz do repositório"""
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fake_github  # noqa: E402
+
+
+@pytest.fixture
+def github():
+    """(repositório falso, configuração do GitHub apontada para ele)"""
+    repositorio, base, servidor = fake_github.iniciar()
+    configuracao = {"github_repo": "empresa/os", "github_filepath": "dados/ordens.csv", "github_token": "teste",
+                    "github_api_url": base}
+    yield repositorio, configuracao
+    servidor.shutdown()
+    servidor.server_close()
+
+
+@pytest.fixture
+def instalacao(tmp_path, github):
+    """Cria instalações (diretórios de dados com config.json) sincronizadas com o repositório falso"""
+    from servico import ServicoOS
+
+    _, configuracao = github
+
+    def criar(nome, ordens=None, tipo="csv"):
+        diretorio = tmp_path / nome
+        diretorio.mkdir()
+        with open(diretorio / "config.json", "w") as f:
+            json.dump({**configuracao, "armazenamento": tipo}, f)
+        if ordens is not None:
+            ordens.to_csv(diretorio / "ordens_servico4.0.csv", index=False)
+        servico = ServicoOS(str(diretorio), tipo)
+        servico.inicializar_arquivos()
+        return servico
+    return criar
@@ -0,0 +1,210 @@
+"""Servidor local que imita as APIs de conteúdos e Git Data do GitHub, para os testes de sincronização
+
+O cliente é apontado para ele por "github_api_url" na configuração. As requisições recebidas ficam em
+requisicoes ((método, caminho)) e os status devolvidos em respostas, para os testes verificarem o que foi
+ou não enviado.
+"""
+import base64
+import hashlib
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+
+class RepositorioFalso:
+    """Objetos do Git (blobs, árvores e commits) e o ramo main de um repositório"""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.blobs, self.arvores, self.commits = {}, {}, {}
+        self.requisicoes, self.respostas = [], []
+        # Status (ou (status, cabeçalhos)) devolvidos, um por requisição, antes de atender normalmente
+        self.falhas = []
+        self.antes_do_avanco = []  # Funções chamadas (uma por avanço do ramo) antes de avançá-lo: outra instalação no meio
+        self.ramo = self._commit(self._arvore([]), [], "inicial")
+
+    def _blob(self, dados):
+        sha = hashlib.sha1(b"blob %d\0" % len(dados) + dados).hexdigest()
+        self.blobs[sha] = dados
+        return sha
+
+    def _arvore(self, entradas):
+        entradas = sorted(entradas, key=lambda entrada: entrada["path"])
+        sha = hashlib.sha1(json.dumps(entradas).encode()).hexdigest()
+        self.arvores[sha] = entradas
+        return sha
+
+    def _commit(self, arvore, pais, mensagem):
+        sha = hashlib.sha1(json.dumps([arvore, pais, mensagem, len(self.commits)]).encode()).hexdigest()
+        self.commits[sha] = {"tree": arvore, "parents": pais, "message": mensagem}
+        return sha
+
+    def _achatar(self, arvore, prefixo=""):
+        arquivos = {}
+        for entrada in self.arvores[arvore]:
+            caminho = prefixo + entrada["path"]
+            if entrada["type"] == "tree":
+                arquivos.update(self._achatar(entrada["sha"], caminho + "/"))
+            else:
+                arquivos[caminho] = entrada["sha"]
+        return arquivos
+
+    def _montar(self, arquivos):
+        filhos, entradas = {}, []
+        for caminho, sha in arquivos.items():
+            if "/" in caminho:
+                diretorio, resto = caminho.split("/", 1)
+                filhos.setdefault(diretorio, {})[resto] = sha
+            else:
+                entradas.append({"path": caminho, "mode": "100644", "type": "blob", "sha": sha})
+        for diretorio, conteudo in filhos.items():
+            entradas.append({"path": diretorio, "mode": "040000", "type": "tree", "sha": self._montar(conteudo)})
+        return self._arvore(entradas)
+
+    def arquivos(self):
+        """{caminho: conteúdo} do último commit do ramo"""
+        with self.lock:
+            return {caminho: self.blobs[sha] for caminho, sha in self._achatar(self.commits[self.ramo]["tree"]).items()}
+
+    def gravar(self, arquivos, mensagem="outra instalação"):
+        """Commit direto no ramo, como faria outra instalação; arquivos {caminho: conteúdo}"""
+        with self.lock:
+            atuais = self._achatar(self.commits[self.ramo]["tree"])
+            atuais.update({caminho: self._blob(dados) for caminho, dados in arquivos.items()})
+            self.ramo = self._commit(self._montar(atuais), [self.ramo], mensagem)
+
+    def _descende(self, commit, ancestral):
+        pendentes = [commit]
+        while pendentes:
+            atual = pendentes.pop()
+            if atual == ancestral:
+                return True
+            pendentes.extend(self.commits[atual]["parents"])
+        return False
+
+
+def _tratador(repositorio, base):
+    class Tratador(BaseHTTPRequestHandler):
+        def log_message(self, *argumentos):
+            pass
+
+        def _responder(self, status, corpo=None, cabecalhos=None):
+            dados = json.dumps(corpo).encode() if corpo is not None else b""
+            repositorio.respostas.append(status)
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            for nome, valor in (cabecalhos or {}).items():
+                self.send_header(nome, valor)
+            self.send_header("Content-Length", str(len(dados)))
+            self.end_headers()
+            self.wfile.write(dados)
+
+        def _corpo(self):
+            tamanho = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(tamanho)) if tamanho else {}
+
+        def _atender(self, metodo):
+            caminho = self.path.split("?")[0]
+            repositorio.requisicoes.append((metodo, caminho))
+            if repositorio.falhas:
+                falha = repositorio.falhas.pop(0)
+                status, cabecalhos = falha if isinstance(falha, tuple) else (falha, None)
+                return self._responder(status, {"message": "falha simulada"}, cabecalhos)
+            encontrado = re.match(r"^/repos/([^/]+)/([^/]+)(.*)$", caminho)
+            if not encontrado:
+                return self._responder(404, {"message": "Not Found"})
+            dono, nome, resto = encontrado.groups()
+            url = f"{base}/repos/{dono}/{nome}"
+            with repositorio.lock:
+                if resto == "" and metodo == "GET":
+                    return self._responder(200, {"url": url, "name": nome, "full_name": f"{dono}/{nome}",
+                                                 "default_branch": "main"})
+                if resto.startswith("/contents/"):
+                    return self._conteudos(metodo, unquote(resto[len("/contents/"):]), url)
+                if resto == "/git/ref/heads/main" and metodo == "GET":
+                    return self._responder(200, {"ref": "refs/heads/main", "object": {"sha": repositorio.ramo,
+                                                                                       "type": "commit"}})
+                if resto == "/git/refs/heads/main" and metodo == "PATCH":
+                    corpo = self._corpo()
+                    if repositorio.antes_do_avanco:
+                        repositorio.antes_do_avanco.pop(0)()
+                    if not repositorio._descende(corpo["sha"], repositorio.ramo) and not corpo.get("force"):
+                        return self._responder(422, {"message": "Update is not a fast forward"})
+                    repositorio.ramo = corpo["sha"]
+                    return self._responder(200, {"ref": "refs/heads/main", "object": {"sha": corpo["sha"]}})
+                objeto = re.match(r"^/git/(commits|trees|blobs)/([0-9a-f]+)$", resto)
+                if objeto and metodo == "GET":
+                    tipo, sha = objeto.groups()
+                    if tipo == "commits":
+                        commit = repositorio.commits[sha]
+                        return self._responder(200, {"sha": sha, "tree": {"sha": commit["tree"]},
+                                                     "parents": [{"sha": pai} for pai in commit["parents"]]})
+                    if tipo == "trees":
+                        return self._responder(200, {"sha": sha, "tree": repositorio.arvores[sha], "truncated": False})
+                    return self._responder(200, {"sha": sha, "encoding": "base64", "size": len(repositorio.blobs[sha]),
+                                                 "content": base64.b64encode(repositorio.blobs[sha]).decode()})
+                if resto == "/git/blobs" and metodo == "POST":
+                    return self._responder(201, {"sha": repositorio._blob(base64.b64decode(self._corpo()["content"]))})
+                if resto == "/git/trees" and metodo == "POST":
+                    corpo = self._corpo()
+                    arquivos = repositorio._achatar(corpo["base_tree"]) if corpo.get("base_tree") else {}
+                    arquivos.update({entrada["path"]: entrada["sha"] for entrada in corpo["tree"]})
+                    return self._responder(201, {"sha": repositorio._montar(arquivos)})
+                if resto == "/git/commits" and metodo == "POST":
+                    corpo = self._corpo()
+                    return self._responder(201, {"sha": repositorio._commit(corpo["tree"], corpo["parents"],
+                                                                            corpo["message"])})
+            return self._responder(404, {"message": f"Not Found {metodo} {resto}"})
+
+        def _conteudos(self, metodo, caminho, url):
+            arquivos = repositorio._achatar(repositorio.commits[repositorio.ramo]["tree"])
+            if metodo == "GET":
+                if caminho not in arquivos:
+                    return self._responder(404, {"message": "Not Found"})
+                sha = arquivos[caminho]
+                if self.headers.get("If-None-Match") == f'"{sha}"':
+                    return self._responder(304)
+                dados = repositorio.blobs[sha]
+                return self._responder(200, {"type": "file", "path": caminho, "name": caminho.split("/")[-1],
+                                             "sha": sha, "encoding": "base64", "size": len(dados),
+                                             "content": base64.b64encode(dados).decode(),
+                                             "url": f"{url}/contents/{caminho}"}, {"ETag": f'"{sha}"'})
+            if metodo == "PUT":
+                corpo = self._corpo()
+                if (caminho in arquivos and corpo.get("sha") != arquivos[caminho]) or (
+                        caminho not in arquivos and corpo.get("sha")):
+                    return self._responder(409, {"message": "sha mismatch"})
+                arquivos[caminho] = repositorio._blob(base64.b64decode(corpo["content"]))
+                repositorio.ramo = repositorio._commit(repositorio._montar(arquivos), [repositorio.ramo],
+                                                       corpo.get("message", ""))
+                return self._responder(201, {"content": {"sha": arquivos[caminho], "path": caminho,
+                                                         "name": caminho.split("/")[-1], "type": "file",
+                                                         "url": f"{url}/contents/{caminho}"},
+                                             "commit": {"sha": repositorio.ramo}})
+            return self._responder(405, {"message": "Method Not Allowed"})
+
+        def do_GET(self):
+            self._atender("GET")
+
+        def do_POST(self):
+            self._atender("POST")
+
+        def do_PUT(self):
+            self._atender("PUT")
+
+        def do_PATCH(self):
+            self._atender("PATCH")
+
+    return Tratador
+
+
+def iniciar():
+    """Inicia o servidor numa thread; retorna (repositório, URL base da API, servidor)"""
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), None)
+    base = f"http://127.0.0.1:{servidor.server_address[1]}"
+    repositorio = RepositorioFalso()
+    servidor.RequestHandlerClass = _tratador(repositorio, base)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return repositorio, base, servidor
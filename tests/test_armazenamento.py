@@ -0,0 +1,78 @@
+import threading
+
+import pandas as pd
+import pytest
+
+from armazenamento import ArmazenamentoCSV, ArmazenamentoSQLite, identidade_arquivo, ler_colunar, ler_csv
+from benchmark import gerar_ordens
+
+
+def criar_csv(tmp_path, quantidade, **colunas):
+    arquivo = str(tmp_path / "ordens.csv")
+    gerar_ordens(quantidade).assign(**colunas).to_csv(arquivo, index=False)
+    return arquivo
+
+
+def test_copia_colunar_igual_ao_csv(tmp_path):
+    arquivo = criar_csv(tmp_path, 500, **{"Observações": ""})
+    ArmazenamentoCSV(arquivo, f"{arquivo}.journal").carregar()
+    df = ler_colunar(f"{arquivo}.arrow", identidade_arquivo(arquivo))
+    assert df is not None
+    pd.testing.assert_frame_equal(df, ler_csv(arquivo))
+    assert df["Observações"].iloc[0] is pd.NA
+
+
+def test_copia_colunar_de_outra_versao_ignorada(tmp_path):
+    arquivo = criar_csv(tmp_path, 50)
+    armazenamento = ArmazenamentoCSV(arquivo, f"{arquivo}.journal")
+    identidade = identidade_arquivo(arquivo)
+    armazenamento.carregar()
+    armazenamento.inserir(None, {"Descrição": "nova"})
+    armazenamento.compactar()
+    assert ler_colunar(f"{arquivo}.arrow", identidade) is None
+    novo = ArmazenamentoCSV(arquivo, f"{arquivo}.journal")
+    assert novo.obter(51)["Descrição"] == "nova"
+
+
+def test_alteracoes_apos_leitura_da_copia_colunar(tmp_path):
+    arquivo = criar_csv(tmp_path, 50)
+    ArmazenamentoCSV(arquivo, f"{arquivo}.journal").carregar()
+    armazenamento = ArmazenamentoCSV(arquivo, f"{arquivo}.journal")
+    armazenamento.atualizar(5, {"Status": "Concluído", "Data Conclusão": "01/05/2024", "Urgente": "Sim",
+                                "Observações": "ok", "Descrição": "outra"})
+    registro = armazenamento.obter(5)
+    assert registro["Status"] == "Concluído" and registro["Observações"] == "ok"
+    assert registro["Data Conclusão"] == pd.Timestamp("2024-05-01") and registro["Urgente"]
+
+
+def test_leitura_e_inclusao_simultaneas_sem_travamento(tmp_path):
+    # A leitura que publica a cópia colunar não pode esperar a trava de quem inclui (que espera a leitura)
+    arquivo = criar_csv(tmp_path, 100000)
+    armazenamento = ArmazenamentoCSV(arquivo, f"{arquivo}.journal")
+    leitura = threading.Thread(target=armazenamento.carregar, daemon=True)
+    inclusoes = threading.Thread(target=lambda: [armazenamento.inserir(None, {"Descrição": "x"}) for _ in range(5)], daemon=True)
+    leitura.start()
+    inclusoes.start()
+    leitura.join(30)
+    inclusoes.join(30)
+    assert not leitura.is_alive() and not inclusoes.is_alive()
+    assert armazenamento.contar() == 100005
+
+
+@pytest.mark.parametrize("tipo", ["csv", "sqlite"])
+def test_tabela_entregue_nao_muda_com_alteracoes_seguintes(tmp_path, tipo):
+    arquivo = criar_csv(tmp_path, 50)
+    if tipo == "csv":
+        armazenamento = ArmazenamentoCSV(arquivo, f"{arquivo}.journal")
+    else:
+        armazenamento = ArmazenamentoSQLite(str(tmp_path / "ordens.db"), arquivo)
+        armazenamento.importar(ler_csv(arquivo))
+    antes = armazenamento.carregar()
+    copia = antes.copy()
+    for os_id in (5, 6):  # A segunda alteração já grava na coluna copiada
+        armazenamento.atualizar(os_id, {"Status": "Cancelado", "Observações": "alterada", "Data": "01/02/2024",
+                                        "Urgente": "Sim", "Solicitante": "Outra pessoa"})
+    assert armazenamento.obter(6)["Status"] == "Cancelado"  # O CSV aplica o journal na leitura
+    pd.testing.assert_frame_equal(antes, copia)
+    depois = armazenamento.carregar()
+    assert depois.set_index("ID").loc[[5, 6], "Observações"].tolist() == ["alterada", "alterada"]
@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta, timezone
+
+import servico as modulo_servico
+from backups import RepositorioBackups
+from benchmark import gerar_ordens
+from servico import ServicoOS
+
+INICIO = datetime(2025, 3, 10, 8, 0)
+
+
+def gravar_versao(arquivo, ordens, versao):
+    ordens.loc[0, "Observações"] = f"versão {versao}"
+    ordens.to_csv(arquivo, index=False)
+
+
+def test_retencao_nunca_apaga_a_base_de_um_delta(tmp_path):
+    repositorio = RepositorioBackups(str(tmp_path / "backups"))
+    arquivo = tmp_path / "ordens.csv"
+    ordens = gerar_ordens(500)
+    for versao in range(4):  # Um completo e três deltas na mesma hora
+        gravar_versao(arquivo, ordens, versao)
+        repositorio.criar(str(arquivo), momento=INICIO + timedelta(minutes=10 * versao), aplicar_retencao=False)
+    tipos = [entrada["tipo"] for entrada in repositorio.listar()]
+    assert tipos == ["delta", "delta", "delta", "completo"]
+
+    # Só o mais recente da hora fica no manifesto; o completo sai, mas o objeto dele é a base do delta mantido
+    assert repositorio.aplicar_retencao(agora=INICIO + timedelta(hours=1)) == 3
+    mantido, = repositorio.listar()
+    assert mantido["tipo"] == "delta"
+    assert (tmp_path / "backups" / mantido["base"]).exists()
+    assert repositorio.conteudo(mantido["nome"]) == arquivo.read_bytes()
+
+    # Nem quando o delta envelhece até a janela mensal
+    repositorio.aplicar_retencao(agora=INICIO + timedelta(days=90))
+    assert repositorio.conteudo(mantido["nome"]) == arquivo.read_bytes()
+
+
+def test_backup_usa_o_horario_local_do_sistema(tmp_path, monkeypatch):
+    monkeypatch.setattr(modulo_servico, "agora_local", lambda: datetime(2030, 1, 2, 3, 4, 5))
+    gerar_ordens(10).to_csv(tmp_path / "ordens_servico4.0.csv", index=False)
+    servico = ServicoOS(str(tmp_path), "csv")
+    servico.inicializar_arquivos()
+    entrada, criado = servico.fazer_backup()
+    assert criado
+    assert entrada["criado_em"] == "2030-01-02T03:04:05"
+    assert entrada["nome"] == "ordens_servico_20300102_030405"
+
+
+def test_agora_local_e_utc_menos_tres_sem_fuso():
+    antes = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(hours=3)
+    agora = modulo_servico.agora_local()
+    assert agora.tzinfo is None
+    assert timedelta(0) <= agora - antes < timedelta(seconds=5)
@@ -0,0 +1,10 @@
+from benchmark import ARMAZENAMENTOS, CENARIOS, executar
+
+
+def test_todos_os_cenarios_rodam_na_menor_tabela():
+    # Com 1000 OS a fila de despacho tem menos OS que OPERACOES_POR_RODADA; a segunda repetição refaz a fila
+    documento = executar([1000], ARMAZENAMENTOS, list(CENARIOS), repeticoes=2, memoria=False)
+    medidos = {(r["armazenamento"], r["cenario"]): r for r in documento["resultados"]}
+    for armazenamento in ARMAZENAMENTOS:
+        for cenario in CENARIOS:
+            assert len(medidos[armazenamento, cenario]["tempos"]) == 2
@@ -0,0 +1,98 @@
+import time
+import warnings
+
+import pytest
+
+from sincronizacao import ClienteGitHub
+
+CONTEUDO = "ID,Descrição\n1,teste\n".encode()
+
+
+@pytest.fixture
+def cliente(github):
+    repositorio, configuracao = github
+    repositorio.gravar({"dados/ordens.csv": CONTEUDO})
+    return ClienteGitHub(configuracao)
+
+
+def test_baixar_nao_traz_o_corpo_quando_nada_mudou(github, cliente, tmp_path):
+    repositorio, _ = github
+    destino = tmp_path / "ordens.csv"
+    assert cliente.baixar(str(destino))
+    assert destino.read_bytes() == CONTEUDO
+    destino.unlink()
+    repositorio.requisicoes.clear()
+    repositorio.respostas.clear()
+
+    assert not cliente.baixar(str(destino))
+    assert repositorio.requisicoes == [("GET", "/repos/empresa/os/contents/dados/ordens.csv")]
+    assert repositorio.respostas == [304]
+    assert not destino.exists()
+
+    repositorio.gravar({"dados/ordens.csv": CONTEUDO + b"2,outra\n"})
+    assert cliente.baixar(str(destino))
+    assert destino.read_bytes() == CONTEUDO + b"2,outra\n"
+
+
+def test_enviar_sem_mudanca_nao_faz_put(github, cliente, tmp_path):
+    repositorio, configuracao = github
+    local = tmp_path / "ordens.csv"
+    local.write_bytes(CONTEUDO)
+    assert not cliente.enviar(str(local))
+    # Cliente novo (sem o SHA do remoto): consulta o remoto, mas também não envia
+    assert not ClienteGitHub(configuracao).enviar(str(local))
+    assert [metodo for metodo, _ in repositorio.requisicoes].count("PUT") == 0
+
+    local.write_bytes(CONTEUDO + b"2,outra\n")
+    assert cliente.enviar(str(local))
+    assert not cliente.enviar(str(local))
+    assert [metodo for metodo, _ in repositorio.requisicoes].count("PUT") == 1
+    assert repositorio.arquivos()["dados/ordens.csv"] == CONTEUDO + b"2,outra\n"
+
+
+def test_enviar_com_remoto_alterado_reconsulta_o_sha(github, cliente, tmp_path):
+    repositorio, _ = github
+    local = tmp_path / "ordens.csv"
+    local.write_bytes(CONTEUDO)
+    cliente.enviar(str(local))
+    repositorio.gravar({"dados/ordens.csv": b"de outra instalacao\n"})
+    local.write_bytes(CONTEUDO + b"2,outra\n")
+    assert cliente.enviar(str(local))
+    assert repositorio.respostas.count(409) == 1
+    assert repositorio.arquivos()["dados/ordens.csv"] == CONTEUDO + b"2,outra\n"
+
+
+def test_falhas_temporarias_sao_repetidas(github, cliente, tmp_path):
+    repositorio, _ = github
+    repositorio.falhas.extend([(502, {"Retry-After": "0"}), (503, {"Retry-After": "0"})])
+    destino = tmp_path / "ordens.csv"
+    assert cliente.baixar(str(destino))
+    assert destino.read_bytes() == CONTEUDO
+    assert repositorio.respostas == [502, 503, 200]  # O arquivo, após as falhas
+
+
+def test_falhas_definitivas_nao_sao_repetidas(github, cliente, tmp_path):
+    from github import GithubException
+
+    repositorio, _ = github
+    repositorio.falhas.append(401)
+    with pytest.raises(GithubException):
+        cliente.baixar(str(tmp_path / "ordens.csv"))
+    assert repositorio.respostas == [401]
+
+
+def test_limite_esgotado_por_muito_tempo_fica_para_a_fila(github, cliente, tmp_path):
+    repositorio, _ = github
+    repositorio.falhas.append((403, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(int(time.time()) + 3600)}))
+    inicio = time.time()
+    with pytest.raises(RuntimeError, match="Limite de requisições"):
+        cliente.baixar(str(tmp_path / "ordens.csv"))
+    assert time.time() - inicio < 5
+    assert repositorio.respostas == [403]
+
+
+def test_cliente_sem_apis_obsoletas(github):
+    _, configuracao = github
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", DeprecationWarning)
+        ClienteGitHub(configuracao).validar()
@@ -0,0 +1,69 @@
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+from armazenamento import COLUNAS_DATAS, COLUNAS_OS, converter_datas, texto_para_gravacao
+from servico import ServicoOS
+
+ARQUIVO_REAL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ordens_servico4.0.csv")
+
+
+def texto_exportado(servico):
+    lotes = [texto_para_gravacao(lote)[COLUNAS_OS].astype(object) for lote in servico.exportar_lotes() if len(lote)]
+    texto = pd.concat(lotes)
+    return texto.where(texto.notna(), "").astype(str).set_index(texto["ID"].astype(int))
+
+
+@pytest.mark.parametrize("tipo", ["csv", "sqlite", "particionado"])
+def test_datas_do_arquivo_real_sobrevivem_a_compactacao(tmp_path, tipo):
+    shutil.copy(ARQUIVO_REAL, tmp_path)
+    original = pd.read_csv(ARQUIVO_REAL, dtype=str, keep_default_na=False).set_index("ID")
+    original.index = original.index.astype(int)
+
+    servico = ServicoOS(str(tmp_path), tipo)
+    servico.inicializar_arquivos()
+    servico.atualizar(90, {"Observações": "editada"})
+    servico.armazenamento.atualizar(92, {"Data": "20/07/2024"})
+    if tipo == "particionado":
+        servico.armazenamento.compactar(arquivar_todas=True)
+    else:
+        servico.armazenamento.compactar()
+
+    gravado = texto_exportado(ServicoOS(str(tmp_path), tipo))
+    assert gravado.loc[92, "Data"] == "20/07/2024"
+    assert gravado.loc[90, "Observações"] == "editada"
+    for coluna in COLUNAS_DATAS:
+        antes = original[coluna].drop(92).str.strip()
+        depois = gravado.loc[antes.index, coluna]
+        # A mesma data (dd/mm/aa vira dd/mm/aaaa) ou, se ela não é legível, o mesmo texto
+        datas_antes = converter_datas(antes)
+        legiveis = datas_antes.notna()
+        assert (converter_datas(depois[legiveis]) == datas_antes[legiveis]).all()
+        assert (depois[~legiveis] == antes[~legiveis].replace("nan", "")).all()
+    assert gravado.loc[[90, 91], "Data"].tolist() == ["19/7", "19/7"]
+
+
+def test_data_corrigida_ou_apagada_substitui_o_texto_original(tmp_path):
+    shutil.copy(ARQUIVO_REAL, tmp_path)
+    servico = ServicoOS(str(tmp_path), "csv")
+    servico.inicializar_arquivos()
+    servico.armazenamento.atualizar(90, {"Data": "19/07/2024"})
+    servico.armazenamento.atualizar(91, {"Data": ""})
+    servico.armazenamento.compactar()
+    gravado = texto_exportado(ServicoOS(str(tmp_path), "csv"))
+    assert gravado.loc[90, "Data"] == "19/07/2024"
+    assert gravado.loc[91, "Data"] == ""
+
+
+@pytest.mark.parametrize("tipo", ["csv", "sqlite", "particionado"])
+def test_busca_sem_resultado_tem_as_colunas_e_tipos_de_sempre(tmp_path, tipo):
+    shutil.copy(ARQUIVO_REAL, tmp_path)
+    servico = ServicoOS(str(tmp_path), tipo)
+    servico.inicializar_arquivos()
+    vazia, cheia = servico.linhas_por_id([]), servico.linhas_por_id([90])
+    assert vazia.empty
+    # As categorias vêm dos valores, então só o tipo de cada coluna precisa coincidir
+    assert [tipo.name for tipo in vazia.dtypes] == [tipo.name for tipo in cheia.dtypes]
+    assert list(vazia.columns) == list(cheia.columns)
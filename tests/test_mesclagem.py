@@ -0,0 +1,140 @@
+import time
+
+import pytest
+
+from benchmark import gerar_ordens
+from mesclagem import dividir_em_partes, mesclar, registro_em_texto
+
+CAMPOS_BASE = ("desc", "01/01/2025", "", "Ana", "Sala", "", "Pendente", "", "", "", "", "", "")
+
+
+def com(registro, **posicoes):
+    """Registro com os campos (pela posição) trocados"""
+    campos = list(registro)
+    for posicao, valor in posicoes.items():
+        campos[int(posicao[1:])] = valor
+    return tuple(campos)
+
+
+def test_mesclar_campos_diferentes_dos_dois_lados():
+    base = {1: CAMPOS_BASE}
+    local = {1: com(CAMPOS_BASE, c12="obs local")}
+    remoto = {1: com(CAMPOS_BASE, c6="Em execução")}
+    alteracoes, conflitos = mesclar(base, local, remoto)
+    assert conflitos == 0
+    assert alteracoes == [(1, local[1], com(CAMPOS_BASE, c6="Em execução", c12="obs local"), None)]
+
+
+def test_mesclar_mesmo_campo_fica_o_local():
+    base = {1: CAMPOS_BASE}
+    local = {1: com(CAMPOS_BASE, c12="local")}
+    remoto = {1: com(CAMPOS_BASE, c12="remoto", c6="Em execução")}
+    alteracoes, conflitos = mesclar(base, local, remoto)
+    assert conflitos == 1
+    assert alteracoes == [(1, local[1], com(CAMPOS_BASE, c12="local", c6="Em execução"), None)]
+
+
+def test_mesclar_mesmo_id_incluido_dos_dois_lados():
+    local = {1: CAMPOS_BASE, 2: com(CAMPOS_BASE, c0="nova local")}
+    remoto = {1: CAMPOS_BASE, 2: com(CAMPOS_BASE, c0="nova remota")}
+    alteracoes, conflitos = mesclar({1: CAMPOS_BASE}, local, remoto)
+    assert conflitos == 1
+    assert alteracoes == [(2, local[2], remoto[2], local[2])]
+    # Sem base (primeira sincronização), OS presentes dos dois lados são a mesma: vale a local
+    assert mesclar(None, local, remoto) == ([], 1)
+
+
+def test_mesclar_nunca_apaga():
+    assert mesclar({1: CAMPOS_BASE}, {}, {1: CAMPOS_BASE}) == ([(1, None, CAMPOS_BASE, None)], 0)
+    assert mesclar({1: CAMPOS_BASE, 2: CAMPOS_BASE}, {1: CAMPOS_BASE, 2: CAMPOS_BASE}, {1: CAMPOS_BASE}) == ([], 0)
+
+
+def enviar(servico):
+    servico.armazenamento.compactar()
+    return servico.enviar_ao_github()
+
+
+def campos(servico, os_id):
+    return dict(zip(("Descrição", "Status", "Executante1", "Observações"),
+                    (servico.obter(os_id)[coluna] for coluna in ("Descrição", "Status", "Executante1", "Observações"))))
+
+
+@pytest.fixture
+def duas_instalacoes(instalacao):
+    a = instalacao("a", gerar_ordens(300))
+    commit, conflitos = enviar(a)
+    assert commit is not None and conflitos == 0
+    b = instalacao("b")
+    assert b.contar() == 300
+    return a, b
+
+
+def test_envio_leva_so_as_partes_alteradas(github, duas_instalacoes):
+    repositorio, _ = github
+    a, _ = duas_instalacoes
+    assert enviar(a) == (None, 0)
+    repositorio.requisicoes.clear()
+    a.atualizar(5, {"Observações": "só esta"})
+    enviar(a)
+    assert sum(1 for metodo, caminho in repositorio.requisicoes if (metodo, caminho.split("/")[-1]) == ("POST", "blobs")) == 1
+
+
+def test_mesclagem_por_campo_entre_instalacoes(duas_instalacoes):
+    a, b = duas_instalacoes
+    a.atualizar(5, {"Observações": "obs de A"})
+    b.atualizar(5, {"Status": "Em execução", "Executante1": "Robson"})
+    enviar(a)
+    commit, conflitos = enviar(b)
+    assert commit is not None and conflitos == 0
+    enviar(a)
+    esperado = {"Descrição": a.obter(5)["Descrição"], "Status": "Em execução", "Executante1": "Robson",
+                "Observações": "obs de A"}
+    assert campos(a, 5) == campos(b, 5) == esperado
+
+
+def test_conflito_no_mesmo_campo_fica_o_local_e_aparece_no_status(duas_instalacoes):
+    a, b = duas_instalacoes
+    a.atualizar(7, {"Observações": "de A"})
+    b.atualizar(7, {"Observações": "de B"})
+    enviar(a)
+    b.sincronizador.sincronizar_agora()
+    limite = time.time() + 30
+    while not b.sincronizador.status()["ultima_sincronizacao"] and time.time() < limite:
+        time.sleep(0.05)
+    status = b.sincronizador.status()
+    assert status["ultimo_erro"] is None
+    assert status["ultimos_conflitos"] == 1 and status["conflitos"] == 1
+    assert b.obter(7)["Observações"] == "de B"
+    enviar(a)
+    assert a.obter(7)["Observações"] == "de B"
+
+
+def test_mesmo_id_incluido_nas_duas_instalacoes(duas_instalacoes):
+    a, b = duas_instalacoes
+    id_a = a.cadastrar("nova de A", "Ana", "Sala A")
+    id_b = b.cadastrar("nova de B", "Bia", "Sala B")
+    assert id_a == id_b == 301
+    enviar(a)
+    assert enviar(b)[1] == 1
+    enviar(a)
+    for servico in (a, b):
+        assert servico.contar() == 302
+        assert servico.obter(301)["Descrição"] == "nova de A"
+        assert servico.obter(302)["Descrição"] == "nova de B"
+
+
+def test_ramo_avancado_durante_o_envio(github, duas_instalacoes):
+    repositorio, _ = github
+    a, b = duas_instalacoes
+    b.atualizar(10, {"Status": "Em execução"})
+    b.armazenamento.compactar()
+    parte_b = dividir_em_partes(b.caminho("ordens_servico4.0.csv"))["0000000000.csv"]
+    a.atualizar(10, {"Observações": "de A"})
+    # Outra instalação envia entre a leitura do ramo por A e o avanço dele: o avanço é recusado
+    repositorio.antes_do_avanco.append(lambda: repositorio.gravar({"dados/ordens_partes/0000000000.csv": parte_b}))
+    commit, conflitos = enviar(a)
+    assert commit == repositorio.ramo and conflitos == 0
+    assert [metodo for metodo, _ in repositorio.requisicoes].count("PATCH") == 1 + 2  # O da fixture, o recusado e o aceito
+    assert campos(a, 10)["Status"] == "Em execução" and campos(a, 10)["Observações"] == "de A"
+    enviar(b)
+    assert registro_em_texto(a.obter(10)) == registro_em_texto(b.obter(10))
@@ -0,0 +1,43 @@
+import json
+
+import pytest
+
+from benchmark import gerar_ordens
+from sedes import ServicoSedes
+
+
+@pytest.fixture
+def sedes(tmp_path):
+    with open(tmp_path / "config.json", "w") as f:
+        json.dump({"sedes": {"Matriz": ["ADM"], "Filial": ["CD"]}}, f)
+    ordens = gerar_ordens(200)
+    ordens["Local"] = ["Sala ADM" if os_id % 3 else "Galpão CD" for os_id in ordens["ID"]]
+    ordens.to_csv(tmp_path / "ordens_servico4.0.csv", index=False)
+    servico = ServicoSedes(str(tmp_path))
+    servico.inicializar_arquivos()
+    return servico
+
+
+def test_localizar_vai_direto_a_sede_pelo_mapa(sedes, monkeypatch):
+    nova = sedes.cadastrar("nova", "Ana", "Galpão CD")
+    monkeypatch.setattr(sedes, "em_paralelo", lambda *argumentos: pytest.fail("procurou em todas as sedes"))
+    assert sedes._localizar(3) == "Filial"
+    assert sedes._localizar(4) == "Matriz"
+    assert sedes._localizar(nova) == "Filial"
+
+
+def test_os_fora_do_mapa_e_procurada_e_registrada(sedes):
+    # OS gravada direto na sede, sem passar pela numeração (ex.: vinda do GitHub)
+    sedes.servico("Matriz").armazenamento.inserir(5000, {"Descrição": "de fora", "Local": "Sala ADM"})
+    assert sedes.sequencia.mapa_ids.sede(5000) is None
+    assert sedes._localizar(5000) == "Matriz"
+    assert ServicoSedes(sedes.diretorio).sequencia.mapa_ids.sede(5000) == "Matriz"
+    assert sedes._localizar(999999) is None
+
+
+def test_pesquisar_intercala_as_sedes_pela_relevancia(sedes):
+    sedes.cadastrar("xilofone", "Ana", "Sala ADM")
+    forte = sedes.cadastrar("xilofone xilofone xilofone", "Bia", "Galpão CD")
+    resultado = sedes.pesquisar("xilofone", limite=1)
+    assert list(resultado["ID"]) == [forte]
+    assert len(sedes.pesquisar("xilofone")) == 2
@@ -0,0 +1,111 @@
+import json
+import time
+
+import pytest
+
+from sincronizacao import Sincronizador
+
+
+def aguardar(condicao, limite=30):
+    fim = time.time() + limite
+    while not condicao():
+        assert time.time() < fim, "tempo esgotado"
+        time.sleep(0.02)
+
+
+@pytest.fixture
+def arquivos(tmp_path):
+    """(fila de saída, arquivo local, config.json) num diretório temporário"""
+    arquivo_local = tmp_path / "ordens.csv"
+    arquivo_local.write_text("ID,Descrição\n1,teste\n")
+    return str(tmp_path / "fila.json"), str(arquivo_local), str(tmp_path / "config.json")
+
+
+def criar(arquivos, configuracao, **esperas):
+    return Sincronizador(*arquivos, ler_configuracao=lambda: configuracao, **esperas)
+
+
+def envios(repositorio):
+    return [caminho for metodo, caminho in repositorio.requisicoes if metodo == "PUT"]
+
+
+def test_gravacoes_seguidas_viram_um_envio(github, arquivos):
+    repositorio, configuracao = github
+    sincronizador = criar(arquivos, configuracao, espera_gravacoes=0.3)
+    for _ in range(5):
+        sincronizador.agendar()
+    assert sincronizador.status()["pendentes"] == 5
+    aguardar(lambda: sincronizador.status()["ultima_sincronizacao"])
+    assert len(envios(repositorio)) == 1
+    assert sincronizador.status()["pendentes"] == 0
+    with open(arquivos[1], "rb") as f:
+        assert repositorio.arquivos() == {"dados/ordens.csv": f.read()}
+
+
+def test_espera_maxima_envia_mesmo_com_gravacoes_continuas(github, arquivos):
+    repositorio, configuracao = github
+    sincronizador = criar(arquivos, configuracao, espera_gravacoes=10, espera_maxima=0.3)
+    fim = time.time() + 2
+    while time.time() < fim:
+        sincronizador.agendar()
+        time.sleep(0.05)
+    assert sincronizador.status()["ultima_sincronizacao"] is not None
+    assert envios(repositorio)
+
+
+def test_fila_retomada_apos_reinicio(github, arquivos):
+    repositorio, configuracao = github
+    # Processo encerrado antes do envio: os pedidos ficam só na fila em disco
+    anterior = criar(arquivos, configuracao, espera_gravacoes=600, espera_maxima=600)
+    for _ in range(3):
+        anterior.agendar()
+    with open(arquivos[0]) as f:
+        assert json.load(f)["pendentes"] == 3
+    assert envios(repositorio) == []
+
+    sincronizador = criar(arquivos, configuracao, espera_gravacoes=0.1)
+    aguardar(lambda: sincronizador.status()["ultima_sincronizacao"])
+    assert len(envios(repositorio)) == 1
+    with open(arquivos[0]) as f:
+        assert json.load(f)["pendentes"] == 0
+
+
+def test_espera_exponencial_apos_falhas(github, arquivos):
+    repositorio, configuracao = github
+    repositorio.falhas.extend([401, 401, 401])  # Falhas que o cliente não repete: ficam com a fila
+    tentativas = []
+
+    def ler_configuracao():
+        tentativas.append(time.time())
+        return configuracao
+    sincronizador = Sincronizador(*arquivos, ler_configuracao=ler_configuracao, espera_gravacoes=0,
+                                  espera_erro=0.2, espera_erro_maxima=0.5)
+    sincronizador.agendar()
+    aguardar(lambda: sincronizador.status()["tentativas"] == 1)
+    status = sincronizador.status()
+    assert status["ultimo_erro"] and status["pendentes"] == 1
+    aguardar(lambda: sincronizador.status()["ultima_sincronizacao"])
+
+    intervalos = [depois - antes for antes, depois in zip(tentativas, tentativas[1:])]
+    assert len(intervalos) == 3
+    for intervalo, esperado in zip(intervalos, (0.2, 0.4, 0.5)):  # Dobra a cada falha, até a espera máxima
+        assert esperado - 0.05 <= intervalo < esperado + 0.5
+    status = sincronizador.status()
+    assert (status["tentativas"], status["ultimo_erro"], status["proxima_tentativa"]) == (0, None, None)
+    assert len(envios(repositorio)) == 1
+
+
+def test_processos_somam_pedidos_e_so_um_envia(github, arquivos):
+    repositorio, configuracao = github
+    # Cada Sincronizador abre as próprias travas, como os processos do Streamlit
+    processos = [criar(arquivos, configuracao, espera_gravacoes=0.3) for _ in range(2)]
+    for _ in range(2):
+        processos[0].agendar()
+    for _ in range(3):
+        processos[1].agendar()
+    assert [processo.status()["pendentes"] for processo in processos] == [5, 5]
+    aguardar(lambda: all(processo.status()["ultima_sincronizacao"] for processo in processos))
+    time.sleep(0.5)
+    assert len(envios(repositorio)) == 1
+    with open(arquivos[0]) as f:
+        assert json.load(f)["pendentes"] == 0
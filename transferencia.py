@@ -0,0 +1,177 @@
+"""Importação e exportação de ordens em lote, pela linha de comando.
+
+Os arquivos são lidos e gravados em lotes, sem carregar tudo na memória. Na
+importação, cada lote passa pela mesma validação do cadastro
+(servico.validar_lote); as OS válidas recebem IDs novos em bloco e entram
+no armazenamento numa única gravação, e as rejeitadas vão para um arquivo
+ao lado da entrada, com o motivo. A exportação aplica os filtros enquanto
+lê e grava CSV ou JSON lines, comprimidos com gzip se o destino terminar
+em ".gz" ("-" escreve na saída padrão).
+
+    python transferencia.py importar historico_filial.csv.gz
+    python transferencia.py importar ordens.jsonl --simular
+    python transferencia.py exportar abertas_2024.csv.gz --desde 01/01/2024 --ate 31/12/2024
+    python transferencia.py exportar concluidas_2024.csv.gz --conclusao-desde 01/01/2024 --conclusao-ate 31/12/2024
+"""
+import argparse
+import gzip
+import os
+import sys
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from armazenamento import COLUNAS_OS, FORMATO_DATA, TIPOS_LEITURA, texto_para_gravacao
+from servico import obter_servico, validar_lote
+
+TAMANHO_LOTE = 50000
+NIVEL_COMPRESSAO = 6  # O nível 9 do gzip é bem mais lento e quase não reduz o arquivo
+ESPERA_SINCRONIZACAO = 120  # Segundos aguardando o envio ao GitHub antes de encerrar
+
+def formato_do_arquivo(caminho):
+    """"jsonl" para .jsonl/.ndjson/.json (com ou sem .gz), senão "csv" """
+    nome = caminho[:-3] if caminho.endswith(".gz") else caminho
+    return "jsonl" if nome.endswith((".jsonl", ".ndjson", ".json")) else "csv"
+
+def ler_arquivo(caminho, tamanho=TAMANHO_LOTE):
+    """Lotes do arquivo de entrada como lidos (CSV ou JSON lines, comprimidos ou não)"""
+    if formato_do_arquivo(caminho) == "jsonl":
+        return pd.read_json(caminho, lines=True, chunksize=tamanho, dtype=False, convert_dates=False)
+    return pd.read_csv(caminho, dtype=TIPOS_LEITURA, chunksize=tamanho)
+
+class Importacao:
+    """Valida os lotes de um arquivo à medida que o armazenamento os consome, registrando as rejeições"""
+
+    def __init__(self, caminho, arquivo_rejeitados, tamanho=TAMANHO_LOTE):
+        self.caminho = caminho
+        self.arquivo_rejeitados = arquivo_rejeitados
+        self.tamanho = tamanho
+        self.lidas = 0
+        self.validas = 0
+        self.rejeitadas = 0
+
+    def lotes(self):
+        if os.path.exists(self.arquivo_rejeitados):
+            os.remove(self.arquivo_rejeitados)
+        for bruto in ler_arquivo(self.caminho, self.tamanho):
+            validas, rejeitadas = validar_lote(bruto)
+            self.lidas += len(bruto)
+            self.validas += len(validas)
+            if len(rejeitadas):
+                rejeitadas.to_csv(self.arquivo_rejeitados, mode="a", index=False, encoding="utf-8",
+                                  header=not self.rejeitadas)
+                self.rejeitadas += len(rejeitadas)
+            print(f"  {self.lidas} linhas lidas, {self.rejeitadas} rejeitadas", file=sys.stderr)
+            if len(validas):
+                yield validas
+
+def abrir_destino(destino):
+    if destino == "-":
+        return sys.stdout
+    if destino.endswith(".gz"):
+        return gzip.open(destino, "wt", encoding="utf-8", newline="", compresslevel=NIVEL_COMPRESSAO)
+    return open(destino, "w", encoding="utf-8", newline="")
+
+def exportar(servico, destino, filtros=None, desde=None, ate=None, tamanho=TAMANHO_LOTE, formato=None, conclusao=None):
+    """Grava as OS que atendem aos filtros (e às faixas de datas de abertura e de conclusão) no destino; retorna o total"""
+    formato = formato or formato_do_arquivo(destino)
+    total = 0
+    saida = abrir_destino(destino)
+    try:
+        for lote in servico.exportar_lotes(filtros, tamanho, conclusao):
+            if desde is not None:
+                lote = lote[lote["Data"] >= desde]
+            if ate is not None:
+                lote = lote[lote["Data"] <= ate]
+            if lote.empty:
+                continue
+            texto = texto_para_gravacao(lote)
+            if formato == "jsonl":
+                texto.to_json(saida, orient="records", lines=True, force_ascii=False)
+            else:
+                texto.to_csv(saida, header=total == 0, index=False)
+            total += len(lote)
+        if formato == "csv" and total == 0:
+            pd.DataFrame(columns=COLUNAS_OS).to_csv(saida, index=False)  # Só o cabeçalho
+    finally:
+        if saida is not sys.stdout:
+            saida.close()
+    return total
+
+def aguardar_sincronizacao(servico, tempo_limite=ESPERA_SINCRONIZACAO):
+    """Envia já ao GitHub o que a gravação enfileirou: a thread de envio termina junto com este processo"""
+    if hasattr(servico, "servicos"):  # OS divididas por sede (sedes.py): uma fila de envio por sede
+        for servico_sede in servico.servicos():
+            aguardar_sincronizacao(servico_sede, tempo_limite)
+        return
+    if not servico.github_ativo():
+        return
+    sincronizador = servico.sincronizador
+    sincronizador.sincronizar_agora()
+    limite = time.time() + tempo_limite
+    while time.time() < limite:
+        status = sincronizador.status()
+        if not status["pendentes"]:
+            print("Dados enviados ao GitHub", file=sys.stderr)
+            return
+        if status["ultimo_erro"] and not status["enviando"]:
+            break
+        time.sleep(1)
+    print(f"Envio ao GitHub pendente: {sincronizador.status()['ultimo_erro'] or 'tempo esgotado'} "
+          "(será feito pelo aplicativo na próxima gravação)", file=sys.stderr)
+
+def ler_data(texto):
+    return datetime.strptime(texto, FORMATO_DATA)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importação e exportação de ordens de serviço em lote")
+    parser.add_argument("--diretorio", default=".", help="Diretório dos dados (CSV, banco, backups, config.json)")
+    parser.add_argument("--armazenamento", choices=["csv", "sqlite", "particionado"], help="Padrão: o do config.json")
+    parser.add_argument("--lote", type=int, default=TAMANHO_LOTE, help="Linhas por lote")
+    subcomandos = parser.add_subparsers(dest="comando", required=True)
+
+    importar = subcomandos.add_parser("importar", help="Inclui as OS de um arquivo CSV ou JSON lines (.gz aceito)")
+    importar.add_argument("arquivo")
+    importar.add_argument("--rejeitados", help="Arquivo das linhas rejeitadas (padrão: <arquivo>.rejeitados.csv)")
+    importar.add_argument("--simular", action="store_true", help="Só valida, sem gravar")
+
+    exportar_ = subcomandos.add_parser("exportar", help="Grava as OS filtradas em CSV ou JSON lines (.gz comprime)")
+    exportar_.add_argument("destino", help='Arquivo de saída, ou "-" para a saída padrão')
+    exportar_.add_argument("--formato", choices=["csv", "jsonl"], help="Padrão: pela extensão do destino")
+    exportar_.add_argument("--status")
+    exportar_.add_argument("--tipo")
+    exportar_.add_argument("--local")
+    exportar_.add_argument("--desde", type=ler_data, help="Data de abertura inicial (dd/mm/aaaa)")
+    exportar_.add_argument("--ate", type=ler_data, help="Data de abertura final (dd/mm/aaaa)")
+    exportar_.add_argument("--conclusao-desde", type=ler_data, help="Data de conclusão inicial (dd/mm/aaaa)")
+    exportar_.add_argument("--conclusao-ate", type=ler_data, help="Data de conclusão final (dd/mm/aaaa)")
+    args = parser.parse_args()
+
+    servico = obter_servico(args.diretorio, args.armazenamento)
+    servico.inicializar_arquivos()
+    inicio = time.time()
+
+    if args.comando == "importar":
+        importacao = Importacao(args.arquivo, args.rejeitados or f"{args.arquivo}.rejeitados.csv", args.lote)
+        if args.simular:
+            for _ in importacao.lotes():
+                pass
+            incluidas = 0
+        else:
+            incluidas = servico.importar_lotes(importacao.lotes())
+        print(f"{importacao.lidas} linhas lidas, {incluidas} OS incluídas, {importacao.rejeitadas} rejeitadas "
+              f"em {time.time() - inicio:.1f} s", file=sys.stderr)
+        if importacao.rejeitadas:
+            print(f"Linhas rejeitadas em {importacao.arquivo_rejeitados}", file=sys.stderr)
+        if incluidas:
+            aguardar_sincronizacao(servico)
+
+    elif args.comando == "exportar":
+        filtros = {coluna: valor for coluna, valor in
+                   (("Status", args.status), ("Tipo", args.tipo), ("Local", args.local)) if valor}
+        conclusao = None
+        if args.conclusao_desde or args.conclusao_ate:
+            conclusao = (args.conclusao_desde, args.conclusao_ate)
+        total = exportar(servico, args.destino, filtros, args.desde, args.ate, args.lote, args.formato, conclusao)
+        print(f"{total} OS exportadas em {time.time() - inicio:.1f} s", file=sys.stderr)
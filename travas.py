@@ -0,0 +1,67 @@
+"""Coordenação de gravações entre processos.
+
+Vários processos do Streamlit podem gravar os mesmos arquivos. A trava usa
+um arquivo ".lock" ao lado do arquivo protegido (flock no Linux/macOS,
+msvcrt.locking no Windows) e é reentrante dentro do processo. Os arquivos
+temporários recebem nomes únicos por processo e thread, para que duas
+gravações simultâneas não disputem o mesmo temporário antes do os.replace.
+"""
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+def identidade_arquivo(caminho):
+    """Identifica a versão de um arquivo em disco (inode, data de modificação e tamanho)"""
+    info = os.stat(caminho)
+    return (info.st_ino, info.st_mtime_ns, info.st_size)
+
+def caminho_temporario(caminho):
+    """Temporário exclusivo no mesmo diretório do destino (o os.replace só é atômico no mesmo sistema de arquivos)"""
+    return f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+class TravaArquivo:
+    """Trava exclusiva entre processos, reentrante para a thread que já a possui"""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._lock = threading.RLock()
+        self._profundidade = 0
+        self._arquivo = None
+
+    def __enter__(self):
+        self._lock.acquire()
+        if self._profundidade == 0:
+            try:
+                self._arquivo = open(self.caminho, "a+b")
+                if fcntl:
+                    fcntl.flock(self._arquivo.fileno(), fcntl.LOCK_EX)
+                else:
+                    self._arquivo.seek(0)
+                    msvcrt.locking(self._arquivo.fileno(), msvcrt.LK_LOCK, 1)
+            except Exception:
+                if self._arquivo:
+                    self._arquivo.close()
+                    self._arquivo = None
+                self._lock.release()
+                raise
+        self._profundidade += 1
+        return self
+
+    def __exit__(self, *excecao):
+        self._profundidade -= 1
+        try:
+            if self._profundidade == 0:
+                if fcntl:
+                    fcntl.flock(self._arquivo.fileno(), fcntl.LOCK_UN)
+                else:
+                    self._arquivo.seek(0)
+                    msvcrt.locking(self._arquivo.fileno(), msvcrt.LK_UNLCK, 1)
+                self._arquivo.close()
+                self._arquivo = None
+        finally:
+            self._lock.release()